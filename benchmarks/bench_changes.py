@@ -0,0 +1,132 @@
+"""Offline client resync: paging all todos vs GET /todo/changes/.
+
+Run from the project root:
+
+    python -m benchmarks.bench_changes --rows 100000 --changes 10 100 1000
+
+Fills todo with --rows rows, then for every --changes count updates and
+deletes that many todos and resyncs a client that was up to date before
+them. "full" pages through GET /todo/, "delta" reads /todo/changes/ from
+the client's last next_since. Both use pages of --page-size items.
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+
+from sqlalchemy import insert
+
+from benchmarks.common import bench_app
+from config import settings
+from db import models
+from db.crud import ChangeRepository
+from main import app
+from security.security import create_access_token
+
+
+async def fill(session_factory, rows: int, batch: int = 50_000):
+    async with session_factory() as session:
+        user = models.User(username="bench", password="-", email="b@ex.com")
+        session.add(user)
+        await session.commit()
+        for start in range(0, rows, batch):
+            count = min(rows, start + batch) - start
+            seq = await ChangeRepository.reserve(session, count)
+            await session.execute(
+                insert(models.Todo),
+                [
+                    {
+                        "text": f"todo {start + i}",
+                        "user_id": user.id,
+                        "updated_seq": seq + i,
+                    }
+                    for i in range(count)
+                ],
+            )
+            await session.commit()
+    return user
+
+
+async def resync(client, headers, url: str, params: dict, next_params):
+    """Follows pages until the endpoint says there are no more."""
+    pages, size = 0, 0
+    start = time.perf_counter()
+    while True:
+        response = await client.get(url, params=params, headers=headers)
+        response.raise_for_status()
+        pages += 1
+        size += len(response.content)
+        params = next_params(response.json(), params)
+        if params is None:
+            break
+    return {
+        "ms": (time.perf_counter() - start) * 1000,
+        "requests": pages,
+        "kib": size / 1024,
+    }, response.json()
+
+
+def next_todo_page(body, params):
+    return {**params, "cursor": body["next_cursor"]} if body["next_cursor"] else None
+
+
+def next_changes_page(body, params):
+    return {**params, "since": body["next_since"]} if body["has_more"] else None
+
+
+async def run(rows: int, changes: list[int], page_size: int):
+    async with bench_app(app) as (client, session_factory, _):
+        user = await fill(session_factory, rows)
+        headers = {"Authorization": f"Bearer {create_access_token(user)}"}
+        _, head = await resync(
+            client,
+            headers,
+            "/todo/changes/",
+            {"since": 0, "limit": page_size},
+            next_changes_page,
+        )
+        since = head["next_since"]
+        results = {"rows": rows}
+        rnd = random.Random(1)
+        live = set(range(1, rows + 1))
+        for count in changes:
+            todo_ids = rnd.sample(sorted(live), count * 2)
+            live.difference_update(todo_ids[count:])
+            for todo_id in todo_ids[:count]:
+                await client.put(
+                    f"/todo/{todo_id}/",
+                    params={"text": "changed", "completed": True},
+                    headers=headers,
+                )
+            await client.request(
+                "DELETE", "/todo/bulk/", json=todo_ids[count:], headers=headers
+            )
+            full, _ = await resync(
+                client, headers, "/todo/", {"limit": page_size}, next_todo_page
+            )
+            delta, body = await resync(
+                client,
+                headers,
+                "/todo/changes/",
+                {"since": since, "limit": page_size},
+                next_changes_page,
+            )
+            since = body["next_since"]
+            results[f"{count}_changes"] = {"full": full, "delta": delta}
+        return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--changes", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--page-size", type=int, default=settings.TODO_PAGE_SIZE_MAX)
+    args = parser.parse_args()
+    results = asyncio.run(run(args.rows, args.changes, args.page_size))
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""Idle cost and fan-out latency of /todo/events/ WebSocket subscribers.
+
+Run from the project root:
+
+    python -m benchmarks.bench_event_subscribers --levels 0 1000 10000
+
+Starts the app under uvicorn in a subprocess, then for every level opens
+WebSocket subscribers up to that count, leaves them idle for --idle
+seconds and reads the server's CPU time from /proc. After the idle window
+one todo is created and fanout_ms is the time until every subscriber got
+its event. --ping-interval sets the keepalive ping of both the clients
+and uvicorn, 0 turns it off. Needs Linux and a file descriptor limit above the subscriber
+count; the soft limit is raised to the hard one.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import resource
+import tempfile
+import time
+
+import httpx
+import websockets
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from benchmarks.common import process_cpu_seconds, process_rss_mib, uvicorn_server
+from config import settings
+from db import models
+from db.database import build_engine
+from security.security import create_access_token
+
+
+async def prepare_database(url: str):
+    engine = build_engine(url, settings.DB_POOL_SIZE)
+    async with engine.begin() as conn:
+        await conn.run_sync(models.Base.metadata.create_all)
+    session_factory = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    async with session_factory() as session:
+        # Админ, чтобы читать статистику хаба из /admin/cache/
+        user = models.User(
+            username="bench", password="-", email="b@ex.com", position="admin"
+        )
+        session.add(user)
+        await session.commit()
+    await engine.dispose()
+    return create_access_token(user)
+
+
+class Subscriber:
+    def __init__(self):
+        self.received = asyncio.Event()
+        self.received_at = 0.0
+
+    async def run(self, url: str, connected: asyncio.Event, ping_interval):
+        async with websockets.connect(
+            url, open_timeout=60, ping_interval=ping_interval
+        ) as websocket:
+            connected.set()
+            async for _ in websocket:
+                self.received_at = time.perf_counter()
+                self.received.set()
+
+
+async def run(levels: list[int], idle: float, connect_batch: int, ping: float):
+    # У uvicorn нет «выключено», поэтому ставим интервал больше любого прогона
+    server_ping = ping or 10**6
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    with tempfile.TemporaryDirectory() as tmp:
+        url = f"sqlite+aiosqlite:///{os.path.join(tmp, 'bench.db')}"
+        token = await prepare_database(url)
+        headers = {"Authorization": f"Bearer {token}"}
+        subscribers, tasks, results = [], [], []
+        server = uvicorn_server(url, "--ws-ping-interval", str(server_ping))
+        try:
+            async with server as (base_url, process), httpx.AsyncClient(
+                base_url=base_url, headers=headers
+            ) as client:
+                ws_url = base_url.replace("http", "ws", 1)
+                ws_url += f"/todo/events/?token={token}"
+                for level in levels:
+                    start = time.perf_counter()
+                    while len(subscribers) < level:
+                        batch = min(connect_batch, level - len(subscribers))
+                        connected = [asyncio.Event() for _ in range(batch)]
+                        for event in connected:
+                            subscribers.append(Subscriber())
+                            tasks.append(
+                                asyncio.create_task(
+                                    subscribers[-1].run(ws_url, event, ping or None)
+                                )
+                            )
+                        await asyncio.gather(*[event.wait() for event in connected])
+                    connect_s = time.perf_counter() - start
+
+                    await asyncio.sleep(1)
+                    cpu = process_cpu_seconds(process.pid)
+                    await asyncio.sleep(idle)
+                    idle_cpu = process_cpu_seconds(process.pid) - cpu
+
+                    for subscriber in subscribers:
+                        subscriber.received.clear()
+                    start = time.perf_counter()
+                    response = await client.post("/todo/", params={"text": "fanout"})
+                    response.raise_for_status()
+                    await asyncio.gather(
+                        *[subscriber.received.wait() for subscriber in subscribers]
+                    )
+                    last = max((s.received_at for s in subscribers), default=start)
+                    stats = (await client.get("/admin/cache/")).json()
+                    results.append(
+                        {
+                            "subscribers": level,
+                            "connect_s": connect_s,
+                            "idle_cpu_percent": idle_cpu / idle * 100,
+                            "server_rss_mib": process_rss_mib(process.pid),
+                            "fanout_ms": (last - start) * 1000,
+                            "hub": stats.get("events"),
+                        }
+                    )
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            resource.setrlimit(resource.RLIMIT_NOFILE, (soft, hard))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--levels", type=int, nargs="+", default=[0, 1000, 10000])
+    parser.add_argument("--idle", type=float, default=10)
+    parser.add_argument("--connect-batch", type=int, default=500)
+    parser.add_argument("--ping-interval", type=float, default=20)
+    args = parser.parse_args()
+    results = asyncio.run(
+        run(args.levels, args.idle, args.connect_batch, args.ping_interval)
+    )
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""GET latency while a burst of logins runs bcrypt.
+
+Run from the project root:
+
+    python -m benchmarks.bench_login_storm --logins 200 --concurrency 32
+
+Each mode measures GET /todo/ latency with no logins and then during a
+login storm. "inline" hashes on the event loop (PASSWORD_HASH_WORKERS=0),
+"pool" uses the configured executor.
+"""
+
+import argparse
+import asyncio
+import json
+import time
+
+from benchmarks.common import Timings, bench_app, timed
+from config import settings
+from db import models
+from main import app
+from security import pwdcrypt
+from security.pwdcrypt import PasswordHasher, get_password_hash
+from security.security import create_access_token
+
+
+async def measure_reads(client, counter, headers, stop: asyncio.Event, minimum: int):
+    timings = Timings()
+    while not stop.is_set() or len(timings.latencies) < minimum:
+        await timed(client, counter, timings, "GET", "/todo/", headers=headers)
+    return timings.summary()
+
+
+async def login_storm(client, logins: int, concurrency: int):
+    statuses = {}
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def login():
+        async with semaphore:
+            response = await client.post(
+                "/auth/login/", data={"username": "storm", "password": "pw"}
+            )
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(login() for _ in range(logins)))
+    return {
+        "seconds": time.perf_counter() - start,
+        "statuses": statuses,
+    }
+
+
+async def run_mode(client, counter, headers, args):
+    stop = asyncio.Event()
+    stop.set()
+    baseline = await measure_reads(client, counter, headers, stop, args.reads)
+
+    stop = asyncio.Event()
+    reads = asyncio.create_task(measure_reads(client, counter, headers, stop, 1))
+    storm = await login_storm(client, args.logins, args.concurrency)
+    stop.set()
+    return {"baseline_get": baseline, "storm_get": await reads, "logins": storm}
+
+
+async def run(args):
+    results = {}
+    async with bench_app(app) as (client, session_factory, counter):
+        async with session_factory() as session:
+            user = models.User(
+                username="storm",
+                password=get_password_hash("pw"),
+                email="storm@ex.com",
+            )
+            session.add(user)
+            await session.commit()
+        headers = {"Authorization": f"Bearer {create_access_token(user)}"}
+
+        default_hasher = pwdcrypt.password_hasher
+        modes = {
+            "inline": PasswordHasher(0, 0),
+            "pool": default_hasher,
+        }
+        try:
+            for name, hasher in modes.items():
+                pwdcrypt.password_hasher = hasher
+                results[name] = await run_mode(client, counter, headers, args)
+        finally:
+            pwdcrypt.password_hasher = default_hasher
+            default_hasher.shutdown()
+    results["settings"] = {
+        "PASSWORD_HASH_WORKERS": settings.PASSWORD_HASH_WORKERS,
+        "PASSWORD_HASH_MAX_PENDING": settings.PASSWORD_HASH_MAX_PENDING,
+        "PASSWORD_HASH_EXECUTOR": settings.PASSWORD_HASH_EXECUTOR,
+    }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--reads", type=int, default=200)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
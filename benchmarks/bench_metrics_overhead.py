@@ -0,0 +1,149 @@
+"""Throughput cost of the metrics middleware and engine instrumentation.
+
+Run from the project root:
+
+    python -m benchmarks.bench_metrics_overhead --requests 4000 --rounds 5
+
+Starts uvicorn with METRICS_ENABLED off and on, alternating for --rounds
+rounds, and sends the same mix of todo reads from --concurrency clients.
+Besides throughput and latency it reports the server's CPU time per
+request from /proc, which doesn't depend on how fast the client is. Each
+mode's figures are medians over the rounds.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import tempfile
+import time
+
+import httpx
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from benchmarks.common import percentile, process_cpu_seconds, uvicorn_server
+from config import settings
+from db import models
+from db.database import build_engine
+from security.security import create_access_token
+
+
+async def prepare_database(url: str, todos: int):
+    engine = build_engine(url, settings.DB_POOL_SIZE)
+    async with engine.begin() as conn:
+        await conn.run_sync(models.Base.metadata.create_all)
+    session_factory = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    async with session_factory() as session:
+        user = models.User(username="bench", password="-", email="b@ex.com")
+        session.add(user)
+        await session.commit()
+        await session.execute(
+            insert(models.Todo),
+            [{"text": f"todo {i}", "user_id": user.id} for i in range(todos)],
+        )
+        await session.commit()
+    await engine.dispose()
+    return create_access_token(user)
+
+
+def request_mix(todos: int):
+    # Список, одна todo со связями и счётчики: разное число запросов к БД
+    while True:
+        for i in range(1, todos + 1):
+            yield "/todo/", {"limit": 20}
+            yield f"/todo/{i}/", None
+            yield "/todo/stats/", None
+
+
+async def client_loop(client, paths, count: int, latencies: list):
+    for _ in range(count):
+        path, params = next(paths)
+        start = time.perf_counter()
+        response = await client.get(path, params=params)
+        latencies.append(time.perf_counter() - start)
+        response.raise_for_status()
+
+
+async def run_mode(
+    url: str, token: str, metrics: bool, requests: int, concurrency: int, todos: int
+):
+    env = {"METRICS_ENABLED": str(metrics).lower()}
+    async with uvicorn_server(url, env=env) as (base_url, process):
+        async with httpx.AsyncClient(
+            base_url=base_url,
+            headers={"Authorization": f"Bearer {token}"},
+            limits=httpx.Limits(max_connections=concurrency),
+        ) as client:
+            paths = request_mix(todos)
+            per_client = requests // concurrency
+            # Прогрев: соединения пула, кэш токена, планы запросов SQLite
+            await asyncio.gather(
+                *[client_loop(client, paths, 10, []) for _ in range(concurrency)]
+            )
+            latencies = []
+            cpu = process_cpu_seconds(process.pid)
+            start = time.perf_counter()
+            await asyncio.gather(
+                *[
+                    client_loop(client, paths, per_client, latencies)
+                    for _ in range(concurrency)
+                ]
+            )
+            elapsed = time.perf_counter() - start
+            cpu = process_cpu_seconds(process.pid) - cpu
+    latencies.sort()
+    return {
+        "requests_per_second": len(latencies) / elapsed,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "server_cpu_ms_per_request": cpu / len(latencies) * 1000,
+    }
+
+
+async def run(requests: int, concurrency: int, rounds: int, todos: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        url = f"sqlite+aiosqlite:///{os.path.join(tmp, 'bench.db')}"
+        token = await prepare_database(url, todos)
+        samples = {"off": [], "on": []}
+        for _ in range(rounds):
+            for mode in samples:
+                samples[mode].append(
+                    await run_mode(
+                        url, token, mode == "on", requests, concurrency, todos
+                    )
+                )
+    results = {
+        mode: {
+            key: statistics.median(sample[key] for sample in mode_samples)
+            for key in mode_samples[0]
+        }
+        for mode, mode_samples in samples.items()
+    }
+    off, on = results["off"], results["on"]
+    results["overhead_percent"] = {
+        "throughput": (1 - on["requests_per_second"] / off["requests_per_second"])
+        * 100,
+        "server_cpu": (
+            on["server_cpu_ms_per_request"] / off["server_cpu_ms_per_request"] - 1
+        )
+        * 100,
+    }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=4000)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--todos", type=int, default=1000)
+    args = parser.parse_args()
+    results = asyncio.run(run(args.requests, args.concurrency, args.rounds, args.todos))
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
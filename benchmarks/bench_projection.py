@@ -0,0 +1,114 @@
+"""Loading todos as ORM entities vs the column projection used by list queries.
+
+Run from the project root:
+
+    python -m benchmarks.bench_projection --rows 100000
+
+Reports wall time for each way of loading the rows and turning them into
+TodoDB-shaped dicts, and the tracemalloc peak from a separate run. Set
+BENCH_DB=postgres (needs initdb/pg_ctl) or BENCH_DB_URL to run against
+another backend.
+"""
+
+import argparse
+import asyncio
+import gc
+import json
+import time
+import tracemalloc
+from datetime import datetime
+
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from benchmarks.common import bench_database_url
+from config import settings
+from db import models, schemas
+from db.crud import TodoRepository
+from db.database import build_engine
+from routes.responses import FastSerializer
+
+
+async def load_entities(session: AsyncSession, rows: int):
+    result = await session.execute(
+        select(models.Todo).order_by(models.Todo.created, models.Todo.id).limit(rows)
+    )
+    return result.scalars().all()
+
+
+async def load_projection(session: AsyncSession, rows: int):
+    todos, _ = await TodoRepository.get_todos(session, schemas.TodoFilter(), rows)
+    return todos
+
+
+async def measure(session_factory, loader, rows: int, serializer: FastSerializer):
+    # Время меряем отдельно: tracemalloc заметно замедляет аллокации
+    gc.collect()
+    async with session_factory() as session:
+        start = time.perf_counter()
+        todos = await loader(session, rows)
+        loaded = time.perf_counter()
+        serializer.rows(todos)
+        serialized = time.perf_counter()
+        assert len(todos) == rows
+    del todos
+    gc.collect()
+    async with session_factory() as session:
+        tracemalloc.start()
+        serializer.rows(await loader(session, rows))
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return {
+        "load_ms": (loaded - start) * 1000,
+        "serialize_ms": (serialized - loaded) * 1000,
+        "peak_mib": peak / 2**20,
+    }
+
+
+async def run(rows: int):
+    with bench_database_url() as url:
+        engine = build_engine(url, settings.DB_POOL_SIZE)
+        async with engine.begin() as conn:
+            await conn.run_sync(models.Base.metadata.drop_all)
+            await conn.run_sync(models.Base.metadata.create_all)
+            user_id = await conn.scalar(
+                insert(models.User)
+                .values(username="bench", password="-", email="bench@ex.com")
+                .returning(models.User.id)
+            )
+            created = datetime(2024, 1, 1)
+            await conn.execute(
+                insert(models.Todo),
+                [
+                    {"text": f"todo {i}", "user_id": user_id, "created": created}
+                    for i in range(rows)
+                ],
+            )
+        session_factory = sessionmaker(
+            engine, class_=AsyncSession, expire_on_commit=False
+        )
+        serializer = FastSerializer(schemas.TodoDB)
+        try:
+            return {
+                "rows": rows,
+                "orm_entities": await measure(
+                    session_factory, load_entities, rows, serializer
+                ),
+                "projection": await measure(
+                    session_factory, load_projection, rows, serializer
+                ),
+            }
+        finally:
+            await engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=100_000)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args.rows)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""Cost of the rate and concurrency limiters, and what they shed under a flood.
+
+Run from the project root:
+
+    python -m benchmarks.bench_rate_limit --calls 200000 --flood 300
+
+"overhead" times the limiter calls made on every request: a token bucket
+take() over --keys keys, RateLimiter.check() and a ConcurrencyLimiter
+acquire/release pair. "writes" floods POST /todo/ from one user at
+--noisy-rate requests per second while another user writes within its
+limit; only the noisy user should get 429. An unpaced flood would only
+show the client and the app fighting over one CPU.
+"admission" sends --flood concurrent GET /todo/ and counts the 503s shed
+once MAX_CONCURRENT_REQUESTS are running and MAX_WAITING_REQUESTS wait.
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from collections import Counter
+
+from benchmarks.common import bench_app, percentile
+from config import settings
+from db import models
+from main import app
+from security.limits import (
+    ConcurrencyLimiter,
+    InMemoryRateLimitBackend,
+    RateLimiter,
+)
+from security.security import create_access_token
+
+
+async def overhead(calls: int, keys: int):
+    backend = InMemoryRateLimitBackend(keys)
+    names = [f"todo_write:user:{i}" for i in range(keys)]
+    # Большой бакет: измеряем путь «разрешено», без исключений
+    rate, burst = 1e9, 10**9
+    start = time.perf_counter()
+    for i in range(calls):
+        await backend.take(names[i % keys], rate, burst)
+    take = (time.perf_counter() - start) / calls
+
+    limiter = RateLimiter(backend)
+    start = time.perf_counter()
+    for i in range(calls):
+        await limiter.check("todo_write", f"user:{i % keys}", rate, burst)
+    check = (time.perf_counter() - start) / calls
+
+    admission = ConcurrencyLimiter(15, 50, 0.5)
+    start = time.perf_counter()
+    for _ in range(calls):
+        await admission.acquire()
+        admission.release()
+    slot = (time.perf_counter() - start) / calls
+    return {
+        "take_us": take * 1e6,
+        "check_us": check * 1e6,
+        "acquire_release_us": slot * 1e6,
+    }
+
+
+async def create_user(session_factory, name: str):
+    async with session_factory() as session:
+        user = models.User(username=name, password="-", email=f"{name}@ex.com")
+        session.add(user)
+        await session.commit()
+    return {"Authorization": f"Bearer {create_access_token(user)}"}
+
+
+async def writes(client, noisy, quiet, seconds: float, noisy_rate: float):
+    statuses = {"noisy": Counter(), "quiet": Counter()}
+    latencies = {"noisy": [], "quiet": []}
+    deadline = time.perf_counter() + seconds
+
+    async def write(name, headers, rate):
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            response = await client.post(
+                "/todo/", params={"text": name}, headers=headers
+            )
+            latencies[name].append(time.perf_counter() - start)
+            statuses[name][response.status_code] += 1
+            await asyncio.sleep(1 / rate)
+
+    await asyncio.gather(
+        write("noisy", noisy, noisy_rate),
+        # Спокойный пользователь пишет в пределах своего лимита
+        write("quiet", quiet, settings.RATE_LIMIT_TODO_WRITE_PER_SECOND / 2),
+    )
+    results = {}
+    for name, values in latencies.items():
+        values.sort()
+        results[name] = {
+            "statuses": dict(statuses[name]),
+            "p50_ms": percentile(values, 50) * 1000,
+            "p99_ms": percentile(values, 99) * 1000,
+        }
+    return results
+
+
+async def admission(client, headers, flood: int):
+    start = time.perf_counter()
+    responses = await asyncio.gather(
+        *[client.get("/todo/", headers=headers) for _ in range(flood)]
+    )
+    return {
+        "seconds": time.perf_counter() - start,
+        "statuses": dict(Counter(response.status_code for response in responses)),
+    }
+
+
+async def run(args):
+    results = {"overhead": await overhead(args.calls, args.keys)}
+    async with bench_app(app, rate_limits=True) as (client, session_factory, _):
+        noisy = await create_user(session_factory, "noisy")
+        quiet = await create_user(session_factory, "quiet")
+        results["writes"] = await writes(
+            client, noisy, quiet, args.seconds, args.noisy_rate
+        )
+        results["admission"] = await admission(client, quiet, args.flood)
+    results["settings"] = {
+        "RATE_LIMIT_TODO_WRITE_PER_SECOND": settings.RATE_LIMIT_TODO_WRITE_PER_SECOND,
+        "RATE_LIMIT_TODO_WRITE_BURST": settings.RATE_LIMIT_TODO_WRITE_BURST,
+        "MAX_CONCURRENT_REQUESTS": settings.MAX_CONCURRENT_REQUESTS,
+        "MAX_WAITING_REQUESTS": settings.MAX_WAITING_REQUESTS,
+        "REQUEST_QUEUE_TIMEOUT_SECONDS": settings.REQUEST_QUEUE_TIMEOUT_SECONDS,
+    }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--calls", type=int, default=200_000)
+    parser.add_argument("--keys", type=int, default=10_000)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--noisy-rate", type=float, default=200)
+    parser.add_argument("--flood", type=int, default=300)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
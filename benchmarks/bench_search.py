@@ -0,0 +1,117 @@
+"""Full-text todo search vs a LIKE '%q%' scan.
+
+Run from the project root:
+
+    python -m benchmarks.bench_search --rows 1000000
+
+Fills todo with random texts, then times TodoRepository.search_todos and
+the equivalent unranked LIKE query. LIMIT lets the scan stop early on
+frequent words; rare words and misses read the whole table. Set
+BENCH_DB=postgres (needs initdb/pg_ctl) or BENCH_DB_URL to run against
+another backend.
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+
+from sqlalchemy import and_, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from benchmarks.common import bench_database_url, percentile
+from config import settings
+from db import models, schemas
+from db.crud import TodoRepository
+from db.database import build_engine
+
+
+WORDS = [f"word{i}" for i in range(5000)] + ["milk", "report", "deploy", "invoice"]
+# Частое слово, префикс, два слова сразу и слово, которого нет
+QUERIES = ["milk", "invo*", "milk report", "absent"]
+
+
+async def fill(engine, rows: int, batch: int = 50_000):
+    rnd = random.Random(1)
+    async with engine.begin() as conn:
+        user_id = await conn.scalar(
+            insert(models.User)
+            .values(username="bench", password="-", email="bench@ex.com")
+            .returning(models.User.id)
+        )
+        for start in range(0, rows, batch):
+            await conn.execute(
+                insert(models.Todo),
+                [
+                    {"text": " ".join(rnd.choices(WORDS, k=6)), "user_id": user_id}
+                    for _ in range(start, min(rows, start + batch))
+                ],
+            )
+
+
+async def measure(session_factory, run_query, repeat: int):
+    latencies = []
+    for _ in range(repeat):
+        async with session_factory() as session:
+            start = time.perf_counter()
+            found = await run_query(session)
+            latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    return {
+        "found": len(found),
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+    }
+
+
+async def run(rows: int, repeat: int):
+    with bench_database_url() as url:
+        engine = build_engine(url, settings.DB_POOL_SIZE)
+        async with engine.begin() as conn:
+            await conn.run_sync(models.Base.metadata.drop_all)
+            await conn.run_sync(models.Base.metadata.create_all)
+        start = time.perf_counter()
+        await fill(engine, rows)
+        fill_s = time.perf_counter() - start
+        session_factory = sessionmaker(
+            engine, class_=AsyncSession, expire_on_commit=False
+        )
+        filters = schemas.TodoFilter()
+        results = {"rows": rows, "fill_s": fill_s}
+        try:
+            for q in QUERIES:
+                like = and_(
+                    *[
+                        models.Todo.text.like(f"%{word.rstrip('*')}%")
+                        for word in q.split()
+                    ]
+                )
+
+                async def search(session, q=q):
+                    return await TodoRepository.search_todos(session, q, filters, 20)
+
+                async def scan(session, like=like):
+                    query = select(*TodoRepository.list_columns).where(like).limit(20)
+                    return (await session.execute(query)).all()
+
+                results[q] = {
+                    "search": await measure(session_factory, search, repeat),
+                    "like_scan": await measure(session_factory, scan, repeat),
+                }
+        finally:
+            await engine.dispose()
+        return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args.rows, args.repeat)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
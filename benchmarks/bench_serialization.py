@@ -0,0 +1,98 @@
+"""response_model serialization vs the orjson fast path.
+
+Run from the project root:
+
+    python -m benchmarks.bench_serialization --sizes 10 1000 100000
+
+Serves the same in-memory todos through two routes that declare the same
+response_model. One returns the ORM objects, the other uses FastSerializer
+and fast_json_response. Both bodies are checked to be identical JSON.
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from datetime import datetime
+
+import httpx
+from fastapi import FastAPI, Response
+
+from benchmarks.common import percentile
+from db.models import Todo
+from db.schemas import TodoDB
+from routes.responses import FastSerializer, fast_json_response
+
+
+def make_app(rows):
+    app = FastAPI()
+    serializer = FastSerializer(TodoDB)
+
+    @app.get("/default", response_model=list[TodoDB])
+    async def default():
+        return rows
+
+    @app.get("/fast", response_model=list[TodoDB])
+    async def fast(response: Response):
+        return fast_json_response(serializer.rows(rows), response)
+
+    return app
+
+
+def make_rows(size: int):
+    created = datetime(2024, 1, 1, 12, 0, 0)
+    return [
+        Todo(
+            id=i,
+            user_id=i % 100,
+            text=f"todo number {i}",
+            category_id=i % 10 or None,
+            completed=bool(i % 2),
+            created=created,
+        )
+        for i in range(size)
+    ]
+
+
+async def measure(client, url: str, repeat: int):
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        response = await client.get(url)
+        latencies.append(time.perf_counter() - start)
+        response.raise_for_status()
+    latencies.sort()
+    return response.content, {
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+    }
+
+
+async def run(sizes: list[int]):
+    results = {}
+    for size in sizes:
+        app = make_app(make_rows(size))
+        repeat = max(3, min(200, 200_000 // max(size, 1)))
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://b") as c:
+            default_body, default = await measure(c, "/default", repeat)
+            fast_body, fast = await measure(c, "/fast", repeat)
+        assert json.loads(default_body) == json.loads(fast_body)
+        results[size] = {
+            "requests": repeat,
+            "response_model": default,
+            "fast_path": fast,
+            "speedup_p50": default["p50_ms"] / fast["p50_ms"],
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 1000, 100000])
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args.sizes)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
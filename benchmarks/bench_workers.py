@@ -0,0 +1,195 @@
+"""Read throughput of the production runner by worker count.
+
+Run from the project root:
+
+    python -m benchmarks.bench_workers --workers 1 2 4 8 --duration 20
+
+Seeds --todos todos into a SQLite file, then starts "python server.py"
+with SERVER_WORKERS set to each level and drives the todo and category
+read routes from --client-processes processes. Each process runs
+--concurrency clients. Reports requests per second, latency percentiles
+and the scaling efficiency against one worker:
+rps(n) / (n * rps(1)).
+
+The clients need CPU too. Run them on another machine, or keep
+workers + client processes within the core count, or the figures show
+contention instead of scaling.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import asynccontextmanager
+
+import httpx
+
+from benchmarks.bench_metrics_overhead import prepare_database
+from benchmarks.common import free_port, percentile
+from db.database import build_engine
+from db.schema import upgrade_schema
+from config import settings
+
+
+def request_paths(todos: int):
+    # Только чтение: список, одна todo со связями, категории
+    for i in range(1, todos + 1):
+        yield "/todo/", {"limit": 20}
+        yield f"/todo/{i}/", None
+        yield "/category/", None
+
+
+async def client_loop(
+    base_url: str, token: str, todos: int, concurrency: int, duration: float
+):
+    latencies = []
+    errors = 0
+    paths = request_paths(todos)
+    async with httpx.AsyncClient(
+        base_url=base_url,
+        headers={"Authorization": f"Bearer {token}"},
+        limits=httpx.Limits(max_connections=concurrency),
+    ) as client:
+
+        async def worker(deadline: float):
+            nonlocal errors, paths
+            while time.perf_counter() < deadline:
+                try:
+                    path, params = next(paths)
+                except StopIteration:
+                    paths = request_paths(todos)
+                    continue
+                start = time.perf_counter()
+                try:
+                    response = await client.get(path, params=params)
+                    response.raise_for_status()
+                except httpx.HTTPError:
+                    errors += 1
+                    continue
+                latencies.append(time.perf_counter() - start)
+
+        # Прогрев соединений клиента и кэшей воркеров
+        await asyncio.gather(
+            *[worker(time.perf_counter() + 1) for _ in range(concurrency)]
+        )
+        latencies.clear()
+        deadline = time.perf_counter() + duration
+        await asyncio.gather(*[worker(deadline) for _ in range(concurrency)])
+    return latencies, errors
+
+
+def client_process(*args):
+    return asyncio.run(client_loop(*args))
+
+
+@asynccontextmanager
+async def production_server(db_url: str, workers: int):
+    port = free_port()
+    env = {
+        **os.environ,
+        "DB_URL": db_url,
+        "SERVER_PORT": str(port),
+        "SERVER_WORKERS": str(workers),
+        "SERVER_MIGRATE": "false",
+    }
+    process = subprocess.Popen([sys.executable, "server.py"], env=env)
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        # Без keep-alive: каждая проверка — новое соединение к любому воркеру
+        async with httpx.AsyncClient(
+            base_url=base_url, headers={"Connection": "close"}
+        ) as client:
+            ready = set()
+            # Ждём, пока ответят все воркеры
+            while len(ready) < workers:
+                if process.poll() is not None:
+                    raise RuntimeError("server exited during startup")
+                try:
+                    response = await client.get("/health/ready")
+                    if response.status_code == 200:
+                        ready.add(response.json()["pid"])
+                        continue
+                except httpx.TransportError:
+                    pass
+                await asyncio.sleep(0.1)
+        yield base_url
+    finally:
+        process.send_signal(signal.SIGTERM)
+        process.wait()
+
+
+async def run(
+    workers: list[int],
+    client_processes: int,
+    concurrency: int,
+    duration: float,
+    todos: int,
+):
+    results = {"cpu_count": os.cpu_count(), "levels": {}}
+    with tempfile.TemporaryDirectory() as tmp:
+        url = f"sqlite+aiosqlite:///{os.path.join(tmp, 'bench.db')}"
+        engine = build_engine(url, settings.DB_POOL_SIZE)
+        await upgrade_schema(engine)
+        await engine.dispose()
+        token = await prepare_database(url, todos)
+        loop = asyncio.get_running_loop()
+        for count in workers:
+            async with production_server(url, count) as base_url:
+                with ProcessPoolExecutor(client_processes) as pool:
+                    samples = await asyncio.gather(
+                        *[
+                            loop.run_in_executor(
+                                pool,
+                                client_process,
+                                base_url,
+                                token,
+                                todos,
+                                concurrency,
+                                duration,
+                            )
+                            for _ in range(client_processes)
+                        ]
+                    )
+            latencies = sorted(value for sample, _ in samples for value in sample)
+            results["levels"][count] = {
+                "requests_per_second": len(latencies) / duration,
+                "errors": sum(errors for _, errors in samples),
+                "p50_ms": percentile(latencies, 50) * 1000,
+                "p99_ms": percentile(latencies, 99) * 1000,
+            }
+    base = results["levels"][workers[0]]["requests_per_second"] / workers[0]
+    for count, level in results["levels"].items():
+        level["scaling_efficiency"] = level["requests_per_second"] / (count * base)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--client-processes", type=int, default=2)
+    parser.add_argument("--concurrency", type=int, default=16, help="Per process")
+    parser.add_argument("--duration", type=float, default=20)
+    parser.add_argument("--todos", type=int, default=1000)
+    args = parser.parse_args()
+    results = asyncio.run(
+        run(
+            args.workers,
+            args.client_processes,
+            args.concurrency,
+            args.duration,
+            args.todos,
+        )
+    )
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""Todo write throughput: per-request commits vs the write-behind queue.
+
+Run from the project root:
+
+    python -m benchmarks.bench_write_behind --clients 1000 --requests 5
+
+Every client sends its creates one after another, all clients at once.
+"direct" is the default mode, "durable" and "accepted" run with
+TODO_WRITE_BEHIND and the matching ?durable= value. For "accepted",
+drain_s is the time until the queue has committed everything. Set
+BENCH_DB=postgres (needs initdb/pg_ctl) or BENCH_DB_URL to run against
+another backend.
+"""
+
+import argparse
+import asyncio
+import json
+import time
+
+from sqlalchemy import func, select
+
+from benchmarks.common import Timings, bench_app, timed
+from config import settings
+from db import models
+from db.write_queue import todo_write_queue
+from main import app
+from security.security import create_access_token
+
+
+async def client_loop(client, counter, timings, headers, requests: int, params):
+    errors = 0
+    for i in range(requests):
+        try:
+            await timed(
+                client,
+                counter,
+                timings,
+                "POST",
+                "/todo/",
+                params={"text": f"todo {i}", **params},
+                headers=headers,
+            )
+        except Exception:
+            # Например, "database is locked" при прямых коммитах в SQLite
+            errors += 1
+    return errors
+
+
+async def run_mode(mode: str, clients: int, requests: int):
+    settings.TODO_WRITE_BEHIND = mode != "direct"
+    params = {"durable": mode != "accepted"}
+    async with bench_app(app) as (client, session_factory, counter):
+        async with session_factory() as session:
+            user = models.User(username="bench", password="-", email="b@ex.com")
+            session.add(user)
+            await session.commit()
+        headers = {"Authorization": f"Bearer {create_access_token(user)}"}
+        batches = todo_write_queue.batches
+        if settings.TODO_WRITE_BEHIND:
+            writer = asyncio.create_task(todo_write_queue.run(session_factory))
+
+        timings = Timings()
+        statements = counter.count
+        start = time.perf_counter()
+        errors = await asyncio.gather(
+            *[
+                client_loop(client, counter, timings, headers, requests, params)
+                for _ in range(clients)
+            ]
+        )
+        elapsed = time.perf_counter() - start
+        if settings.TODO_WRITE_BEHIND:
+            await todo_write_queue.stop()
+            await writer
+        drained = time.perf_counter() - start
+
+        async with session_factory() as session:
+            total = await session.scalar(select(func.count()).select_from(models.Todo))
+        errors = sum(errors)
+        assert total == clients * requests - errors, total
+        statements = counter.count - statements
+        return {
+            **timings.summary(),
+            # Запросы идут параллельно, поэтому считаем по общему счётчику
+            "statements_per_request": statements / (clients * requests),
+            "errors": errors,
+            "requests_per_second": (clients * requests - errors) / elapsed,
+            "drain_s": drained,
+            "commit_batches": todo_write_queue.batches - batches,
+        }
+
+
+async def run(clients: int, requests: int, modes: list[str]):
+    results = {}
+    for mode in modes:
+        results[mode] = await run_mode(mode, clients, requests)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--clients", type=int, default=1000)
+    parser.add_argument("--requests", type=int, default=5)
+    parser.add_argument("--modes", nargs="+", default=["direct", "durable", "accepted"])
+    args = parser.parse_args()
+    print(
+        json.dumps(asyncio.run(run(args.clients, args.requests, args.modes)), indent=2)
+    )
+
+
+if __name__ == "__main__":
+    main()
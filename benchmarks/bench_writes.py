@@ -0,0 +1,128 @@
+"""Statements per request and latency for every write endpoint.
+
+Run from the project root:
+
+    python -m benchmarks.bench_writes -n 200 > after.json
+
+Check out another revision and run it again to get the "before" numbers.
+Set BENCH_DB=postgres (needs initdb/pg_ctl) or BENCH_DB_URL to run against
+another backend.
+"""
+
+import argparse
+import asyncio
+import json
+
+from benchmarks.common import Timings, bench_app, timed
+from db import models
+from main import app
+from security.security import create_access_token
+
+
+async def run(requests: int, registrations: int):
+    results = {}
+    async with bench_app(app) as (client, session_factory, counter):
+        async with session_factory() as session:
+            admin = models.User(
+                username="admin", password="-", email="admin@ex.com", position="admin"
+            )
+            session.add(admin)
+            await session.commit()
+        headers = {"Authorization": f"Bearer {create_access_token(admin)}"}
+
+        timings = Timings()
+        for i in range(registrations):
+            await timed(
+                client,
+                counter,
+                timings,
+                "POST",
+                "/auth/registration/",
+                params={"username": f"u{i}", "email": f"u{i}@ex.com", "password": "pw"},
+            )
+        results["POST /auth/registration/"] = timings.summary()
+
+        timings = Timings()
+        for i in range(requests):
+            position = ("guest", "user")[i % 2]
+            await timed(
+                client,
+                counter,
+                timings,
+                "PUT",
+                "/admin/users/2/",
+                params={"position": position},
+                headers=headers,
+            )
+        results["PUT /admin/users/{user_id}/"] = timings.summary()
+
+        timings = Timings()
+        for i in range(requests):
+            await timed(
+                client,
+                counter,
+                timings,
+                "POST",
+                "/category/",
+                params={"text": f"c{i}", "slug": f"c{i}"},
+                headers=headers,
+            )
+        results["POST /category/"] = timings.summary()
+
+        timings = Timings()
+        for i in range(requests):
+            await timed(
+                client,
+                counter,
+                timings,
+                "PUT",
+                "/category/1/",
+                params={"text": f"c{i}", "slug": f"slug-{i}"},
+                headers=headers,
+            )
+        results["PUT /category/{cat_id}/"] = timings.summary()
+
+        timings = Timings()
+        for i in range(requests):
+            await timed(
+                client,
+                counter,
+                timings,
+                "POST",
+                "/todo/",
+                params={"text": f"t{i}", "category_id": 1},
+                headers=headers,
+            )
+        results["POST /todo/"] = timings.summary()
+
+        timings = Timings()
+        for i in range(requests):
+            await timed(
+                client,
+                counter,
+                timings,
+                "PUT",
+                "/todo/1/",
+                params={"text": f"t{i}", "completed": bool(i % 2)},
+                headers=headers,
+            )
+        results["PUT /todo/{todo_id}/"] = timings.summary()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("-n", "--requests", type=int, default=200)
+    parser.add_argument(
+        "--registrations",
+        type=int,
+        default=20,
+        help="registrations are dominated by bcrypt, so run fewer of them",
+    )
+    args = parser.parse_args()
+    results = asyncio.run(run(args.requests, args.registrations))
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
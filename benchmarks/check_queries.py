@@ -0,0 +1,77 @@
+"""Runs every router once under assert_queries and reports statement counts.
+
+Run from the project root:
+
+    python -m benchmarks.check_queries
+
+Seeds a small dataset, then sends each request in-process inside
+assert_queries(), so a route that exceeds its query_budget() or repeats
+one statement shape --repeat-threshold times fails the run. Exits with 1
+on any failure; the JSON report lists statements per request.
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+
+from benchmarks.common import bench_app
+from benchmarks.loadtest import seed
+from main import app
+from monitoring.queries import assert_queries
+
+
+# Запросы от имени администратора, он видит все роуты
+REQUESTS = [
+    ("GET", "/todo/", {"limit": 50}),
+    ("GET", "/todo/1/", None),
+    ("GET", "/todo/search/", {"q": "milk"}),
+    ("GET", "/todo/stats/", None),
+    ("GET", "/todo/changes/", {"since": 0}),
+    ("POST", "/todo/", {"text": "new", "category_id": 1}),
+    ("PUT", "/todo/2/", {"text": "changed", "completed": True}),
+    ("DELETE", "/todo/3/", None),
+    ("GET", "/category/", None),
+    ("GET", "/category/1/", None),
+    ("GET", "/category/1/todos/", None),
+    ("GET", "/category/stats/", None),
+    ("GET", "/admin/users/", None),
+    ("GET", "/admin/users/2/", None),
+    ("GET", "/admin/users/2/todos/", None),
+]
+
+
+async def run(repeat_threshold: int):
+    report, failures = {}, 0
+    async with bench_app(app) as (client, session_factory, _):
+        data = await seed(session_factory, users=5, todos=20, categories=3)
+        for method, path, params in REQUESTS:
+            name = f"{method} {path}"
+            try:
+                with assert_queries(repeat_threshold=repeat_threshold) as recorder:
+                    response = await client.request(
+                        method, path, params=params, headers=data.admin.headers
+                    )
+            except AssertionError as exc:
+                failures += 1
+                report[name] = {"error": str(exc)}
+                continue
+            report[name] = {
+                "status": response.status_code,
+                "statements": recorder.count,
+                "budget": recorder.budget,
+            }
+    return report, failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat-threshold", type=int, default=3)
+    args = parser.parse_args()
+    report, failures = asyncio.run(run(args.repeat_threshold))
+    print(json.dumps(report, indent=2))
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
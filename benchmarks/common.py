@@ -0,0 +1,207 @@
+import asyncio
+import os
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import Optional
+
+import httpx
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from config import settings
+from db.database import (
+    async_engine,
+    async_read_session,
+    async_session,
+    build_engine,
+    read_engine,
+)
+from db.models import Base
+
+
+class StatementCounter:
+    def __init__(self, engine):
+        self.count = 0
+        event.listen(engine.sync_engine, "before_cursor_execute", self._on_execute)
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+
+
+class Timings:
+    def __init__(self):
+        self.latencies = []
+        self.statements = []
+
+    def add(self, seconds: float, statements: int):
+        self.latencies.append(seconds)
+        self.statements.append(statements)
+
+    def summary(self):
+        latencies = sorted(self.latencies)
+        return {
+            "requests": len(latencies),
+            "statements_per_request": statistics.mean(self.statements),
+            "p50_ms": percentile(latencies, 50) * 1000,
+            "p95_ms": percentile(latencies, 95) * 1000,
+            "p99_ms": percentile(latencies, 99) * 1000,
+        }
+
+
+def percentile(sorted_values: list[float], pct: float):
+    if not sorted_values:
+        return 0.0
+    index = round(pct / 100 * (len(sorted_values) - 1))
+    return sorted_values[index]
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@contextmanager
+def local_postgres():
+    """Start a throwaway PostgreSQL cluster with initdb/pg_ctl from PATH."""
+    if not shutil.which("pg_ctl"):
+        raise RuntimeError("pg_ctl not found in PATH")
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir = os.path.join(tmp, "data")
+        port = free_port()
+        subprocess.run(
+            ["initdb", "-D", data_dir, "-U", "postgres", "--auth=trust"],
+            check=True,
+            stdout=subprocess.DEVNULL,
+        )
+        options = f"-p {port} -c listen_addresses=127.0.0.1 -k {tmp}"
+        subprocess.run(
+            ["pg_ctl", "-D", data_dir, "-o", options, "-w", "start"],
+            check=True,
+            stdout=subprocess.DEVNULL,
+        )
+        try:
+            yield f"postgresql+asyncpg://postgres@127.0.0.1:{port}/postgres"
+        finally:
+            subprocess.run(
+                ["pg_ctl", "-D", data_dir, "-m", "fast", "-w", "stop"],
+                stdout=subprocess.DEVNULL,
+            )
+
+
+@contextmanager
+def bench_database_url():
+    """BENCH_DB_URL, a local PostgreSQL for BENCH_DB=postgres, or SQLite."""
+    if os.environ.get("BENCH_DB_URL"):
+        yield os.environ["BENCH_DB_URL"]
+    elif os.environ.get("BENCH_DB") == "postgres":
+        with local_postgres() as url:
+            yield url
+    else:
+        with tempfile.TemporaryDirectory() as tmp:
+            yield f"sqlite+aiosqlite:///{os.path.join(tmp, 'bench.db')}"
+
+
+@asynccontextmanager
+async def bench_app(app, rate_limits: bool = False):
+    """Run the app in-process against a fresh benchmark database.
+
+    The app's session factories are rebound to the benchmark engine rather
+    than swapped with dependency_overrides: with any override set, FastAPI
+    rebuilds every dependant on every request, which skews the timings.
+    Rate limits are off unless rate_limits is set: a benchmark floods the
+    write and login routes from a few users on purpose.
+    """
+    enabled = settings.RATE_LIMIT_ENABLED
+    settings.RATE_LIMIT_ENABLED = rate_limits
+    with bench_database_url() as url:
+        engine = build_engine(url, settings.DB_POOL_SIZE)
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.drop_all)
+            await conn.run_sync(Base.metadata.create_all)
+        session_factory = sessionmaker(
+            engine, class_=AsyncSession, expire_on_commit=False
+        )
+        async_session.configure(bind=engine)
+        async_read_session.configure(bind=engine)
+        counter = StatementCounter(engine)
+        transport = httpx.ASGITransport(app=app)
+        try:
+            async with httpx.AsyncClient(
+                transport=transport, base_url="http://bench"
+            ) as client:
+                yield client, session_factory, counter
+        finally:
+            async_session.configure(bind=async_engine)
+            async_read_session.configure(bind=read_engine)
+            await engine.dispose()
+            settings.RATE_LIMIT_ENABLED = enabled
+
+
+async def timed(
+    client: httpx.AsyncClient,
+    counter: StatementCounter,
+    timings: Timings,
+    method: str,
+    url: str,
+    **kwargs,
+):
+    before = counter.count
+    start = time.perf_counter()
+    response = await client.request(method, url, **kwargs)
+    timings.add(time.perf_counter() - start, counter.count - before)
+    response.raise_for_status()
+    return response
+
+
+def process_cpu_seconds(pid: int):
+    with open(f"/proc/{pid}/stat") as stat:
+        # Имя процесса в скобках может содержать пробелы
+        fields = stat.read().rsplit(")", 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+def process_rss_mib(pid: int):
+    with open(f"/proc/{pid}/status") as status:
+        for line in status:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+@asynccontextmanager
+async def uvicorn_server(db_url: str, *args: str, env: Optional[dict] = None):
+    """Run main:app under uvicorn in a subprocess, yield (base_url, process).
+
+    Unlike bench_app this measures the real server: HTTP parsing,
+    middleware and lifespan tasks included, and its CPU time can be read
+    from /proc.
+    """
+    port = free_port()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port)]
+        + ["--log-level", "warning", *args],
+        env={**os.environ, "DB_URL": db_url, **(env or {})},
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        async with httpx.AsyncClient(base_url=base_url) as client:
+            while True:
+                if process.poll() is not None:
+                    raise RuntimeError("uvicorn exited during startup")
+                try:
+                    await client.get("/")
+                    break
+                except httpx.TransportError:
+                    await asyncio.sleep(0.1)
+        yield base_url, process
+    finally:
+        process.terminate()
+        process.wait()
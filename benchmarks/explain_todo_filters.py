@@ -0,0 +1,81 @@
+"""Check that every todo listing filter combination is served by an index.
+
+Run from the project root:
+
+    python -m benchmarks.explain_todo_filters
+
+Builds each query with TodoRepository, runs EXPLAIN QUERY PLAN against an
+in-memory SQLite schema and exits with status 1 if any plan contains a full
+scan of the todo table. tests/test_indexes.py runs the same check against
+the migrated schema on SQLite and PostgreSQL.
+"""
+
+import itertools
+import sys
+from datetime import datetime
+
+from sqlalchemy import create_engine
+
+from db.crud import TodoRepository
+from db.models import Base
+from db.schemas import TODO_SORT_KEYS, TodoFilter
+from db.pagination import encode_cursor
+
+
+FILTER_VALUES = {
+    "user_id": 1,
+    "category_id": 1,
+    "completed": False,
+    "created_from": datetime(2024, 1, 1),
+    "created_to": datetime(2025, 1, 1),
+}
+
+
+def filter_combinations():
+    names = list(FILTER_VALUES)
+    for size in range(len(names) + 1):
+        for combo in itertools.combinations(names, size):
+            for sort in TODO_SORT_KEYS:
+                yield TodoFilter(sort=sort, **{n: FILTER_VALUES[n] for n in combo})
+
+
+def explain(conn, query):
+    compiled = query.compile(dialect=conn.dialect)
+    params = tuple(compiled.params[name] for name in compiled.positiontup)
+    result = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}", params)
+    return [row[-1] for row in result]
+
+
+def is_full_scan(plan):
+    return any(line.startswith("SCAN todo") and "USING" not in line for line in plan)
+
+
+def main():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    cursor = encode_cursor(datetime(2024, 6, 1), 1)
+
+    failures = 0
+    with engine.connect() as conn:
+        for filters in filter_combinations():
+            used = filters.model_dump(exclude_defaults=True)
+            for page_cursor in (None, cursor):
+                query = TodoRepository._todos_query(filters, page_cursor).limit(51)
+                plan = explain(conn, query)
+                full_scan = is_full_scan(plan)
+                failures += full_scan
+                print(
+                    "FULL SCAN" if full_scan else "ok",
+                    filters.sort,
+                    sorted(used),
+                    "cursor" if page_cursor else "",
+                    "|",
+                    "; ".join(plan),
+                )
+
+    print(f"{failures} full scan(s)")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,502 @@
+"""Mixed-workload load test of every router, with a regression check.
+
+Run from the project root:
+
+    python -m benchmarks.loadtest run --scenario mixed --output base.json
+    python -m benchmarks.loadtest run --scenario mixed --output new.json
+    python -m benchmarks.loadtest compare base.json new.json
+
+"run" seeds --users users with --todos todos each spread over
+--categories categories, then --concurrency clients pick weighted
+operations of the scenario for --duration seconds. The app runs
+in-process by default or under uvicorn with --server. Results are JSON:
+throughput and p50/p95/p99 per operation, and SQL statements per request
+per route, read from /metrics (METRICS_ENABLED must stay on).
+
+"compare" flags operations whose latency grew or throughput fell by more
+than --threshold percent, and routes whose statements per request grew
+by more than --statements-threshold. It exits with 1 on a regression.
+Set BENCH_DB=postgres (needs initdb/pg_ctl) or BENCH_DB_URL to run
+against another backend.
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import re
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import httpx
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from benchmarks.common import (
+    bench_app,
+    bench_database_url,
+    percentile,
+    uvicorn_server,
+)
+from config import settings
+from db import models
+from db.crud import ChangeRepository, TodoCounterRepository
+from db.database import build_engine
+from security.pwdcrypt import get_password_hash
+from security.security import create_access_token
+
+
+PASSWORD = "loadtest"
+WORDS = ["milk", "report", "deploy", "invoice", "call", "review", "plan", "fix"]
+
+
+@dataclass
+class BenchUser:
+    id: int
+    username: str
+    headers: dict
+    # Id todo пользователя из набора; свои созданные удаляются первыми
+    todo_ids: range
+    created: list = field(default_factory=list)
+
+
+@dataclass
+class Dataset:
+    users: list[BenchUser]
+    admin: BenchUser
+    todos: int
+    category_ids: list[int]
+
+
+async def seed(session_factory, users: int, todos: int, categories: int) -> Dataset:
+    rnd = random.Random(0)
+    password = get_password_hash(PASSWORD)
+    async with session_factory() as session:
+        await session.execute(
+            insert(models.Category),
+            [{"text": f"Category {i}", "slug": f"cat-{i}"} for i in range(categories)],
+        )
+        await session.execute(
+            insert(models.User),
+            [
+                {
+                    "username": f"user{i}",
+                    "password": password,
+                    "email": f"user{i}@ex.com",
+                    "position": "admin" if i == 0 else "user",
+                }
+                for i in range(users)
+            ],
+        )
+        await session.commit()
+        # Todos идут подряд по пользователям, так id каждого известны заранее
+        rows = users * todos
+        seq = await ChangeRepository.reserve(session, rows)
+        batch = []
+        for i in range(rows):
+            batch.append(
+                {
+                    "user_id": i // todos + 1,
+                    "text": " ".join(rnd.choices(WORDS, k=3)) + f" {i}",
+                    "category_id": rnd.randint(1, categories) if categories else None,
+                    "completed": rnd.random() < 0.3,
+                    "updated_seq": seq + i,
+                }
+            )
+            if len(batch) == 50_000 or i == rows - 1:
+                await session.execute(insert(models.Todo), batch)
+                batch = []
+        await session.commit()
+        await TodoCounterRepository.recount(session)
+
+    bench_users = []
+    for i in range(users):
+        user = SimpleNamespace(
+            id=i + 1, username=f"user{i}", position="admin" if i == 0 else "user"
+        )
+        token = create_access_token(user)
+        bench_users.append(
+            BenchUser(
+                id=user.id,
+                username=user.username,
+                headers={"Authorization": f"Bearer {token}"},
+                todo_ids=range(i * todos + 1, (i + 1) * todos + 1),
+            )
+        )
+    return Dataset(
+        users=bench_users[1:] or bench_users,
+        admin=bench_users[0],
+        todos=rows,
+        category_ids=list(range(1, categories + 1)),
+    )
+
+
+async def list_todos(client, data, user, rnd):
+    return await client.get("/todo/", params={"limit": 50}, headers=user.headers)
+
+
+async def list_my_todos(client, data, user, rnd):
+    params = {"limit": 50, "mine": True}
+    return await client.get("/todo/", params=params, headers=user.headers)
+
+
+async def get_todo(client, data, user, rnd):
+    todo_id = rnd.randint(1, data.todos)
+    return await client.get(f"/todo/{todo_id}/", headers=user.headers)
+
+
+async def search_todos(client, data, user, rnd):
+    params = {"q": rnd.choice(WORDS)}
+    return await client.get("/todo/search/", params=params, headers=user.headers)
+
+
+async def todo_stats(client, data, user, rnd):
+    return await client.get("/todo/stats/", headers=user.headers)
+
+
+async def create_todo(client, data, user, rnd):
+    params = {"text": f"new {rnd.choice(WORDS)}"}
+    if data.category_ids:
+        params["category_id"] = rnd.choice(data.category_ids)
+    response = await client.post("/todo/", params=params, headers=user.headers)
+    if response.status_code == 200:
+        user.created.append(response.json()["code"]["id"])
+    return response
+
+
+async def update_todo(client, data, user, rnd):
+    todo_id = rnd.choice(user.todo_ids)
+    params = {"text": f"updated {rnd.choice(WORDS)}", "completed": rnd.random() < 0.5}
+    return await client.put(f"/todo/{todo_id}/", params=params, headers=user.headers)
+
+
+async def delete_todo(client, data, user, rnd):
+    if not user.created:
+        # Удаляем только созданное в этом прогоне, чтобы набор не таял
+        return None
+    todo_id = user.created.pop()
+    return await client.delete(f"/todo/{todo_id}/", headers=user.headers)
+
+
+async def list_categories(client, data, user, rnd):
+    return await client.get("/category/", headers=user.headers)
+
+
+async def get_category(client, data, user, rnd):
+    cat_id = rnd.choice(data.category_ids)
+    return await client.get(f"/category/{cat_id}/", headers=user.headers)
+
+
+async def category_todos(client, data, user, rnd):
+    cat_id = rnd.choice(data.category_ids)
+    path = f"/category/{cat_id}/todos/"
+    return await client.get(path, params={"limit": 50}, headers=user.headers)
+
+
+async def category_stats(client, data, user, rnd):
+    return await client.get("/category/stats/", headers=user.headers)
+
+
+async def admin_users(client, data, user, rnd):
+    return await client.get("/admin/users/", headers=data.admin.headers)
+
+
+async def admin_user(client, data, user, rnd):
+    user_id = rnd.choice(data.users).id
+    return await client.get(f"/admin/users/{user_id}/", headers=data.admin.headers)
+
+
+async def admin_user_todos(client, data, user, rnd):
+    path = f"/admin/users/{rnd.choice(data.users).id}/todos/"
+    return await client.get(path, params={"limit": 50}, headers=data.admin.headers)
+
+
+async def login(client, data, user, rnd):
+    form = {"username": user.username, "password": PASSWORD}
+    return await client.post("/auth/login/", data=form)
+
+
+READ = {
+    list_todos: 3,
+    list_my_todos: 2,
+    get_todo: 3,
+    search_todos: 1,
+    todo_stats: 1,
+    list_categories: 1,
+    get_category: 1,
+    category_todos: 1,
+    category_stats: 1,
+}
+WRITE = {create_todo: 4, update_todo: 4, delete_todo: 2}
+ADMIN = {admin_users: 1, admin_user: 2, admin_user_todos: 2}
+SCENARIOS = {
+    "read": READ,
+    "write": WRITE,
+    "admin": ADMIN,
+    "login": {login: 1},
+    "mixed": {
+        **READ,
+        create_todo: 1,
+        update_todo: 1,
+        delete_todo: 0.5,
+        admin_users: 0.2,
+        admin_user: 0.2,
+        admin_user_todos: 0.2,
+        login: 0.05,
+    },
+}
+
+
+@dataclass
+class OperationStats:
+    latencies: list = field(default_factory=list)
+    errors: int = 0
+
+
+async def client_loop(client, data, operations, stats, deadline: float, seed: int):
+    rnd = random.Random(seed)
+    ops, weights = list(operations), list(operations.values())
+    user = data.users[seed % len(data.users)]
+    while time.perf_counter() < deadline:
+        op = rnd.choices(ops, weights)[0]
+        start = time.perf_counter()
+        try:
+            response = await op(client, data, user, rnd)
+        except httpx.HTTPError:
+            stats[op.__name__].errors += 1
+            continue
+        if response is None:
+            continue
+        stats[op.__name__].latencies.append(time.perf_counter() - start)
+        if response.status_code >= 400:
+            stats[op.__name__].errors += 1
+
+
+SAMPLE_RE = re.compile(r'^(\w+)\{method="(\w+)",route="([^"]*)"\} (\S+)$')
+
+
+async def scrape_db_metrics(client) -> dict:
+    """Sum and count of the per-request DB histograms, by "METHOD route"."""
+    response = await client.get("/metrics")
+    response.raise_for_status()
+    totals = defaultdict(dict)
+    for line in response.text.splitlines():
+        match = SAMPLE_RE.match(line)
+        if match:
+            name, method, route, value = match.groups()
+            totals[f"{method} {route}"][name] = float(value)
+    return totals
+
+
+def route_report(before: dict, after: dict) -> dict:
+    routes = {}
+    for route, values in after.items():
+        if route.endswith("/metrics"):
+            continue
+        old = before.get(route, {})
+
+        def delta(name):
+            return values.get(name, 0) - old.get(name, 0)
+
+        requests = delta("db_statements_per_request_count")
+        if requests:
+            routes[route] = {
+                "requests": int(requests),
+                "statements_per_request": delta("db_statements_per_request_sum")
+                / requests,
+                "db_ms_per_request": delta("db_request_duration_seconds_sum")
+                / requests
+                * 1000,
+            }
+    return routes
+
+
+@asynccontextmanager
+async def app_client(server: bool, users: int, todos: int, categories: int):
+    """Seeded dataset and a client for the in-process app or for uvicorn."""
+    if not server:
+        from main import app
+
+        async with bench_app(app) as (client, session_factory, _):
+            yield client, await seed(session_factory, users, todos, categories)
+        return
+    with bench_database_url() as url:
+        engine = build_engine(url, settings.DB_POOL_SIZE)
+        async with engine.begin() as conn:
+            await conn.run_sync(models.Base.metadata.drop_all)
+            await conn.run_sync(models.Base.metadata.create_all)
+        session_factory = sessionmaker(
+            engine, class_=AsyncSession, expire_on_commit=False
+        )
+        data = await seed(session_factory, users, todos, categories)
+        await engine.dispose()
+        # Как и в bench_app: нагрузку дают несколько пользователей, лимиты её срежут
+        env = {"RATE_LIMIT_ENABLED": "false"}
+        async with uvicorn_server(url, env=env) as (base_url, _), httpx.AsyncClient(
+            base_url=base_url, timeout=60
+        ) as client:
+            yield client, data
+
+
+def git_revision():
+    try:
+        result = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True
+        )
+        return result.stdout.strip() or None
+    except OSError:
+        return None
+
+
+async def run(args):
+    operations = SCENARIOS[args.scenario]
+    async with app_client(args.server, args.users, args.todos, args.categories) as (
+        client,
+        data,
+    ):
+        # Прогрев: пул соединений, кэш токенов и категорий
+        warmup = defaultdict(OperationStats)
+        deadline = time.perf_counter() + args.warmup
+        await asyncio.gather(
+            *[
+                client_loop(client, data, operations, warmup, deadline, -1 - i)
+                for i in range(args.concurrency)
+            ]
+        )
+        before = await scrape_db_metrics(client)
+        stats = defaultdict(OperationStats)
+        start = time.perf_counter()
+        await asyncio.gather(
+            *[
+                client_loop(client, data, operations, stats, start + args.duration, i)
+                for i in range(args.concurrency)
+            ]
+        )
+        elapsed = time.perf_counter() - start
+        after = await scrape_db_metrics(client)
+
+    report = {}
+    for name, op_stats in sorted(stats.items()):
+        latencies = sorted(op_stats.latencies)
+        report[name] = {
+            "requests": len(latencies),
+            "errors": op_stats.errors,
+            "requests_per_second": len(latencies) / elapsed,
+            "p50_ms": percentile(latencies, 50) * 1000,
+            "p95_ms": percentile(latencies, 95) * 1000,
+            "p99_ms": percentile(latencies, 99) * 1000,
+        }
+    requests = sum(op["requests"] for op in report.values())
+    return {
+        "meta": {
+            "scenario": args.scenario,
+            "server": "uvicorn" if args.server else "in-process",
+            "users": args.users,
+            "todos_per_user": args.todos,
+            "categories": args.categories,
+            "concurrency": args.concurrency,
+            "duration_s": elapsed,
+            "revision": git_revision(),
+            "started": datetime.now(timezone.utc).isoformat(),
+        },
+        "totals": {
+            "requests": requests,
+            "errors": sum(op["errors"] for op in report.values()),
+            "requests_per_second": requests / elapsed,
+        },
+        "operations": report,
+        "routes": route_report(before, after),
+    }
+
+
+# Больше — хуже; для пропускной способности наоборот
+LATENCY_KEYS = ("p50_ms", "p95_ms", "p99_ms")
+
+
+def compare(base: dict, new: dict, threshold: float, statements_threshold: float):
+    """Yields (is_regression, message) for every compared figure."""
+
+    def change(old, value):
+        return (value / old - 1) * 100 if old else 0.0
+
+    for name, old in base["operations"].items():
+        current = new["operations"].get(name)
+        if current is None:
+            continue
+        for key in LATENCY_KEYS:
+            pct = change(old[key], current[key])
+            yield pct > threshold, (
+                f"{name} {key}: {old[key]:.2f} -> {current[key]:.2f} ({pct:+.1f}%)"
+            )
+        key = "requests_per_second"
+        pct = change(old[key], current[key])
+        yield -pct > threshold, (
+            f"{name} rps: {old[key]:.1f} -> {current[key]:.1f} ({pct:+.1f}%)"
+        )
+    for route, old in base["routes"].items():
+        current = new["routes"].get(route)
+        if current is None:
+            continue
+        key = "statements_per_request"
+        diff = current[key] - old[key]
+        yield diff > statements_threshold, (
+            f"{route} statements/request: {old[key]:.2f} -> {current[key]:.2f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+    run_parser = commands.add_parser("run", help="Seed a dataset and run a workload")
+    run_parser.add_argument("--scenario", choices=SCENARIOS, default="mixed")
+    run_parser.add_argument("--users", type=int, default=100)
+    run_parser.add_argument("--todos", type=int, default=100, help="Per user")
+    run_parser.add_argument("--categories", type=int, default=20)
+    run_parser.add_argument("--concurrency", type=int, default=20)
+    run_parser.add_argument("--duration", type=float, default=30)
+    run_parser.add_argument("--warmup", type=float, default=3)
+    run_parser.add_argument("--server", action="store_true", help="Run uvicorn")
+    run_parser.add_argument("--output", help="Write JSON here instead of stdout")
+    compare_parser = commands.add_parser("compare", help="Compare two run results")
+    compare_parser.add_argument("base")
+    compare_parser.add_argument("new")
+    compare_parser.add_argument("--threshold", type=float, default=10)
+    compare_parser.add_argument("--statements-threshold", type=float, default=0.5)
+    args = parser.parse_args()
+
+    if args.command == "run":
+        result = json.dumps(asyncio.run(run(args)), indent=2)
+        if args.output:
+            with open(args.output, "w") as output:
+                output.write(result + "\n")
+        else:
+            print(result)
+        return
+
+    with open(args.base) as base, open(args.new) as new:
+        base, new = json.load(base), json.load(new)
+    for key in ("scenario", "server", "users", "todos_per_user", "concurrency"):
+        if base["meta"][key] != new["meta"][key]:
+            # Разные условия прогона сравнивать бессмысленно, но не запрещаем
+            print(f"warning: {key} differs: {base['meta'][key]} vs {new['meta'][key]}")
+    regressions = 0
+    for regressed, message in compare(
+        base, new, args.threshold, args.statements_threshold
+    ):
+        regressions += regressed
+        print(("REGRESSION " if regressed else "ok         ") + message)
+    print(f"{regressions} regressions")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,117 @@
-SECRET_KEY = "leo"
-ALGORITHM = "HS256"
-ACCESS_TOKEN_EXPIRE_MINUTES = 12000
+from typing import Literal, Optional
+
+from pydantic_settings import BaseSettings, SettingsConfigDict
+
+
+class Settings(BaseSettings):
+    model_config = SettingsConfigDict(env_file=".env", extra="ignore")
+
+    SECRET_KEY: str = "leo"
+    ALGORITHM: str = "HS256"
+    ACCESS_TOKEN_EXPIRE_MINUTES: int = 15
+    REFRESH_TOKEN_EXPIRE_MINUTES: int = 12000
+    REVOCATION_REFRESH_SECONDS: float = 5
+    TOKEN_CACHE_MAX_SIZE: int = 10000
+
+    # 0 воркеров — считать bcrypt прямо в event loop
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_MAX_PENDING: int = 64
+    PASSWORD_HASH_EXECUTOR: Literal["thread", "process"] = "thread"
+
+    # Списки отдаются через orjson в обход повторной валидации response_model
+    FAST_JSON_RESPONSES: bool = False
+
+    TODO_PAGE_SIZE: int = 50
+    TODO_PAGE_SIZE_MAX: int = 500
+    TODO_STREAM_CHUNK_SIZE: int = 1000
+    TODO_BULK_MAX_ITEMS: int = 500
+    TODO_SEARCH_LIMIT: int = 20
+    # Запись todos через фоновую очередь с групповым коммитом
+    TODO_WRITE_BEHIND: bool = False
+    TODO_WRITE_BATCH_SIZE: int = 500
+    TODO_WRITE_FLUSH_MS: float = 2
+    TODO_WRITE_MAX_PENDING: int = 10000
+    # Удалённые todos для /todo/changes/ хранятся столько дней
+    TOMBSTONE_RETENTION_DAYS: int = 30
+    # Сколько todos встраивается в ответы категории и пользователя
+    RELATED_TODOS_LIMIT: int = 20
+
+    # redis://... для общего кэша между воркерами, по умолчанию кэш в процессе
+    CACHE_URL: Optional[str] = None
+    CATEGORY_CACHE_TTL_SECONDS: int = 60
+    CATEGORY_CACHE_MAX_SIZE: int = 1024
+
+    # redis://... или postgresql://..., чтобы события видели все воркеры;
+    # без него на PostgreSQL события идут через LISTEN/NOTIFY самой базы
+    EVENTS_URL: Optional[str] = None
+    EVENTS_CHANNEL: str = "todo_events"
+    # Больше TODO_BULK_MAX_ITEMS и TODO_WRITE_BATCH_SIZE: пачка рассылается разом
+    EVENTS_BUFFER_SIZE: int = 1024
+    EVENTS_SSE_KEEPALIVE_SECONDS: float = 15
+
+    # /metrics в формате Prometheus, счётчики у каждого воркера свои
+    METRICS_ENABLED: bool = True
+    METRICS_LOOP_LAG_INTERVAL_SECONDS: float = 0.5
+
+    # Счётчик SQL-запросов на запрос и заголовки X-Query-*, для разработки
+    QUERY_RECORDER: bool = False
+    # Столько одинаковых по форме запросов за один запрос считаются N+1
+    QUERY_REPEAT_THRESHOLD: int = 3
+    # Превышение бюджета или N+1 даёт 500 вместо предупреждения в логе
+    QUERY_BUDGET_STRICT: bool = False
+
+    # Открыть пул и прогреть кэши запросов и схем до первых запросов
+    STARTUP_WARMUP: bool = True
+
+    # Токен-бакеты на пользователя или IP; redis://..., чтобы делить их между
+    # воркерами. Без него каждый из SERVER_WORKERS получает свою долю лимита
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_URL: Optional[str] = None
+    RATE_LIMIT_MAX_KEYS: int = 100_000
+    # Логин и регистрация гоняют bcrypt: 12 в минуту с IP, пачкой до 5
+    RATE_LIMIT_LOGIN_PER_SECOND: float = 0.2
+    RATE_LIMIT_LOGIN_BURST: int = 5
+    RATE_LIMIT_TODO_WRITE_PER_SECOND: float = 10
+    RATE_LIMIT_TODO_WRITE_BURST: int = 30
+    # Запросов в работе на воркер: DB_POOL_SIZE + DB_MAX_OVERFLOW, 0 — без ограничения
+    MAX_CONCURRENT_REQUESTS: int = 15
+    MAX_WAITING_REQUESTS: int = 50
+    REQUEST_QUEUE_TIMEOUT_SECONDS: float = 0.5
+    # Проверки здоровья и долгие потоки событий не занимают слоты
+    ADMISSION_EXEMPT_PATHS: tuple[str, ...] = ("/health/", "/metrics", "/todo/events/")
+
+    # python server.py: воркеры uvicorn, по умолчанию по числу CPU
+    SERVER_HOST: str = "127.0.0.1"
+    SERVER_PORT: int = 8000
+    SERVER_WORKERS: Optional[int] = None
+    # auto: uvloop и httptools, если установлены
+    SERVER_LOOP: Literal["auto", "asyncio", "uvloop"] = "auto"
+    SERVER_HTTP: Literal["auto", "h11", "httptools"] = "auto"
+    SERVER_BACKLOG: int = 2048
+    SERVER_KEEPALIVE_SECONDS: int = 5
+    # Сколько ждать текущие запросы после SIGTERM, прежде чем их оборвать
+    SERVER_GRACEFUL_SHUTDOWN_SECONDS: int = 30
+    SERVER_ACCESS_LOG: bool = False
+    SERVER_MIGRATE: bool = True
+    # Один процесс со слежением за файлами, только для разработки
+    SERVER_RELOAD: bool = False
+    HEALTH_DB_TIMEOUT_SECONDS: float = 2
+
+    DB_URL: str = "sqlite+aiosqlite:///example.db"
+    DB_ECHO: bool = False
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30
+    # Отдельный пул только для чтения, которым пользуются GET-роуты
+    DB_READ_ENGINE: bool = False
+    DB_READ_URL: Optional[str] = None
+    DB_READ_POOL_SIZE: int = 10
+
+    SQLITE_JOURNAL_MODE: str = "WAL"
+    SQLITE_SYNCHRONOUS: str = "NORMAL"
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000
+    SQLITE_CACHE_SIZE: int = -64000
+    SQLITE_MMAP_SIZE: int = 256 * 1024 * 1024
+
+
+settings = Settings()
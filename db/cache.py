@@ -0,0 +1,111 @@
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Optional
+
+import orjson
+
+from config import settings
+
+
+class CacheBackend:
+    """Subset of the Redis API used by Cache; redis.asyncio.Redis fits it as is."""
+
+    async def get(self, key: str) -> Optional[bytes]:
+        raise NotImplementedError
+
+    async def set(self, key: str, value: bytes, ex: Optional[int] = None):
+        raise NotImplementedError
+
+
+class InMemoryCacheBackend(CacheBackend):
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.evictions = 0
+        self._entries: OrderedDict[str, tuple[float, bytes]] = OrderedDict()
+
+    async def get(self, key: str) -> Optional[bytes]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: bytes, ex: Optional[int] = None):
+        expires_at = time.monotonic() + ex if ex else float("inf")
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self):
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "evictions": self.evictions,
+        }
+
+
+def build_cache_backend(url: Optional[str], max_size: int) -> CacheBackend:
+    if not url:
+        return InMemoryCacheBackend(max_size)
+    try:
+        import redis.asyncio as redis
+    except ImportError:
+        raise RuntimeError("CACHE_URL is set, but the redis package isn't installed")
+    return redis.from_url(url)
+
+
+def versioned_key(key: str, versions: list[int]) -> str:
+    return f"{key}@{'.'.join(map(str, versions))}"
+
+
+class Cache:
+    """Read-through JSON cache on top of a CacheBackend.
+
+    Callers put the table versions the value was built from into the key,
+    see versioned_key(). A write on any worker bumps a version, so every
+    worker stops reading the old entries at once; they age out by TTL and
+    LRU instead of being invalidated.
+    """
+
+    def __init__(self, backend: CacheBackend, prefix: str, ttl: int):
+        self.backend = backend
+        self.prefix = prefix
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    async def get_or_load(
+        self, key: str, loader: Callable[[], Awaitable[bytes]], raw: bool = False
+    ):
+        """Returns the decoded value, or the stored JSON bytes when raw is set."""
+        key = f"{self.prefix}:{key}"
+        cached = await self.backend.get(key)
+        if cached is not None:
+            self.hits += 1
+            return cached if raw else orjson.loads(cached)
+
+        self.misses += 1
+        value = await loader()
+        if value is None:
+            return None
+        await self.backend.set(key, value, ex=self.ttl)
+        return value if raw else orjson.loads(value)
+
+    def stats(self):
+        stats = {"hits": self.hits, "misses": self.misses}
+        if hasattr(self.backend, "stats"):
+            stats.update(self.backend.stats())
+        return stats
+
+
+category_cache = Cache(
+    build_cache_backend(settings.CACHE_URL, settings.CATEGORY_CACHE_MAX_SIZE),
+    prefix="category",
+    ttl=settings.CATEGORY_CACHE_TTL_SECONDS,
+)
@@ -1,11 +1,56 @@
-from sqlalchemy import select
+import time
+from datetime import datetime
+from collections import defaultdict
+from itertools import groupby
+from operator import attrgetter, itemgetter
+from typing import Optional
+
+from pydantic import TypeAdapter
+from sqlalchemy import (
+    bindparam,
+    column,
+    delete,
+    func,
+    insert,
+    literal_column,
+    select,
+    table,
+    text,
+    tuple_,
+    update,
+)
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.orm import joinedload
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from config import settings
 from db import models, schemas
+from db.cache import category_cache, versioned_key
+from db.events import (
+    category_event,
+    event_hub,
+    todo_data,
+    todo_deleted_event,
+    todo_event,
+)
+from db.pagination import decode_cursor, encode_cursor
+from db.search import fts5_query, tsquery
+
+
+def columns_for(model, schema):
+    """Model columns named like the schema's fields, in the same order."""
+    return tuple(getattr(model, name) for name in schema.model_fields)
+
+
+counter_key = attrgetter("user_id", "category_id", "completed")
+# Виртуальная таблица FTS5, её создаёт DDL из db.models
+todo_fts = table("todo_fts", column("rowid"))
 
 
 class UserRepository:
+    # Списки читаем кортежами, без identity map и без хэша пароля
+    list_columns = columns_for(models.User, schemas.UserDB)
+
     @classmethod
     async def get_user(cls, session: AsyncSession, username: str):
         query = select(models.User).filter_by(username=username)
@@ -19,14 +64,18 @@ class UserRepository:
         return result.scalars().first()
 
     @classmethod
-    async def get_user_with_related(cls, session: AsyncSession, user_id: int):
-        query = (
-            select(models.User)
-            .filter_by(id=user_id)
-            .options(joinedload(models.User.todos))
-        )
+    async def get_user_with_related(
+        cls, session: AsyncSession, user_id: int, todos_limit: int
+    ):
+        query = select(*cls.list_columns, models.User.todos_count).filter_by(id=user_id)
         result = await session.execute(query)
-        return result.scalars().first()
+        user = result.first()
+        if user is None:
+            return None
+        todos = await TodoRepository.get_related_todos(
+            session, schemas.TodoFilter(user_id=user_id), todos_limit, user.todos_count
+        )
+        return {**user._mapping, **todos}
 
     @classmethod
     async def get_user_by_email(cls, session: AsyncSession, email: str):
@@ -36,16 +85,16 @@ class UserRepository:
 
     @classmethod
     async def get_users(cls, session: AsyncSession, skip: int = 0, limit: int = 10):
-        query = select(models.User).offset(skip).limit(limit)
+        query = select(*cls.list_columns).offset(skip).limit(limit)
         result = await session.execute(query)
-        return result.scalars().all()
+        return result.all()
 
     @classmethod
     async def create_user(cls, session: AsyncSession, user: schemas.UserCreate):
-        db_user = models.User(**user.model_dump())
-        session.add(db_user)
+        query = insert(models.User).values(**user.model_dump()).returning(models.User)
+        db_user = await session.scalar(query)
+        await VersionRepository.bump(session, "user")
         await session.commit()
-        await session.refresh(db_user)
         return db_user
 
     @classmethod
@@ -55,19 +104,54 @@ class UserRepository:
         db_user: models.User,
         new_data: schemas.UserPosition,
     ):
-        db_user.position = new_data.position
+        query = (
+            update(models.User)
+            .filter_by(id=db_user.id)
+            .values(position=new_data.position)
+            .returning(models.User)
+            .execution_options(populate_existing=True)
+        )
+        db_user = await session.scalar(query)
+        await TokenRevocationRepository.revoke_user_tokens(session, db_user.id)
+        await VersionRepository.bump(session, "user")
         await session.commit()
-        await session.refresh(db_user)
         return db_user
 
     @classmethod
     async def delete_user(cls, session: AsyncSession, db_user: models.User):
-        await session.delete(db_user)
+        # Удаляем пачкой, не загружая todos пользователя в сессию
+        deleted = await session.execute(
+            delete(models.Todo)
+            .filter_by(user_id=db_user.id)
+            .returning(models.Todo.id, *TodoCounterRepository.key_columns)
+        )
+        deleted = deleted.all()
+        cat_ids = {row.category_id for row in deleted}
+        # Строка пользователя — его же счётчики, поэтому до счётчиков категорий
+        await session.execute(delete(models.User).filter_by(id=db_user.id))
+        await TodoCounterRepository.apply(
+            session, removed=[(None, cat_id, done) for _, _, cat_id, done in deleted]
+        )
+        await ChangeRepository.add_tombstones(
+            session, "todo", [(row.id, row.user_id) for row in deleted]
+        )
+        await TokenRevocationRepository.revoke_user_tokens(session, db_user.id)
+        await VersionRepository.bump(
+            session, "user", "todo", *VersionRepository.categories(cat_ids)
+        )
         await session.commit()
+        await event_hub.publish(
+            [
+                todo_deleted_event(row.id, row.user_id, row.category_id)
+                for row in deleted
+            ]
+        )
         return True
 
 
 class TodoRepository:
+    list_columns = columns_for(models.Todo, schemas.TodoDB)
+
     @classmethod
     async def get_todo(cls, session: AsyncSession, todo_id: int):
         query = select(models.Todo).filter_by(id=todo_id)
@@ -85,23 +169,148 @@ class TodoRepository:
         return db_todo.scalars().first()
 
     @classmethod
-    async def get_todos(cls, session: AsyncSession):
-        query = select(models.Todo)
+    def _filter_todos(cls, query, filters: schemas.TodoFilter):
+        if filters.user_id is not None:
+            query = query.filter_by(user_id=filters.user_id)
+        if filters.category_id is not None:
+            query = query.filter_by(category_id=filters.category_id)
+        if filters.completed is not None:
+            query = query.filter_by(completed=filters.completed)
+        if filters.created_from is not None:
+            query = query.where(models.Todo.created >= filters.created_from)
+        if filters.created_to is not None:
+            query = query.where(models.Todo.created < filters.created_to)
+        return query
+
+    @classmethod
+    def _todos_query(cls, filters: schemas.TodoFilter, cursor: Optional[str] = None):
+        query = cls._filter_todos(select(*cls.list_columns), filters)
+        key = tuple_(models.Todo.created, models.Todo.id)
+        if filters.sort.startswith("-"):
+            query = query.order_by(models.Todo.created.desc(), models.Todo.id.desc())
+            if cursor:
+                query = query.where(key < decode_cursor(cursor))
+        else:
+            query = query.order_by(models.Todo.created, models.Todo.id)
+            if cursor:
+                query = query.where(key > decode_cursor(cursor))
+        return query
+
+    @classmethod
+    async def get_todos(
+        cls,
+        session: AsyncSession,
+        filters: schemas.TodoFilter,
+        limit: int,
+        cursor: Optional[str] = None,
+    ):
+        query = cls._todos_query(filters, cursor).limit(limit + 1)
         db_todos = await session.execute(query)
-        return db_todos.scalars().all()
+        todos = db_todos.all()
+        next_cursor = None
+        if len(todos) > limit:
+            todos = todos[:limit]
+            next_cursor = encode_cursor(todos[-1].created, todos[-1].id)
+        return todos, next_cursor
+
+    @classmethod
+    async def get_related_todos(
+        cls,
+        session: AsyncSession,
+        filters: schemas.TodoFilter,
+        limit: int,
+        count: int,
+    ):
+        """First page of todos embedded in a parent, with the total and a cursor.
+
+        count is the parent's todos_count, kept by TodoCounterRepository.
+        """
+        todos, next_cursor = await cls.get_todos(session, filters, limit)
+        return {"todos": todos, "todos_count": count, "todos_next_cursor": next_cursor}
+
+    @classmethod
+    async def search_todos(
+        cls,
+        session: AsyncSession,
+        q: str,
+        filters: schemas.TodoFilter,
+        limit: int,
+    ):
+        """Best matches first; rank is higher for better matches on both backends."""
+        if session.bind.dialect.name == "postgresql":
+            document = func.to_tsvector("simple", models.Todo.text)
+            ts_query = func.to_tsquery("simple", tsquery(q))
+            rank = func.ts_rank(document, ts_query)
+            query = select(*cls.list_columns, rank.label("rank")).where(
+                document.op("@@")(ts_query)
+            )
+        else:
+            # bm25() меньше для лучших совпадений, поэтому меняем знак
+            rank = -func.bm25(literal_column("todo_fts"))
+            query = (
+                select(*cls.list_columns, rank.label("rank"))
+                .select_from(todo_fts)
+                .join(models.Todo, models.Todo.id == todo_fts.c.rowid)
+                .where(literal_column("todo_fts").op("MATCH")(fts5_query(q)))
+            )
+        query = cls._filter_todos(query, filters)
+        query = query.order_by(rank.desc(), models.Todo.id.desc()).limit(limit)
+        result = await session.execute(query)
+        return result.all()
+
+    @classmethod
+    async def rebuild_search_index(cls, session: AsyncSession):
+        """Creates the search index if it is missing and rebuilds it from todo."""
+        dialect = session.bind.dialect.name
+        for statement in models.TODO_SEARCH_DDL.get(dialect, ()):
+            await session.execute(text(statement))
+        if dialect == "postgresql":
+            await session.execute(text("REINDEX INDEX ix_todo_text_search"))
+        elif dialect == "sqlite":
+            await session.execute(
+                text("INSERT INTO todo_fts(todo_fts) VALUES ('rebuild')")
+            )
+        await session.commit()
+
+    @classmethod
+    async def stream_todos(
+        cls,
+        session: AsyncSession,
+        filters: schemas.TodoFilter,
+        chunk_size: int,
+        cursor: Optional[str] = None,
+    ):
+        query = cls._todos_query(filters, cursor)
+        query = query.execution_options(yield_per=chunk_size)
+        db_todos = await session.stream(query)
+        async for chunk in db_todos.partitions():
+            yield chunk
+
+    @classmethod
+    def new_row(cls, todo: schemas.TodoCreate, user_id: int) -> dict:
+        """Insert values of a new todo; every create path builds rows here.
+
+        updated_seq stays 0 until ChangeRepository.stamp() before the commit.
+        """
+        return {"user_id": user_id, **todo.model_dump()}
 
     @classmethod
     async def create_todo(
         cls, session: AsyncSession, todo: schemas.TodoCreate, user_id: int
     ):
-        db_todo = models.Todo(
-            user_id=user_id,
-            text=todo.text,
-            category_id=todo.category_id,
+        query = (
+            insert(models.Todo)
+            .values(cls.new_row(todo, user_id))
+            .returning(models.Todo)
+        )
+        db_todo = await session.scalar(query)
+        await TodoCounterRepository.apply(session, added=[counter_key(db_todo)])
+        await ChangeRepository.stamp(session, models.Todo, [db_todo.id])
+        await VersionRepository.bump(
+            session, "todo", *VersionRepository.categories([db_todo.category_id])
         )
-        session.add(db_todo)
         await session.commit()
-        await session.refresh(db_todo)
+        await event_hub.publish([todo_event("created", todo_data(db_todo))])
         return db_todo
 
     @classmethod
@@ -111,21 +320,305 @@ class TodoRepository:
         db_todo: models.Todo,
         new_todo_data: schemas.TodoCreate,
     ):
-        db_todo.text = new_todo_data.text
-        db_todo.category_id = new_todo_data.category_id
-        db_todo.completed = new_todo_data.completed
+        """Returns the updated row, or None if the todo is gone."""
+        # db_todo прочитан до блокировки и мог устареть: счётчики считаем
+        # от значений, прочитанных под ней
+        query = (
+            select(*TodoCounterRepository.key_columns)
+            .filter_by(id=db_todo.id)
+            .with_for_update()
+        )
+        old_key = (await session.execute(query)).first()
+        if old_key is None:
+            await session.rollback()
+            return None
+        old_key = counter_key(old_key)
+        old_cat_id = old_key[1]
+        query = (
+            update(models.Todo)
+            .filter_by(id=db_todo.id)
+            .values(
+                text=new_todo_data.text,
+                category_id=new_todo_data.category_id,
+                completed=new_todo_data.completed,
+            )
+            .returning(models.Todo)
+            .execution_options(populate_existing=True)
+        )
+        db_todo = await session.scalar(query)
+        await TodoCounterRepository.apply(
+            session, added=[counter_key(db_todo)], removed=[old_key]
+        )
+        await ChangeRepository.stamp(session, models.Todo, [db_todo.id])
+        await VersionRepository.bump(
+            session,
+            "todo",
+            *VersionRepository.categories([old_cat_id, db_todo.category_id]),
+        )
         await session.commit()
-        await session.refresh(db_todo)
+        await event_hub.publish([todo_event("updated", todo_data(db_todo), old_cat_id)])
         return db_todo
 
     @classmethod
     async def delete_todo(cls, session: AsyncSession, db_todo: models.Todo):
-        await session.delete(db_todo)
+        """Returns False if the todo is already gone."""
+        # Счётчики — по удалённой строке, а не по db_todo, прочитанному раньше
+        query = (
+            delete(models.Todo)
+            .filter_by(id=db_todo.id)
+            .returning(models.Todo.id, *TodoCounterRepository.key_columns)
+        )
+        deleted = (await session.execute(query)).first()
+        if deleted is None:
+            await session.rollback()
+            return False
+        await TodoCounterRepository.apply(session, removed=[counter_key(deleted)])
+        await ChangeRepository.add_tombstones(
+            session, "todo", [(deleted.id, deleted.user_id)]
+        )
+        await VersionRepository.bump(
+            session, "todo", *VersionRepository.categories([deleted.category_id])
+        )
         await session.commit()
+        await event_hub.publish(
+            [todo_deleted_event(deleted.id, deleted.user_id, deleted.category_id)]
+        )
         return True
 
+    @classmethod
+    async def get_todo_owners(cls, session: AsyncSession, todo_ids: list[int]):
+        query = select(models.Todo.id, models.Todo.user_id, models.Todo.created).where(
+            models.Todo.id.in_(todo_ids)
+        )
+        db_todos = await session.execute(query)
+        return {row.id: row for row in db_todos}
+
+    @classmethod
+    async def lock_todos(cls, session: AsyncSession, todo_ids: list[int]):
+        """Locks the todos until the caller commits and returns them by id."""
+        query = (
+            select(
+                models.Todo.id, models.Todo.created, *TodoCounterRepository.key_columns
+            )
+            .where(models.Todo.id.in_(todo_ids))
+            .order_by(models.Todo.id)
+            .with_for_update()
+        )
+        return {row.id: row for row in await session.execute(query)}
+
+    @classmethod
+    async def bulk_create_todos(
+        cls, session: AsyncSession, todos: list[schemas.TodoCreate], user_id: int
+    ):
+        if not todos:
+            return []
+        query = insert(models.Todo).returning(models.Todo, sort_by_parameter_order=True)
+        db_todos = await session.scalars(
+            query, [cls.new_row(todo, user_id) for todo in todos]
+        )
+        db_todos = db_todos.all()
+        await TodoCounterRepository.apply(
+            session, added=[counter_key(todo) for todo in db_todos]
+        )
+        await ChangeRepository.stamp(
+            session, models.Todo, [todo.id for todo in db_todos]
+        )
+        await VersionRepository.bump(
+            session,
+            "todo",
+            *VersionRepository.categories(todo.category_id for todo in db_todos),
+        )
+        await session.commit()
+        await event_hub.publish(
+            [todo_event("created", todo_data(todo)) for todo in db_todos]
+        )
+        return db_todos
+
+    @classmethod
+    async def bulk_update_todos(
+        cls,
+        session: AsyncSession,
+        todos: list[schemas.TodoBulkUpdate],
+        old: Optional[dict] = None,
+    ):
+        """Updates the todos and returns their new values by id.
+
+        old is what lock_todos() returned for them in this transaction;
+        todos missing from it are already gone and are skipped.
+        """
+        if old is None:
+            old = await cls.lock_todos(session, [todo.id for todo in todos])
+        todos = [todo for todo in todos if todo.id in old]
+        updated = {}
+        if todos:
+            cat_ids = {row.category_id for row in old.values()}
+            cat_ids.update(todo.category_id for todo in todos)
+            await session.execute(
+                update(models.Todo), [todo.model_dump() for todo in todos]
+            )
+            removed, added = [], []
+            current = {todo_id: counter_key(row) for todo_id, row in old.items()}
+            for todo in todos:
+                # Повторный id меняет уже обновлённую строку, как в apply_mutations
+                removed.append(current[todo.id])
+                current[todo.id] = (
+                    old[todo.id].user_id,
+                    todo.category_id,
+                    todo.completed,
+                )
+                added.append(current[todo.id])
+            await TodoCounterRepository.apply(session, added, removed)
+            await ChangeRepository.stamp(
+                session, models.Todo, [todo.id for todo in todos]
+            )
+            await VersionRepository.bump(
+                session, "todo", *VersionRepository.categories(cat_ids)
+            )
+            await session.commit()
+            for todo in todos:
+                updated[todo.id] = {
+                    **todo.model_dump(),
+                    "user_id": old[todo.id].user_id,
+                    "created": old[todo.id].created,
+                }
+            await event_hub.publish(
+                [
+                    todo_event("updated", updated[todo.id], old[todo.id].category_id)
+                    for todo in todos
+                ]
+            )
+        else:
+            # Отпускаем блокировки lock_todos()
+            await session.rollback()
+        return updated
+
+    @classmethod
+    async def bulk_delete_todos(cls, session: AsyncSession, todo_ids: list[int]):
+        """Returns the ids that were deleted; the rest were already gone."""
+        deleted = []
+        if todo_ids:
+            query = (
+                delete(models.Todo)
+                .where(models.Todo.id.in_(todo_ids))
+                .returning(models.Todo.id, *TodoCounterRepository.key_columns)
+            )
+            deleted = (await session.execute(query)).all()
+            cat_ids = {row.category_id for row in deleted}
+            await TodoCounterRepository.apply(
+                session, removed=[counter_key(row) for row in deleted]
+            )
+            await ChangeRepository.add_tombstones(
+                session, "todo", [(row.id, row.user_id) for row in deleted]
+            )
+            await VersionRepository.bump(
+                session, "todo", *VersionRepository.categories(cat_ids)
+            )
+            await session.commit()
+            await event_hub.publish(
+                [
+                    todo_deleted_event(row.id, row.user_id, row.category_id)
+                    for row in deleted
+                ]
+            )
+        return [row.id for row in deleted]
+
+    @classmethod
+    async def apply_mutations(cls, session: AsyncSession, mutations: list[tuple]):
+        """Runs queued ("create", user_id, todo), ("update", todo_id, todo) and
+        ("delete", todo_id, None) mutations in one transaction.
+
+        Consecutive mutations of the same kind share a statement where they
+        can. Returns one result per mutation: the new row for creates and
+        updates, True/False for deletes.
+        """
+        results = []
+        cat_ids = set()
+        added, removed = [], []
+        events = []
+        # Номера изменений раздаются в конце, перед коммитом
+        stamped, tombstones = [], []
+        for op, group in groupby(mutations, key=itemgetter(0)):
+            group = list(group)
+            if op == "create":
+                query = insert(models.Todo).returning(
+                    *cls.list_columns, sort_by_parameter_order=True
+                )
+                rows = await session.execute(
+                    query, [cls.new_row(todo, key) for _, key, todo in group]
+                )
+                rows = rows.all()
+                stamped.extend(row.id for row in rows)
+                cat_ids.update(row.category_id for row in rows)
+                added.extend(counter_key(row) for row in rows)
+                events.extend(todo_event("created", row._asdict()) for row in rows)
+                results.extend(rows)
+            elif op == "update":
+                query = (
+                    select(models.Todo.id, *TodoCounterRepository.key_columns)
+                    .where(models.Todo.id.in_([key for _, key, _ in group]))
+                    .order_by(models.Todo.id)
+                    .with_for_update()
+                )
+                current = {
+                    row.id: counter_key(row) for row in await session.execute(query)
+                }
+                cat_ids.update(key[1] for key in current.values())
+                for _, todo_id, todo in group:
+                    query = (
+                        update(models.Todo)
+                        .filter_by(id=todo_id)
+                        .values(**todo.model_dump())
+                        .returning(*cls.list_columns)
+                    )
+                    row = (await session.execute(query)).first()
+                    if row is not None:
+                        stamped.append(row.id)
+                        cat_ids.add(row.category_id)
+                        # Одна и та же todo может обновиться в батче дважды
+                        removed.append(current[todo_id])
+                        events.append(
+                            todo_event("updated", row._asdict(), current[todo_id][1])
+                        )
+                        current[todo_id] = counter_key(row)
+                        added.append(current[todo_id])
+                    results.append(row)
+            elif op == "delete":
+                query = (
+                    delete(models.Todo)
+                    .where(models.Todo.id.in_([key for _, key, _ in group]))
+                    .returning(models.Todo.id, *TodoCounterRepository.key_columns)
+                )
+                deleted = {
+                    row.id: counter_key(row) for row in await session.execute(query)
+                }
+                cat_ids.update(key[1] for key in deleted.values())
+                removed.extend(deleted.values())
+                tombstones.extend((todo_id, key[0]) for todo_id, key in deleted.items())
+                events.extend(
+                    todo_deleted_event(todo_id, user_id, cat_id)
+                    for todo_id, (user_id, cat_id, _) in deleted.items()
+                )
+                # Повторное удаление той же todo в батче ничего не удалило
+                gone = set()
+                for _, key, _ in group:
+                    results.append(key in deleted and key not in gone)
+                    gone.add(key)
+            else:
+                raise ValueError(f"Unknown todo mutation: {op}")
+        await TodoCounterRepository.apply(session, added, removed)
+        await ChangeRepository.stamp(session, models.Todo, stamped)
+        await ChangeRepository.add_tombstones(session, "todo", tombstones)
+        await VersionRepository.bump(
+            session, "todo", *VersionRepository.categories(cat_ids)
+        )
+        await session.commit()
+        await event_hub.publish(events)
+        return results
+
 
 class CategoryRepository:
+    list_columns = columns_for(models.Category, schemas.CategoryDB)
+
     @classmethod
     async def get_category(cls, session: AsyncSession, cat_id: int):
         query = select(models.Category).filter_by(id=cat_id)
@@ -133,30 +626,44 @@ class CategoryRepository:
         return db_cat.scalars().first()
 
     @classmethod
-    async def get_category_with_related(cls, session: AsyncSession, cat_id: int):
-        query = (
-            select(models.Category)
-            .filter_by(id=cat_id)
-            .options(joinedload(models.Category.todos))
+    async def get_category_with_related(
+        cls, session: AsyncSession, cat_id: int, todos_limit: int
+    ):
+        query = select(*cls.list_columns, models.Category.todos_count).filter_by(
+            id=cat_id
         )
         db_cat = await session.execute(query)
-        return db_cat.scalars().first()
+        category = db_cat.first()
+        if category is None:
+            return None
+        todos = await TodoRepository.get_related_todos(
+            session,
+            schemas.TodoFilter(category_id=cat_id),
+            todos_limit,
+            category.todos_count,
+        )
+        return {**category._mapping, **todos}
 
     @classmethod
     async def get_categories(cls, session: AsyncSession):
-        query = select(models.Category)
+        query = select(*cls.list_columns)
         db_cat = await session.execute(query)
-        return db_cat.scalars().all()
+        return db_cat.all()
 
     @classmethod
     async def create_category(cls, session: AsyncSession, cat: schemas.CategoryCreate):
-        db_cat = models.Category(
-            text=cat.text,
-            slug=cat.slug,
+        query = (
+            insert(models.Category)
+            .values(text=cat.text, slug=cat.slug)
+            .returning(models.Category)
+        )
+        db_cat = await session.scalar(query)
+        await ChangeRepository.stamp(session, models.Category, [db_cat.id])
+        await VersionRepository.bump(
+            session, "category", *VersionRepository.categories([db_cat.id])
         )
-        session.add(db_cat)
         await session.commit()
-        await session.refresh(db_cat)
+        await event_hub.publish([category_event("created", db_cat)])
         return db_cat
 
     @classmethod
@@ -166,14 +673,393 @@ class CategoryRepository:
         db_cat: models.Category,
         new_cat_data: schemas.CategoryCreate,
     ):
-        db_cat.text = new_cat_data.text
-        db_cat.slug = new_cat_data.slug
+        query = (
+            update(models.Category)
+            .filter_by(id=db_cat.id)
+            .values(text=new_cat_data.text, slug=new_cat_data.slug)
+            .returning(models.Category)
+            .execution_options(populate_existing=True)
+        )
+        db_cat = await session.scalar(query)
+        await ChangeRepository.stamp(session, models.Category, [db_cat.id])
+        await VersionRepository.bump(
+            session, "category", *VersionRepository.categories([db_cat.id])
+        )
         await session.commit()
-        await session.refresh(db_cat)
+        await event_hub.publish([category_event("updated", db_cat)])
         return db_cat
 
     @classmethod
     async def delete_category(cls, session: AsyncSession, db_cat: models.Category):
-        await session.delete(db_cat)
+        # Внешний ключ обнулил бы category_id сам, но тогда todos остались бы
+        # без нового updated_seq и клиенты не узнали бы об изменении
+        query = (
+            update(models.Todo)
+            .filter_by(category_id=db_cat.id)
+            .values(category_id=None)
+            .returning(models.Todo.id)
+        )
+        todo_ids = (await session.scalars(query)).all()
+        await session.execute(delete(models.Category).filter_by(id=db_cat.id))
+        await ChangeRepository.stamp(session, models.Todo, todo_ids)
+        await ChangeRepository.add_tombstones(session, "category", [(db_cat.id, None)])
+        await VersionRepository.bump(
+            session, "category", "todo", *VersionRepository.categories([db_cat.id])
+        )
         await session.commit()
+        await event_hub.publish([category_event("deleted", db_cat)])
         return True
+
+
+class CachedCategoryRepository:
+    """Read-through cache in front of CategoryRepository's read methods.
+
+    Callers pass the versions they read with VersionRepository.get_versions:
+    list_tables for the list, VersionRepository.categories([cat_id]) for a
+    category with its todos. They are part of the cache key.
+    """
+
+    categories_adapter = TypeAdapter(list[schemas.CategoryDB])
+    category_adapter = TypeAdapter(schemas.CategoryWithRelation)
+    list_tables = ("category",)
+
+    @classmethod
+    async def get_categories(
+        cls, session: AsyncSession, versions: list[int], raw: bool = False
+    ):
+        async def load():
+            categories = await CategoryRepository.get_categories(session)
+            return cls.categories_adapter.dump_json(
+                cls.categories_adapter.validate_python(categories, from_attributes=True)
+            )
+
+        key = versioned_key("list", versions)
+        return await category_cache.get_or_load(key, load, raw)
+
+    @classmethod
+    async def get_category_with_related(
+        cls, session: AsyncSession, cat_id: int, versions: list[int], raw: bool = False
+    ):
+        async def load():
+            category = await CategoryRepository.get_category_with_related(
+                session, cat_id, settings.RELATED_TODOS_LIMIT
+            )
+            if category is None:
+                return None
+            return cls.category_adapter.dump_json(
+                cls.category_adapter.validate_python(category, from_attributes=True)
+            )
+
+        key = versioned_key(str(cat_id), versions)
+        return await category_cache.get_or_load(key, load, raw)
+
+
+class TodoCounterRepository:
+    """Denormalized todo counters on user and category.
+
+    Writers pass (user_id, category_id, completed) keys of the todos they
+    added and removed, and the counters change in the same transaction.
+    """
+
+    key_columns = (models.Todo.user_id, models.Todo.category_id, models.Todo.completed)
+
+    @classmethod
+    async def apply(cls, session: AsyncSession, added=(), removed=()):
+        deltas = {
+            models.User: defaultdict(lambda: [0, 0]),
+            models.Category: defaultdict(lambda: [0, 0]),
+        }
+        for sign, keys in ((1, added), (-1, removed)):
+            for user_id, cat_id, completed in keys:
+                for model, obj_id in (
+                    (models.User, user_id),
+                    (models.Category, cat_id),
+                ):
+                    if obj_id is not None:
+                        deltas[model][obj_id][0] += sign
+                        deltas[model][obj_id][1] += sign if completed else 0
+        for model, changes in deltas.items():
+            # Строки по возрастанию id, сначала пользователи, потом категории
+            params = [
+                {"b_id": obj_id, "d_count": count, "d_completed": completed}
+                for obj_id, (count, completed) in sorted(changes.items())
+                if count or completed
+            ]
+            if params:
+                table = model.__table__
+                query = (
+                    update(table)
+                    .where(table.c.id == bindparam("b_id"))
+                    .values(
+                        todos_count=table.c.todos_count + bindparam("d_count"),
+                        todos_completed=table.c.todos_completed
+                        + bindparam("d_completed"),
+                    )
+                )
+                await session.execute(query, params)
+
+    @classmethod
+    async def get_user_stats(cls, session: AsyncSession, user_id: int):
+        query = select(
+            models.User.id.label("user_id"),
+            models.User.todos_count,
+            models.User.todos_completed,
+        ).filter_by(id=user_id)
+        result = await session.execute(query)
+        return result.first()
+
+    @classmethod
+    async def get_category_stats(cls, session: AsyncSession):
+        query = select(
+            models.Category.id,
+            models.Category.slug,
+            models.Category.todos_count,
+            models.Category.todos_completed,
+        ).order_by(models.Category.id)
+        result = await session.execute(query)
+        return result.all()
+
+    @classmethod
+    async def recount(cls, session: AsyncSession):
+        """Recomputes every counter from todo; returns the number of rows fixed."""
+        # Берём все строки счётчиков в том же порядке, что и писатели: тогда
+        # писатель, уже поменявший счётчик, успеет закоммитить до пересчёта
+        for model in (models.User, models.Category):
+            await session.execute(select(model.id).order_by(model.id).with_for_update())
+        fixed = {}
+        for model, fk in (
+            (models.User, models.Todo.user_id),
+            (models.Category, models.Todo.category_id),
+        ):
+            total = select(func.count()).where(fk == model.id).scalar_subquery()
+            completed = (
+                select(func.count())
+                .where(fk == model.id, models.Todo.completed.is_(True))
+                .scalar_subquery()
+            )
+            query = (
+                update(model)
+                .where(
+                    (model.todos_count != total) | (model.todos_completed != completed)
+                )
+                .values(todos_count=total, todos_completed=completed)
+                .returning(model.id)
+                .execution_options(synchronize_session=False)
+            )
+            fixed[model] = (await session.scalars(query)).all()
+        # Счётчик категории отдаётся в её карточке, см. get_category_with_related
+        await VersionRepository.bump(
+            session,
+            "user",
+            "category",
+            *VersionRepository.categories(fixed[models.Category]),
+        )
+        await session.commit()
+        return sum(map(len, fixed.values()))
+
+
+class ChangeRepository:
+    """Monotonic change sequence and tombstones behind GET /todo/changes/.
+
+    Every todo and category write stamps updated_seq with a fresh number,
+    deletes leave a tombstone with one. The counter lives in table_version
+    and stays locked until the writer commits, so numbers become visible
+    in the order they were handed out and a client never skips a change.
+
+    Writers reserve numbers with their last statements, stamp() and
+    add_tombstones(), so that lock is held only until the commit and
+    writes to different rows run concurrently. The lock order of every
+    todo and category write: todo rows, then user and then category rows
+    by id (the counters), then the change_seq row, then the table_version
+    rows of VersionRepository.bump.
+    """
+
+    sequence = "change_seq"
+    # Наибольший updated_seq удалённых tombstones: клиентам с since меньше
+    # нужна полная синхронизация
+    purged = "tombstone_purged"
+
+    @classmethod
+    async def reserve(cls, session: AsyncSession, count: int = 1) -> int:
+        """Reserves count numbers and returns the first; the caller commits."""
+        dialect = postgresql if session.bind.dialect.name == "postgresql" else sqlite
+        query = dialect.insert(models.TableVersion).values(
+            name=cls.sequence, version=count
+        )
+        query = query.on_conflict_do_update(
+            index_elements=[models.TableVersion.name],
+            set_={"version": models.TableVersion.version + count},
+        ).returning(models.TableVersion.version)
+        return await session.scalar(query) - count + 1
+
+    @classmethod
+    async def stamp(cls, session: AsyncSession, model, ids: list[int]):
+        """Gives the rows fresh updated_seq numbers in order; the caller commits."""
+        if ids:
+            seq = await cls.reserve(session, len(ids))
+            table = model.__table__
+            query = (
+                update(table)
+                .where(table.c.id == bindparam("b_id"))
+                .values(updated_seq=bindparam("b_seq"))
+            )
+            await session.execute(
+                query,
+                [{"b_id": row_id, "b_seq": seq + i} for i, row_id in enumerate(ids)],
+            )
+
+    @classmethod
+    async def add_tombstones(cls, session: AsyncSession, entity: str, refs: list):
+        """Records deleted (id, user_id) pairs; the caller commits."""
+        if refs:
+            seq = await cls.reserve(session, len(refs))
+            await session.execute(
+                insert(models.Tombstone),
+                [
+                    {
+                        "entity": entity,
+                        "entity_id": entity_id,
+                        "user_id": user_id,
+                        "updated_seq": seq + i,
+                    }
+                    for i, (entity_id, user_id) in enumerate(refs)
+                ],
+            )
+
+    @classmethod
+    async def get_changes(
+        cls,
+        session: AsyncSession,
+        since: int,
+        user_id: Optional[int],
+        limit: int,
+    ):
+        """Up to limit changes after since, oldest first.
+
+        Returns None when tombstones after since were already purged.
+        """
+        (purged,) = await VersionRepository.get_versions(session, cls.purged)
+        if 0 < since < purged:
+            return None
+        tombstone = models.Tombstone
+        queries = {
+            "todos": select(
+                *TodoRepository.list_columns, models.Todo.updated_seq
+            ).where(models.Todo.updated_seq > since),
+            "categories": select(
+                *CategoryRepository.list_columns, models.Category.updated_seq
+            ).where(models.Category.updated_seq > since),
+            "deleted_todos": select(
+                tombstone.entity_id.label("id"), tombstone.updated_seq
+            ).where(tombstone.entity == "todo", tombstone.updated_seq > since),
+            "deleted_categories": select(
+                tombstone.entity_id.label("id"), tombstone.updated_seq
+            ).where(tombstone.entity == "category", tombstone.updated_seq > since),
+        }
+        if user_id is not None:
+            queries["todos"] = queries["todos"].filter_by(user_id=user_id)
+            queries["deleted_todos"] = queries["deleted_todos"].where(
+                tombstone.user_id == user_id
+            )
+        changes = []
+        for name, query in queries.items():
+            # Каждый запрос — диапазон по индексу updated_seq
+            query = query.order_by(query.selected_columns.updated_seq)
+            rows = await session.execute(query.limit(limit + 1))
+            changes.extend((row.updated_seq, name, row) for row in rows)
+        changes.sort(key=itemgetter(0))
+        page = changes[:limit]
+        result = {name: [] for name in queries}
+        for _, name, row in page:
+            result[name].append(row.id if name.startswith("deleted") else row)
+        result["next_since"] = page[-1][0] if page else since
+        result["has_more"] = len(changes) > limit
+        return result
+
+    @classmethod
+    async def purge_tombstones(cls, session: AsyncSession, before: datetime) -> int:
+        """Deletes tombstones older than before and moves the purge mark."""
+        query = select(func.max(models.Tombstone.updated_seq)).where(
+            models.Tombstone.deleted < before
+        )
+        last_seq = await session.scalar(query)
+        if last_seq is None:
+            return 0
+        result = await session.execute(
+            delete(models.Tombstone).where(models.Tombstone.updated_seq <= last_seq)
+        )
+        dialect = postgresql if session.bind.dialect.name == "postgresql" else sqlite
+        query = dialect.insert(models.TableVersion).values(
+            name=cls.purged, version=last_seq
+        )
+        query = query.on_conflict_do_update(
+            index_elements=[models.TableVersion.name], set_={"version": last_seq}
+        )
+        await session.execute(query)
+        await session.commit()
+        return result.rowcount
+
+    @classmethod
+    async def sequence_unstamped(cls, session: AsyncSession, batch: int = 10_000):
+        """Gives rows written before updated_seq existed their own numbers."""
+        stamped = 0
+        for model in (models.Category, models.Todo):
+            while True:
+                query = (
+                    select(model.id)
+                    .filter_by(updated_seq=0)
+                    .order_by(model.id)
+                    .limit(batch)
+                )
+                ids = (await session.scalars(query)).all()
+                if not ids:
+                    break
+                await cls.stamp(session, model, ids)
+                await session.commit()
+                stamped += len(ids)
+        return stamped
+
+
+class TokenRevocationRepository:
+    @classmethod
+    async def revoke_user_tokens(cls, session: AsyncSession, user_id: int):
+        # Коммитит вызывающий метод, вместе с изменением пользователя
+        session.add(models.TokenRevocation(user_id=user_id, not_before=time.time()))
+
+    @classmethod
+    async def get_revocations(cls, session: AsyncSession, since: float):
+        query = select(
+            models.TokenRevocation.user_id, models.TokenRevocation.not_before
+        ).where(models.TokenRevocation.not_before > since)
+        result = await session.execute(query)
+        return result.all()
+
+
+class VersionRepository:
+    @classmethod
+    def categories(cls, cat_ids) -> list[str]:
+        """Version names of single categories and the todos in them."""
+        return [f"category:{cat_id}" for cat_id in set(cat_ids) if cat_id is not None]
+
+    @classmethod
+    async def bump(cls, session: AsyncSession, *names: str):
+        # Коммитит вызывающий метод, вместе с самим изменением. Строки
+        # блокируются по порядку имён, чтобы писатели не ждали друг друга по кругу
+        dialect = postgresql if session.bind.dialect.name == "postgresql" else sqlite
+        query = dialect.insert(models.TableVersion).values(
+            [{"name": name, "version": 1} for name in sorted(set(names))]
+        )
+        query = query.on_conflict_do_update(
+            index_elements=[models.TableVersion.name],
+            set_={"version": models.TableVersion.version + 1},
+        )
+        await session.execute(query)
+
+    @classmethod
+    async def get_versions(cls, session: AsyncSession, *names: str):
+        query = select(models.TableVersion.name, models.TableVersion.version).where(
+            models.TableVersion.name.in_(names)
+        )
+        result = await session.execute(query)
+        versions = dict(result.all())
+        return [versions.get(name, 0) for name in names]
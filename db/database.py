@@ -1,23 +1,94 @@
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
-from db.models import Base
+from config import settings
+from monitoring.metrics import InstrumentedQueuePool, instrument_engine
+from monitoring.queries import check_query_budget, record_queries
 
 
-DB_NAME = "example.db"
+def is_sqlite_file(url: str):
+    url = make_url(url)
+    return url.get_backend_name() == "sqlite" and url.database not in (
+        None,
+        "",
+        ":memory:",
+    )
 
 
-async_engine = create_async_engine(f"sqlite+aiosqlite:///{DB_NAME}", echo=True)
-async_session = sessionmaker(async_engine, class_=AsyncSession, expire_on_commit=False)
+def set_sqlite_pragmas(dbapi_connection, read_only: bool):
+    cursor = dbapi_connection.cursor()
+    if read_only:
+        cursor.execute("PRAGMA query_only=ON")
+    else:
+        cursor.execute(f"PRAGMA journal_mode={settings.SQLITE_JOURNAL_MODE}")
+    # Как и в PostgreSQL: проверка внешних ключей и ON DELETE SET NULL
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.execute(f"PRAGMA synchronous={settings.SQLITE_SYNCHRONOUS}")
+    cursor.execute(f"PRAGMA busy_timeout={settings.SQLITE_BUSY_TIMEOUT_MS:d}")
+    cursor.execute(f"PRAGMA cache_size={settings.SQLITE_CACHE_SIZE:d}")
+    cursor.execute(f"PRAGMA mmap_size={settings.SQLITE_MMAP_SIZE:d}")
+    cursor.close()
+
+
+def build_engine(url: str, pool_size: int, read_only: bool = False) -> AsyncEngine:
+    sqlite_file = is_sqlite_file(url)
+    if make_url(url).get_backend_name() == "sqlite" and not sqlite_file:
+        # In-memory база живёт в единственном соединении, пул ей не нужен
+        engine = create_async_engine(url, echo=settings.DB_ECHO)
+        record_queries(engine)
+        return engine
+
+    options = {
+        "echo": settings.DB_ECHO,
+        "pool_size": pool_size,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        # aiosqlite по умолчанию открывает новое соединение на каждую сессию
+        "poolclass": AsyncAdaptedQueuePool,
+        "pool_logging_name": "read" if read_only else "write",
+    }
+    if settings.METRICS_ENABLED:
+        options["poolclass"] = InstrumentedQueuePool
+
+    engine = create_async_engine(url, **options)
+    if settings.METRICS_ENABLED:
+        instrument_engine(engine)
+    record_queries(engine)
+    if sqlite_file:
+
+        @event.listens_for(engine.sync_engine, "connect")
+        def on_connect(dbapi_connection, connection_record):
+            set_sqlite_pragmas(dbapi_connection, read_only)
 
+    return engine
 
-async def init_models():
-    async with async_engine.begin() as conn:
-        existing_tables = await conn.run_sync(Base.metadata.reflect)
-        if not existing_tables:
-            await conn.run_sync(Base.metadata.create_all)
+
+async_engine = build_engine(settings.DB_URL, settings.DB_POOL_SIZE)
+async_session = sessionmaker(async_engine, class_=AsyncSession, expire_on_commit=False)
+
+if settings.DB_READ_ENGINE:
+    read_engine = build_engine(
+        settings.DB_READ_URL or settings.DB_URL,
+        settings.DB_READ_POOL_SIZE,
+        read_only=True,
+    )
+else:
+    read_engine = async_engine
+async_read_session = sessionmaker(
+    read_engine, class_=AsyncSession, expire_on_commit=False
+)
 
 
 async def get_session() -> AsyncSession:
     async with async_session() as session:
         yield session
+    check_query_budget()
+
+
+async def get_read_session() -> AsyncSession:
+    async with async_read_session() as session:
+        yield session
+    check_query_budget()
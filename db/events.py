@@ -0,0 +1,340 @@
+import asyncio
+import logging
+import operator
+from collections import defaultdict
+from typing import Callable, Optional
+
+import orjson
+
+from config import settings
+from db import schemas
+
+
+logger = logging.getLogger(__name__)
+
+TODO_FIELDS = tuple(schemas.TodoDB.model_fields)
+CATEGORY_FIELDS = tuple(schemas.CategoryDB.model_fields)
+_todo_getter = operator.attrgetter(*TODO_FIELDS)
+_category_getter = operator.attrgetter(*CATEGORY_FIELDS)
+
+
+def todo_data(todo) -> dict:
+    return dict(zip(TODO_FIELDS, _todo_getter(todo)))
+
+
+def todo_event(kind: str, data: dict, old_category_id: Optional[int] = None):
+    event = {
+        "type": f"todo.{kind}",
+        "id": data["id"],
+        "user_id": data["user_id"],
+        "category_id": data["category_id"],
+        "todo": data,
+    }
+    # Подписчики старой категории тоже должны узнать, что todo из неё ушла
+    if kind == "updated" and old_category_id != data["category_id"]:
+        event["old_category_id"] = old_category_id
+    return event
+
+
+def todo_deleted_event(todo_id: int, user_id: Optional[int], category_id):
+    return {
+        "type": "todo.deleted",
+        "id": todo_id,
+        "user_id": user_id,
+        "category_id": category_id,
+    }
+
+
+def category_event(kind: str, category):
+    data = dict(zip(CATEGORY_FIELDS, _category_getter(category)))
+    return {
+        "type": f"category.{kind}",
+        "id": data["id"],
+        "category_id": data["id"],
+        "category": data,
+    }
+
+
+class EventTransport:
+    """Carries published batches to the EventHub of every worker."""
+
+    # Сколько байт влезает в одно сообщение; None — без ограничения
+    max_payload: Optional[int] = None
+    # Общий транспорт возвращает и наши собственные сообщения через listen()
+    loopback = True
+
+    async def publish(self, payload: bytes):
+        raise NotImplementedError
+
+    async def listen(self, callback: Callable[[bytes], None]):
+        raise NotImplementedError
+
+
+class LocalEventTransport(EventTransport):
+    """Single-process transport: the hub dispatches its own events directly."""
+
+    loopback = False
+
+    async def publish(self, payload: bytes):
+        pass
+
+    async def listen(self, callback: Callable[[bytes], None]):
+        await asyncio.Future()
+
+
+class RedisEventTransport(EventTransport):
+    def __init__(self, url: str, channel: str):
+        import redis.asyncio as redis
+
+        self.client = redis.from_url(url)
+        self.channel = channel
+
+    async def publish(self, payload: bytes):
+        await self.client.publish(self.channel, payload)
+
+    async def listen(self, callback: Callable[[bytes], None]):
+        pubsub = self.client.pubsub()
+        await pubsub.subscribe(self.channel)
+        try:
+            async for message in pubsub.listen():
+                if message["type"] == "message":
+                    callback(message["data"])
+        finally:
+            await pubsub.unsubscribe(self.channel)
+
+
+class PostgresEventTransport(EventTransport):
+    """LISTEN/NOTIFY on the application's own PostgreSQL."""
+
+    max_payload = 7900
+
+    def __init__(self, dsn: str, channel: str):
+        self.dsn = dsn
+        self.channel = channel
+        self._pool = None
+        # Первые публикации приходят разом, пул должен создать только одна
+        self._pool_lock = asyncio.Lock()
+
+    async def _get_pool(self):
+        import asyncpg
+
+        if self._pool is None:
+            async with self._pool_lock:
+                if self._pool is None:
+                    self._pool = await asyncpg.create_pool(
+                        self.dsn, min_size=1, max_size=4
+                    )
+        return self._pool
+
+    async def publish(self, payload: bytes):
+        pool = await self._get_pool()
+        await pool.execute("SELECT pg_notify($1, $2)", self.channel, payload.decode())
+
+    async def listen(self, callback: Callable[[bytes], None]):
+        import asyncpg
+
+        connection = await asyncpg.connect(self.dsn)
+        try:
+            await connection.add_listener(
+                self.channel, lambda *args: callback(args[3].encode())
+            )
+            await asyncio.Future()
+        finally:
+            await connection.close()
+
+
+def events_url() -> Optional[str]:
+    """EVENTS_URL, or DB_URL itself when it is PostgreSQL (LISTEN/NOTIFY).
+
+    None means LocalEventTransport, which doesn't reach other workers.
+    """
+    if settings.EVENTS_URL:
+        return settings.EVENTS_URL
+    if settings.DB_URL.startswith("postgresql"):
+        return settings.DB_URL
+    return None
+
+
+def events_available() -> bool:
+    """False when several workers would each run LocalEventTransport.
+
+    server.py puts the worker count into SERVER_WORKERS for every worker.
+    """
+    return (settings.SERVER_WORKERS or 1) == 1 or events_url() is not None
+
+
+def build_event_transport(url: Optional[str], channel: str) -> EventTransport:
+    if not url:
+        return LocalEventTransport()
+    if url.startswith(("redis://", "rediss://")):
+        try:
+            return RedisEventTransport(url, channel)
+        except ImportError:
+            raise RuntimeError(
+                "EVENTS_URL is redis, but the redis package isn't installed"
+            )
+    if url.startswith("postgresql"):
+        # asyncpg ждёт обычный DSN, без драйвера SQLAlchemy в схеме
+        scheme, _, rest = url.partition("://")
+        return PostgresEventTransport(f"postgresql://{rest}", channel)
+    raise ValueError(f"Unsupported EVENTS_URL: {url}")
+
+
+class Subscription:
+    """Bounded buffer of encoded events for one client connection."""
+
+    def __init__(
+        self,
+        hub: "EventHub",
+        user_id: Optional[int],
+        category_id: Optional[int],
+        buffer_size: int,
+    ):
+        self.hub = hub
+        self.user_id = user_id
+        self.category_id = category_id
+        self.overflowed = False
+        self._queue: asyncio.Queue = asyncio.Queue(buffer_size)
+
+    def matches(self, event: dict) -> bool:
+        if self.user_id is not None and event.get("user_id") != self.user_id:
+            return False
+        if self.category_id is not None:
+            return self.category_id in (
+                event.get("category_id"),
+                event.get("old_category_id"),
+            )
+        return True
+
+    def push(self, data: bytes):
+        try:
+            self._queue.put_nowait(data)
+        except asyncio.QueueFull:
+            # Медленного клиента отключаем, пусть переподключится и перечитает список
+            self.overflowed = True
+            self.close()
+
+    def close(self):
+        """Ends the stream: get() returns None after the pending events."""
+        self.hub.unsubscribe(self)
+        while not self._queue.empty():
+            self._queue.get_nowait()
+        self._queue.put_nowait(None)
+
+    async def get(self) -> Optional[bytes]:
+        """Next event, or None once the subscription overflowed or closed."""
+        return await self._queue.get()
+
+    async def __aenter__(self):
+        self.hub.register(self)
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.hub.unsubscribe(self)
+
+
+class EventHub:
+    """In-process fan-out of todo and category changes to subscribers.
+
+    Writers publish through the transport, so with a shared transport every
+    worker's hub sees every change. Subscribers are indexed by their filter,
+    which keeps idle and unrelated subscribers out of the dispatch loop.
+    """
+
+    def __init__(self, transport: EventTransport, buffer_size: int):
+        self.transport = transport
+        self.buffer_size = buffer_size
+        self.published = 0
+        self.delivered = 0
+        self.overflows = 0
+        self._all: set[Subscription] = set()
+        self._by_user: defaultdict[int, set[Subscription]] = defaultdict(set)
+        self._by_category: defaultdict[int, set[Subscription]] = defaultdict(set)
+
+    def subscribe(
+        self, user_id: Optional[int] = None, category_id: Optional[int] = None
+    ) -> Subscription:
+        return Subscription(self, user_id, category_id, self.buffer_size)
+
+    def _index(self, subscription: Subscription) -> set:
+        if subscription.user_id is not None:
+            return self._by_user[subscription.user_id]
+        if subscription.category_id is not None:
+            return self._by_category[subscription.category_id]
+        return self._all
+
+    def register(self, subscription: Subscription):
+        self._index(subscription).add(subscription)
+
+    def unsubscribe(self, subscription: Subscription):
+        index = self._index(subscription)
+        if subscription in index:
+            index.discard(subscription)
+            if subscription.overflowed:
+                self.overflows += 1
+        if subscription.user_id is not None and not index:
+            self._by_user.pop(subscription.user_id, None)
+        elif subscription.category_id is not None and not index:
+            self._by_category.pop(subscription.category_id, None)
+
+    async def publish(self, events: list[dict]):
+        """Sends events to every worker; called after the writer's commit."""
+        if not events:
+            return
+        payloads = [orjson.dumps(events)]
+        limit = self.transport.max_payload
+        if limit and len(payloads[0]) > limit:
+            payloads = [orjson.dumps([event]) for event in events]
+        try:
+            for payload in payloads:
+                if not self.transport.loopback:
+                    self.dispatch(payload)
+                await self.transport.publish(payload)
+        except Exception:
+            # Изменение уже закоммичено, ошибку доставки только логируем
+            logger.exception("Failed to publish %d events", len(events))
+        self.published += len(events)
+
+    def dispatch(self, payload: bytes):
+        for event in orjson.loads(payload):
+            targets = set(self._all)
+            if event.get("user_id") is not None:
+                targets.update(self._by_user.get(event["user_id"], ()))
+            for key in ("category_id", "old_category_id"):
+                if event.get(key) is not None:
+                    targets.update(self._by_category.get(event[key], ()))
+            if not targets:
+                continue
+            data = orjson.dumps(event)
+            for subscription in targets:
+                if subscription.matches(event):
+                    subscription.push(data)
+                    self.delivered += 1
+
+    async def run(self):
+        await self.transport.listen(self.dispatch)
+
+    def close_all(self):
+        """Ends every stream, so open connections don't hold up a shutdown."""
+        subscriptions = set(self._all)
+        for index in (self._by_user, self._by_category):
+            for subscribers in index.values():
+                subscriptions.update(subscribers)
+        for subscription in subscriptions:
+            subscription.close()
+
+    def stats(self):
+        return {
+            "subscribers": len(self._all)
+            + sum(map(len, self._by_user.values()))
+            + sum(map(len, self._by_category.values())),
+            "published": self.published,
+            "delivered": self.delivered,
+            "overflows": self.overflows,
+        }
+
+
+event_hub = EventHub(
+    build_event_transport(events_url(), settings.EVENTS_CHANNEL),
+    settings.EVENTS_BUFFER_SIZE,
+)
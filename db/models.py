@@ -1,9 +1,33 @@
 from datetime import datetime
+from typing import Optional
 
-from sqlalchemy import Boolean, DateTime, ForeignKey, Integer, String, func
+from sqlalchemy import (
+    DDL,
+    Boolean,
+    DateTime,
+    Float,
+    ForeignKey,
+    Index,
+    Integer,
+    String,
+    event,
+    func,
+)
+from sqlalchemy.dialects import sqlite
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
 
 
+# SQLite хранит CURRENT_TIMESTAMP без микросекунд; параметры пишем в том же
+# формате, иначе keyset-сравнения по created расходятся со значениями БД
+Timestamp = DateTime().with_variant(
+    sqlite.DATETIME(
+        storage_format="%(year)04d-%(month)02d-%(day)02d "
+        "%(hour)02d:%(minute)02d:%(second)02d"
+    ),
+    "sqlite",
+)
+
+
 class Base(DeclarativeBase):
     pass
 
@@ -16,6 +40,9 @@ class User(Base):
     password: Mapped[str] = mapped_column(String(255))
     email: Mapped[str] = mapped_column(String(255), unique=True)
     position: Mapped[str] = mapped_column(String(32), default="user")
+    # Счётчики ведёт TodoCounterRepository в транзакции записи todo
+    todos_count: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
+    todos_completed: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
 
     todos: Mapped[list["Todo"]] = relationship(
         "Todo", back_populates="user", cascade="all, delete-orphan"
@@ -28,15 +55,26 @@ class Todo(Base):
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     user_id: Mapped[int] = mapped_column(ForeignKey("user.id"))
     text: Mapped[str] = mapped_column(String(255))
-    category_id: Mapped[str] = mapped_column(
+    category_id: Mapped[Optional[int]] = mapped_column(
         ForeignKey("category.id", ondelete="SET NULL"), nullable=True
     )
     completed: Mapped[bool] = mapped_column(Boolean, default=False)
-    created: Mapped[datetime] = mapped_column(DateTime, server_default=func.now())
+    created: Mapped[datetime] = mapped_column(Timestamp, server_default=func.now())
+    # Номер последнего изменения из общей последовательности ChangeRepository
+    updated_seq: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
 
     user: Mapped["User"] = relationship("User", back_populates="todos")
     category: Mapped["Category"] = relationship("Category", back_populates="todos")
 
+    __table_args__ = (
+        Index("ix_todo_created", "created", "id"),
+        Index("ix_todo_user_completed_created", "user_id", "completed", "created"),
+        Index("ix_todo_category_created", "category_id", "created"),
+        Index("ix_todo_completed_created", "completed", "created"),
+        Index("ix_todo_updated_seq", "updated_seq"),
+        Index("ix_todo_user_updated_seq", "user_id", "updated_seq"),
+    )
+
 
 class Category(Base):
     __tablename__ = "category"
@@ -44,5 +82,80 @@ class Category(Base):
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     text: Mapped[str] = mapped_column(String(255), nullable=False)
     slug: Mapped[str] = mapped_column(String(255), unique=True, nullable=False)
+    todos_count: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
+    todos_completed: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
+    updated_seq: Mapped[int] = mapped_column(
+        Integer, default=0, server_default="0", index=True
+    )
 
     todos: Mapped[list["Todo"]] = relationship("Todo", back_populates="category")
+
+
+class Tombstone(Base):
+    """Deleted todo or category, kept for clients syncing by updated_seq."""
+
+    __tablename__ = "tombstone"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    entity: Mapped[str] = mapped_column(String(16))
+    entity_id: Mapped[int] = mapped_column(Integer)
+    user_id: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    updated_seq: Mapped[int] = mapped_column(Integer)
+    deleted: Mapped[datetime] = mapped_column(Timestamp, server_default=func.now())
+
+    __table_args__ = (
+        Index("ix_tombstone_entity_updated_seq", "entity", "updated_seq"),
+        Index("ix_tombstone_user_updated_seq", "user_id", "updated_seq"),
+        Index("ix_tombstone_deleted", "deleted"),
+    )
+
+
+class TokenRevocation(Base):
+    __tablename__ = "token_revocation"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    user_id: Mapped[int] = mapped_column(Integer)
+    # Токены пользователя, выпущенные раньше этого момента, недействительны
+    not_before: Mapped[float] = mapped_column(Float, index=True)
+
+
+class TableVersion(Base):
+    __tablename__ = "table_version"
+
+    name: Mapped[str] = mapped_column(String(64), primary_key=True)
+    version: Mapped[int] = mapped_column(Integer, default=0)
+
+
+# Полнотекстовый поиск по todo.text: FTS5 с триггерами в SQLite,
+# GIN-индекс по to_tsvector в Postgres. Все выражения идемпотентны
+TODO_SEARCH_DDL = {
+    "sqlite": [
+        "CREATE VIRTUAL TABLE IF NOT EXISTS todo_fts USING fts5("
+        "text, content='todo', content_rowid='id', "
+        "tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+        "CREATE TRIGGER IF NOT EXISTS todo_fts_ai AFTER INSERT ON todo BEGIN "
+        "INSERT INTO todo_fts(rowid, text) VALUES (new.id, new.text); END",
+        "CREATE TRIGGER IF NOT EXISTS todo_fts_ad AFTER DELETE ON todo BEGIN "
+        "INSERT INTO todo_fts(todo_fts, rowid, text) "
+        "VALUES ('delete', old.id, old.text); END",
+        "CREATE TRIGGER IF NOT EXISTS todo_fts_au AFTER UPDATE OF text ON todo BEGIN "
+        "INSERT INTO todo_fts(todo_fts, rowid, text) "
+        "VALUES ('delete', old.id, old.text); "
+        "INSERT INTO todo_fts(rowid, text) VALUES (new.id, new.text); END",
+    ],
+    "postgresql": [
+        "CREATE INDEX IF NOT EXISTS ix_todo_text_search ON todo "
+        "USING gin (to_tsvector('simple', text))",
+    ],
+}
+
+for dialect, statements in TODO_SEARCH_DDL.items():
+    for statement in statements:
+        event.listen(
+            Todo.__table__, "after_create", DDL(statement).execute_if(dialect=dialect)
+        )
+event.listen(
+    Todo.__table__,
+    "before_drop",
+    DDL("DROP TABLE IF EXISTS todo_fts").execute_if(dialect="sqlite"),
+)
@@ -0,0 +1,18 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+
+
+def encode_cursor(created: datetime, obj_id: int) -> str:
+    raw = json.dumps([created.isoformat(), obj_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created, obj_id = json.loads(base64.urlsafe_b64decode(padded))
+        return datetime.fromisoformat(created), int(obj_id)
+    except (binascii.Error, UnicodeDecodeError, TypeError, ValueError):
+        raise ValueError("Invalid cursor")
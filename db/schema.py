@@ -0,0 +1,35 @@
+import os
+
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import inspect
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+
+ALEMBIC_INI = os.path.join(os.path.dirname(os.path.dirname(__file__)), "alembic.ini")
+# Схема, которую create_all создавал до появления миграций
+BASELINE_REVISION = "0001"
+
+
+def alembic_config() -> Config:
+    config = Config(ALEMBIC_INI)
+    config.set_main_option(
+        "script_location", os.path.join(os.path.dirname(ALEMBIC_INI), "migrations")
+    )
+    return config
+
+
+def _upgrade(connection, revision: str):
+    config = alembic_config()
+    config.attributes["connection"] = connection
+    tables = set(inspect(connection).get_table_names())
+    if "todo" in tables and "alembic_version" not in tables:
+        # База из create_all: недостающее доделает следующая ревизия
+        command.stamp(config, BASELINE_REVISION)
+    command.upgrade(config, revision)
+
+
+async def upgrade_schema(engine: AsyncEngine, revision: str = "head"):
+    """Applies Alembic migrations; run once per deploy, before workers start."""
+    async with engine.begin() as connection:
+        await connection.run_sync(_upgrade, revision)
@@ -5,6 +5,7 @@ from pydantic import BaseModel, validator, EmailStr
 
 
 VALID_POSITIONS = ("guest", "user", "admin")
+TODO_SORT_KEYS = ("created", "-created")
 
 
 class UserBase(BaseModel):
@@ -32,6 +33,8 @@ class UserDB(UserBase, UserPosition):
 
 class UserWithRelation(UserDB):
     todos: Optional[list["TodoDB"]] = None
+    todos_count: int = 0
+    todos_next_cursor: Optional[str] = None
 
 
 class UserAuth(BaseModel):
@@ -52,6 +55,51 @@ class TodoDB(TodoCreate):
     created: datetime
 
 
+class TodoBulkUpdate(TodoCreate):
+    id: int
+
+
+class TodoBulkResult(BaseModel):
+    id: Optional[int] = None
+    status: str
+    detail: Optional[str] = None
+    todo: Optional[TodoDB] = None
+
+
+class TodoFilter(BaseModel):
+    user_id: Optional[int] = None
+    category_id: Optional[int] = None
+    completed: Optional[bool] = None
+    created_from: Optional[datetime] = None
+    created_to: Optional[datetime] = None
+    sort: str = "created"
+
+    @validator("sort")
+    def validate_sort(cls, sort):
+        if sort not in TODO_SORT_KEYS:
+            raise ValueError("Sort must be one of 'created' or '-created'")
+        return sort
+
+
+class TodoPage(BaseModel):
+    items: list[TodoDB]
+    next_cursor: Optional[str] = None
+
+
+class TodoSearchResult(TodoDB):
+    rank: float
+
+
+class TodoStats(BaseModel):
+    user_id: int
+    todos_count: int
+    todos_completed: int
+
+
+class TodoChange(TodoDB):
+    updated_seq: int
+
+
 class TodoWithRelation(TodoDB):
     user: Optional["UserDB"] = None
     category: Optional["CategoryDB"] = None
@@ -66,5 +114,27 @@ class CategoryDB(CategoryCreate):
     id: int
 
 
+class CategoryStats(BaseModel):
+    id: int
+    slug: str
+    todos_count: int
+    todos_completed: int
+
+
+class CategoryChange(CategoryDB):
+    updated_seq: int
+
+
+class TodoChanges(BaseModel):
+    todos: list[TodoChange]
+    categories: list[CategoryChange]
+    deleted_todos: list[int]
+    deleted_categories: list[int]
+    next_since: int
+    has_more: bool
+
+
 class CategoryWithRelation(CategoryDB):
     todos: Optional[list["TodoDB"]] = None
+    todos_count: int = 0
+    todos_next_cursor: Optional[str] = None
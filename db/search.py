@@ -0,0 +1,25 @@
+import re
+
+
+SEARCH_TERM = re.compile(r"(\w+)(\*?)")
+
+
+def search_terms(q: str) -> list[tuple[str, bool]]:
+    """Words of a search query; a trailing * marks a prefix search."""
+    terms = [(word, bool(star)) for word, star in SEARCH_TERM.findall(q)]
+    if not terms:
+        raise ValueError("Search query must contain at least one word")
+    return terms
+
+
+def fts5_query(q: str) -> str:
+    # Каждое слово в кавычках, чтобы пользователь не мог писать синтаксис FTS5
+    return " ".join(
+        f'"{word}"*' if prefix else f'"{word}"' for word, prefix in search_terms(q)
+    )
+
+
+def tsquery(q: str) -> str:
+    return " & ".join(
+        f"{word}:*" if prefix else word for word, prefix in search_terms(q)
+    )
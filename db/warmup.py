@@ -0,0 +1,116 @@
+import asyncio
+import inspect
+import logging
+import time
+from datetime import datetime
+
+from pydantic import BaseModel
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from db import schemas
+from db.crud import (
+    CategoryRepository,
+    ChangeRepository,
+    TodoCounterRepository,
+    TodoRepository,
+    UserRepository,
+    VersionRepository,
+)
+from db.pagination import encode_cursor
+from security.pwdcrypt import pwd_context
+
+
+logger = logging.getLogger(__name__)
+
+
+async def open_connections(engine: AsyncEngine, count: int):
+    """Checks out count connections at once so the pool keeps them open."""
+
+    async def ping(gate: asyncio.Event):
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+            # Держим соединение, пока не откроются остальные
+            await gate.wait()
+
+    gate = asyncio.Event()
+    tasks = [asyncio.create_task(ping(gate)) for _ in range(count)]
+    await asyncio.sleep(0)
+    gate.set()
+    await asyncio.gather(*tasks)
+
+
+async def prime_queries(session: AsyncSession):
+    """Runs the repositories' read queries once to fill the compiled cache.
+
+    Ids and filters match nothing, so each query is compiled and planned
+    but reads no rows. Writes commit and are left to the first requests.
+    """
+    cursor = encode_cursor(datetime(2000, 1, 1), 0)
+    for filters in (
+        schemas.TodoFilter(user_id=0),
+        schemas.TodoFilter(user_id=0, sort="-created"),
+        schemas.TodoFilter(category_id=0),
+    ):
+        await TodoRepository.get_todos(session, filters, 1)
+        await TodoRepository.get_todos(session, filters, 1, cursor)
+    await TodoRepository.get_todo(session, 0)
+    await TodoRepository.get_todo_with_related(session, 0)
+    await TodoRepository.search_todos(
+        session, "warmup", schemas.TodoFilter(user_id=0), 1
+    )
+    await UserRepository.get_user(session, "")
+    await UserRepository.get_user_by_id(session, 0)
+    await UserRepository.get_user_with_related(session, 0, 1)
+    await UserRepository.get_users(session, 0, 1)
+    await CategoryRepository.get_category(session, 0)
+    await CategoryRepository.get_category_with_related(session, 0, 1)
+    await CategoryRepository.get_categories(session)
+    await TodoCounterRepository.get_user_stats(session, 0)
+    await TodoCounterRepository.get_category_stats(session)
+    await VersionRepository.get_versions(session, "todo", "user", "category")
+    await ChangeRepository.get_changes(session, 0, 0, 1)
+
+
+def build_validators():
+    # Схемы со ссылками вперёд достраиваются при первом использовании
+    for schema in vars(schemas).values():
+        if (
+            inspect.isclass(schema)
+            and issubclass(schema, BaseModel)
+            and schema is not BaseModel
+        ):
+            schema.model_rebuild()
+    # passlib выбирает бэкенд bcrypt при первой проверке пароля
+    pwd_context.handler("bcrypt").get_backend()
+
+
+async def warm_up(
+    pools: list[tuple[AsyncEngine, int]], read_session: sessionmaker
+) -> dict[str, float]:
+    """Prepares a worker before it serves; returns the seconds per phase.
+
+    pools pairs every distinct engine with how many connections to open.
+    """
+    timings = {}
+    start = time.perf_counter()
+    for engine, size in pools:
+        await open_connections(engine, size)
+    timings["connections"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    async with read_session() as session:
+        await prime_queries(session)
+    timings["queries"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    build_validators()
+    timings["validators"] = time.perf_counter() - start
+    logger.info(
+        "Warm-up done: %s",
+        ", ".join(
+            f"{phase} {seconds * 1000:.0f} ms" for phase, seconds in timings.items()
+        ),
+    )
+    return timings
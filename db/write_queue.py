@@ -0,0 +1,111 @@
+import asyncio
+import logging
+
+from fastapi import HTTPException, status
+
+from config import settings
+from db.crud import TodoRepository
+
+
+logger = logging.getLogger(__name__)
+
+
+class TodoWriteQueue:
+    """Write-behind queue that group-commits todo mutations.
+
+    Requests put validated mutations on the queue; a single background task
+    applies them in batches, one transaction and one commit per batch.
+    """
+
+    def __init__(self, max_batch: int, flush_interval: float, max_pending: int):
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.batches = 0
+        self.mutations = 0
+        self.failures = 0
+        self._queue: asyncio.Queue = asyncio.Queue(max_pending)
+
+    async def submit(self, mutation: tuple, durable: bool = True):
+        """Queues a mutation for TodoRepository.apply_mutations.
+
+        With durable set, waits for the batch commit and returns the
+        mutation's result or raises its error. Otherwise returns None as soon
+        as the mutation is queued.
+        """
+        future = asyncio.get_running_loop().create_future() if durable else None
+        try:
+            self._queue.put_nowait((mutation, future))
+        except asyncio.QueueFull:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many pending writes, try later",
+                headers={"Retry-After": "1"},
+            )
+        if future is not None:
+            return await future
+        return None
+
+    def _take_batch(self, batch: list):
+        while len(batch) < self.max_batch and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+
+    async def flush(self, session_factory, batch: list):
+        try:
+            async with session_factory() as session:
+                results = await TodoRepository.apply_mutations(
+                    session, [mutation for mutation, _ in batch]
+                )
+        except Exception as exc:
+            if len(batch) > 1:
+                # Одна плохая мутация не должна ронять весь батч
+                for item in batch:
+                    await self.flush(session_factory, [item])
+                return
+            self.failures += 1
+            mutation, future = batch[0]
+            if future is None:
+                logger.error("Accepted todo mutation %r failed: %s", mutation, exc)
+            elif not future.done():
+                future.set_exception(exc)
+            return
+        self.batches += 1
+        self.mutations += len(batch)
+        for (_, future), result in zip(batch, results):
+            if future is not None and not future.done():
+                future.set_result(result)
+
+    async def run(self, session_factory):
+        while True:
+            batch = [await self._queue.get()]
+            # Даём набраться батчу, если очередь ещё не заполнила его сама
+            if self.flush_interval and self._queue.qsize() < self.max_batch:
+                await asyncio.sleep(self.flush_interval)
+            self._take_batch(batch)
+            stopping = None in batch
+            batch = [item for item in batch if item is not None]
+            if batch:
+                try:
+                    await self.flush(session_factory, batch)
+                except Exception:
+                    logger.exception("Failed to flush todo mutations")
+            if stopping:
+                return
+
+    async def stop(self):
+        """Lets run() flush what is already queued and return."""
+        await self._queue.put(None)
+
+    def stats(self):
+        return {
+            "pending": self._queue.qsize(),
+            "batches": self.batches,
+            "mutations": self.mutations,
+            "failures": self.failures,
+        }
+
+
+todo_write_queue = TodoWriteQueue(
+    settings.TODO_WRITE_BATCH_SIZE,
+    settings.TODO_WRITE_FLUSH_MS / 1000,
+    settings.TODO_WRITE_MAX_PENDING,
+)
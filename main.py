@@ -1,22 +1,81 @@
 import asyncio
+from contextlib import asynccontextmanager
 
 from fastapi import FastAPI, Request, status
 from fastapi.responses import JSONResponse
-import uvicorn
+from sqlalchemy.exc import IntegrityError
 
 from routes.login import loginroute
 from routes.todos import todosroute
 from routes.admin import adminrouter
 from routes.category import categoriesrouter
-from db.database import init_models
+from routes.health import healthroute, worker_state
+from routes.metrics import metricsroute
+from config import settings
+from db.database import async_engine, async_read_session, async_session, read_engine
+from db.warmup import warm_up
+from db.events import event_hub
+from db.write_queue import todo_write_queue
+from monitoring.metrics import MetricsMiddleware, monitor_event_loop
+from monitoring.queries import QueryRecorderMiddleware
+from security.limits import ConcurrencyLimitMiddleware
+from security.pwdcrypt import password_hasher
+from security.security import revoked_tokens
 
-app = FastAPI()
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if settings.STARTUP_WARMUP:
+        pools = [(async_engine, settings.DB_POOL_SIZE)]
+        if read_engine is not async_engine:
+            pools.append((read_engine, settings.DB_READ_POOL_SIZE))
+        await warm_up(pools, async_read_session)
+    revocations = asyncio.create_task(
+        revoked_tokens.run(async_read_session, settings.REVOCATION_REFRESH_SECONDS)
+    )
+    events = asyncio.create_task(event_hub.run())
+    if settings.METRICS_ENABLED:
+        loop_lag = asyncio.create_task(
+            monitor_event_loop(settings.METRICS_LOOP_LAG_INTERVAL_SECONDS)
+        )
+    if settings.TODO_WRITE_BEHIND:
+        todo_writes = asyncio.create_task(todo_write_queue.run(async_session))
+    worker_state.ready = True
+    yield
+    # Сюда uvicorn доходит, когда текущие запросы уже завершены
+    worker_state.draining = True
+    if settings.TODO_WRITE_BEHIND:
+        # Дописываем уже принятые мутации до остановки
+        await todo_write_queue.stop()
+        await todo_writes
+    background = [events, revocations]
+    if settings.METRICS_ENABLED:
+        background.append(loop_lag)
+    for task in background:
+        task.cancel()
+    await asyncio.gather(*background, return_exceptions=True)
+    password_hasher.shutdown()
+    await async_engine.dispose()
+    if read_engine is not async_engine:
+        await read_engine.dispose()
+
+
+app = FastAPI(lifespan=lifespan)
 
+
+app.include_router(healthroute, prefix="/health")
 app.include_router(loginroute, prefix="/auth")
 app.include_router(todosroute, prefix="/todo")
 app.include_router(adminrouter, prefix="/admin")
 app.include_router(categoriesrouter, prefix="/category")
+# Добавлен первым — внутренний: метрики и запись запросов видят отказы 503
+if settings.MAX_CONCURRENT_REQUESTS:
+    app.add_middleware(ConcurrencyLimitMiddleware)
+if settings.METRICS_ENABLED:
+    app.include_router(metricsroute)
+    app.add_middleware(MetricsMiddleware)
+if settings.QUERY_RECORDER:
+    app.add_middleware(QueryRecorderMiddleware)
 
 
 @app.exception_handler(ValueError)
@@ -27,11 +86,20 @@ async def value_error_exception_handler(request: Request, exc: ValueError):
     )
 
 
+@app.exception_handler(IntegrityError)
+async def integrity_error_exception_handler(request: Request, exc: IntegrityError):
+    return JSONResponse(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        content={"message": "Referenced object doesn't exist or value isn't unique"},
+    )
+
+
 @app.get("/")
 async def index():
     return "Todo list API"
 
 
 if __name__ == "__main__":
-    asyncio.run(init_models())
-    uvicorn.run(app="main:app", host="127.0.0.1", port=8000, workers=3, reload=True)
+    from server import serve
+
+    serve()
@@ -0,0 +1,67 @@
+import argparse
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+from config import settings
+from db.crud import ChangeRepository, TodoCounterRepository, TodoRepository
+from db.database import async_engine, async_session
+from db.schema import upgrade_schema
+
+
+async def migrate():
+    await upgrade_schema(async_engine)
+    print("Schema is up to date")
+
+
+async def recount():
+    async with async_session() as session:
+        fixed = await TodoCounterRepository.recount(session)
+    print(f"Todo counters fixed on {fixed} rows")
+
+
+async def reindex():
+    async with async_session() as session:
+        await TodoRepository.rebuild_search_index(session)
+    print("Todo search index rebuilt")
+
+
+async def sequence():
+    async with async_session() as session:
+        stamped = await ChangeRepository.sequence_unstamped(session)
+    print(f"Change sequence assigned to {stamped} rows")
+
+
+async def purge_tombstones():
+    before = datetime.now(timezone.utc) - timedelta(
+        days=settings.TOMBSTONE_RETENTION_DAYS
+    )
+    async with async_session() as session:
+        purged = await ChangeRepository.purge_tombstones(
+            session, before.replace(tzinfo=None)
+        )
+    print(f"Purged {purged} tombstones")
+
+
+COMMANDS = {
+    "migrate": (migrate, "Apply Alembic migrations; run before starting workers"),
+    "recount": (recount, "Recompute user and category todo counters from todo"),
+    "reindex": (reindex, "Create and rebuild the todo full-text search index"),
+    "sequence": (sequence, "Stamp rows written before updated_seq existed"),
+    "purge-tombstones": (
+        purge_tombstones,
+        "Delete tombstones older than TOMBSTONE_RETENTION_DAYS",
+    ),
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintenance commands")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    for name, (_, help_text) in COMMANDS.items():
+        subparsers.add_parser(name, help=help_text)
+    args = parser.parse_args()
+    asyncio.run(COMMANDS[args.command][0]())
+
+
+if __name__ == "__main__":
+    main()
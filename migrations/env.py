@@ -0,0 +1,59 @@
+import asyncio
+from logging.config import fileConfig
+
+from alembic import context
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from config import settings
+from db.models import Base
+
+
+config = context.config
+if config.config_file_name is not None and not config.attributes.get("connection"):
+    fileConfig(config.config_file_name, disable_existing_loggers=False)
+
+target_metadata = Base.metadata
+
+
+def include_name(name, type_, parent_names):
+    # Таблицы FTS5 создаёт DDL из TODO_SEARCH_DDL, в метаданных их нет
+    return not (type_ == "table" and name.startswith("todo_fts"))
+
+
+def configure(**options):
+    context.configure(
+        target_metadata=target_metadata,
+        include_name=include_name,
+        # SQLite меняет столбцы только пересозданием таблицы
+        render_as_batch=True,
+        compare_type=True,
+        **options,
+    )
+
+
+def run_offline():
+    configure(url=settings.DB_URL, literal_binds=True)
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_with_connection(connection):
+    configure(connection=connection)
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+async def run_online():
+    engine = create_async_engine(settings.DB_URL)
+    async with engine.connect() as connection:
+        await connection.run_sync(run_with_connection)
+    await engine.dispose()
+
+
+if context.is_offline_mode():
+    run_offline()
+elif config.attributes.get("connection") is not None:
+    # Вызов из db.schema.upgrade_schema: соединение уже открыто в его цикле
+    run_with_connection(config.attributes["connection"])
+else:
+    asyncio.run(run_online())
@@ -0,0 +1,177 @@
+"""Indexes, counters, change sequence, tombstones, revocations and search
+
+Everything added to the models before the schema was migrated. Databases
+made by create_all at any point in between already have part of it, so
+each object is only created when it is missing, and data is backfilled
+only for columns this revision adds.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 00:00:00
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+from db.models import TODO_SEARCH_DDL
+
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+INDEXES = {
+    "todo": {
+        "ix_todo_created": ["created", "id"],
+        "ix_todo_user_completed_created": ["user_id", "completed", "created"],
+        "ix_todo_category_created": ["category_id", "created"],
+        "ix_todo_completed_created": ["completed", "created"],
+        "ix_todo_updated_seq": ["updated_seq"],
+        "ix_todo_user_updated_seq": ["user_id", "updated_seq"],
+    },
+    "category": {"ix_category_updated_seq": ["updated_seq"]},
+}
+
+
+def add_missing_columns(inspector, table: str, columns: list) -> list[str]:
+    existing = {column["name"] for column in inspector.get_columns(table)}
+    added = []
+    for column in columns:
+        if column.name not in existing:
+            op.add_column(table, column)
+            added.append(column.name)
+    return added
+
+
+def counter_columns():
+    return [
+        sa.Column("todos_count", sa.Integer(), server_default="0", nullable=False),
+        sa.Column("todos_completed", sa.Integer(), server_default="0", nullable=False),
+    ]
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    tables = set(inspector.get_table_names())
+
+    added = {
+        "user": add_missing_columns(inspector, "user", counter_columns()),
+        "category": add_missing_columns(
+            inspector,
+            "category",
+            counter_columns()
+            + [
+                sa.Column(
+                    "updated_seq", sa.Integer(), server_default="0", nullable=False
+                )
+            ],
+        ),
+        "todo": add_missing_columns(
+            inspector,
+            "todo",
+            [
+                sa.Column(
+                    "updated_seq", sa.Integer(), server_default="0", nullable=False
+                )
+            ],
+        ),
+    }
+    for table, indexes in INDEXES.items():
+        existing = {index["name"] for index in inspector.get_indexes(table)}
+        for name, columns in indexes.items():
+            if name not in existing:
+                op.create_index(name, table, columns)
+
+    if "table_version" not in tables:
+        op.create_table(
+            "table_version",
+            sa.Column("name", sa.String(length=64), nullable=False),
+            sa.Column("version", sa.Integer(), nullable=False),
+            sa.PrimaryKeyConstraint("name"),
+        )
+    if "token_revocation" not in tables:
+        op.create_table(
+            "token_revocation",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("user_id", sa.Integer(), nullable=False),
+            sa.Column("not_before", sa.Float(), nullable=False),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index(
+            "ix_token_revocation_not_before", "token_revocation", ["not_before"]
+        )
+    if "tombstone" not in tables:
+        op.create_table(
+            "tombstone",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("entity", sa.String(length=16), nullable=False),
+            sa.Column("entity_id", sa.Integer(), nullable=False),
+            sa.Column("user_id", sa.Integer(), nullable=True),
+            sa.Column("updated_seq", sa.Integer(), nullable=False),
+            sa.Column(
+                "deleted", sa.DateTime(), server_default=sa.func.now(), nullable=False
+            ),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index(
+            "ix_tombstone_entity_updated_seq", "tombstone", ["entity", "updated_seq"]
+        )
+        op.create_index(
+            "ix_tombstone_user_updated_seq", "tombstone", ["user_id", "updated_seq"]
+        )
+        op.create_index("ix_tombstone_deleted", "tombstone", ["deleted"])
+
+    # Счётчики пересчитываем, только если столбцы появились сейчас
+    for table, fk in (("user", "user_id"), ("category", "category_id")):
+        if "todos_count" in added[table]:
+            op.execute(
+                f'UPDATE "{table}" SET '
+                f'todos_count = (SELECT count(*) FROM todo WHERE {fk} = "{table}".id), '
+                f"todos_completed = (SELECT count(*) FROM todo "
+                f'WHERE {fk} = "{table}".id AND todo.completed)'
+            )
+    # Новые updated_seq: сначала категории, затем todo, как в sequence_unstamped
+    if "updated_seq" in added["category"] and "updated_seq" in added["todo"]:
+        op.execute("UPDATE category SET updated_seq = id")
+        op.execute(
+            "UPDATE todo SET updated_seq = id + "
+            "(SELECT coalesce(max(id), 0) FROM category)"
+        )
+        op.execute(
+            "INSERT INTO table_version (name, version) SELECT 'change_seq', "
+            "(SELECT coalesce(max(id), 0) FROM category) + "
+            "(SELECT coalesce(max(id), 0) FROM todo)"
+        )
+
+    dialect = op.get_bind().dialect.name
+    fts_missing = dialect == "sqlite" and "todo_fts" not in tables
+    for statement in TODO_SEARCH_DDL.get(dialect, ()):
+        op.execute(statement)
+    if fts_missing:
+        # Внешний контент FTS5 пуст, пока индекс не перестроен из todo
+        op.execute("INSERT INTO todo_fts(todo_fts) VALUES ('rebuild')")
+
+
+def downgrade():
+    if op.get_bind().dialect.name == "sqlite":
+        for trigger in ("todo_fts_ai", "todo_fts_ad", "todo_fts_au"):
+            op.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        op.execute("DROP TABLE IF EXISTS todo_fts")
+    else:
+        op.execute("DROP INDEX IF EXISTS ix_todo_text_search")
+    op.drop_table("tombstone")
+    op.drop_table("token_revocation")
+    op.drop_table("table_version")
+    for table, indexes in INDEXES.items():
+        for name in indexes:
+            op.drop_index(name, table_name=table)
+    with op.batch_alter_table("todo") as batch:
+        batch.drop_column("updated_seq")
+    with op.batch_alter_table("category") as batch:
+        batch.drop_column("updated_seq")
+        batch.drop_column("todos_completed")
+        batch.drop_column("todos_count")
+    with op.batch_alter_table("user") as batch:
+        batch.drop_column("todos_completed")
+        batch.drop_column("todos_count")
@@ -0,0 +1,278 @@
+import asyncio
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+
+# Границы корзин в секундах, как у prometheus_client по умолчанию
+LATENCY_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+def format_labels(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labelnames: tuple = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = labelnames
+        self.values: defaultdict[tuple, float] = defaultdict(float)
+
+    def inc(self, labels: tuple = (), amount: float = 1):
+        self.values[labels] += amount
+
+    def samples(self):
+        for labels, value in self.values.items():
+            yield f"{self.name}{format_labels(self.labelnames, labels)} {value}"
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float, labels: tuple = ()):
+        self.values[labels] = value
+
+
+class Histogram:
+    """Fixed-bucket histogram; observe() is one bisect and two additions."""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        labelnames: tuple = (),
+        buckets: tuple = LATENCY_BUCKETS,
+    ):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = labelnames
+        self.buckets = buckets
+        # labels -> [счётчики по корзинам + корзина +Inf, сумма]
+        self.series: dict[tuple, list] = {}
+
+    def observe(self, value: float, labels: tuple = ()):
+        series = self.series.get(labels)
+        if series is None:
+            series = self.series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def samples(self):
+        for labels, (counts, total) in self.series.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += count
+                label_text = format_labels(self.labelnames, labels, f'le="{bound}"')
+                yield f"{self.name}_bucket{label_text} {cumulative}"
+            label_text = format_labels(self.labelnames, labels)
+            yield f"{self.name}_sum{label_text} {total}"
+            yield f"{self.name}_count{label_text} {cumulative}"
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.metrics = []
+
+    def add(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format."""
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.help_text}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+http_requests = registry.add(
+    Counter(
+        "http_requests_total",
+        "HTTP requests by route and status",
+        ("method", "route", "status"),
+    )
+)
+http_request_duration = registry.add(
+    Histogram(
+        "http_request_duration_seconds",
+        "Time from request start to the last body byte",
+        ("method", "route"),
+    )
+)
+http_requests_in_progress = registry.add(
+    Gauge("http_requests_in_progress", "HTTP requests being served")
+)
+db_statements_per_request = registry.add(
+    Histogram(
+        "db_statements_per_request",
+        "SQL statements executed while serving one request",
+        ("method", "route"),
+        COUNT_BUCKETS,
+    )
+)
+db_request_duration = registry.add(
+    Histogram(
+        "db_request_duration_seconds",
+        "Time one request spent executing SQL",
+        ("method", "route"),
+    )
+)
+db_statement_duration = registry.add(
+    Histogram("db_statement_duration_seconds", "Duration of one SQL statement")
+)
+db_pool_wait = registry.add(
+    Histogram(
+        "db_pool_checkout_wait_seconds",
+        "Time spent waiting for a pooled connection",
+        ("pool",),
+    )
+)
+phase_duration = registry.add(
+    Histogram(
+        "app_phase_duration_seconds",
+        "Time spent in instrumented phases like password hashing",
+        ("phase",),
+    )
+)
+event_loop_lag = registry.add(
+    Histogram("event_loop_lag_seconds", "How late the event loop ran a timer")
+)
+
+
+class RequestStats:
+    __slots__ = ("statements", "db_seconds")
+
+    def __init__(self):
+        self.statements = 0
+        self.db_seconds = 0.0
+
+
+# Заполняется обработчиками событий движка, пока идёт запрос
+current_request: ContextVar[Optional[RequestStats]] = ContextVar(
+    "current_request", default=None
+)
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware; BaseHTTPMiddleware would cost a task per request."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        stats = RequestStats()
+        token = current_request.set(stats)
+        http_requests_in_progress.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - start
+            http_requests_in_progress.inc(amount=-1)
+            current_request.reset(token)
+            # Шаблон пути, а не сам путь, иначе каждый id станет отдельной серией
+            route = scope.get("route")
+            path = route.path if route is not None else "unmatched"
+            method = scope["method"]
+            http_requests.inc((method, path, status_code))
+            http_request_duration.observe(elapsed, (method, path))
+            db_statements_per_request.observe(stats.statements, (method, path))
+            db_request_duration.observe(stats.db_seconds, (method, path))
+
+
+def instrument_engine(engine):
+    """Counts and times every statement of the engine."""
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def before_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metrics_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine.sync_engine, "after_cursor_execute")
+    def after_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["metrics_start"].pop()
+        db_statement_duration.observe(elapsed)
+        stats = current_request.get()
+        if stats is not None:
+            stats.statements += 1
+            stats.db_seconds += elapsed
+
+    @event.listens_for(engine.sync_engine, "handle_error")
+    def on_error(context):
+        # Упавший запрос не дойдёт до after_cursor_execute
+        if context.connection is not None:
+            starts = context.connection.info.get("metrics_start")
+            if starts:
+                starts.pop()
+
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """Async queue pool that records how long checkouts wait."""
+
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            return super().connect()
+        finally:
+            db_pool_wait.observe(
+                time.perf_counter() - start, (self.logging_name or "default",)
+            )
+
+
+@contextmanager
+def timed_phase(phase: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        phase_duration.observe(time.perf_counter() - start, (phase,))
+
+
+async def monitor_event_loop(interval: float):
+    """Measures how late a sleep(interval) wakes up; runs until cancelled."""
+    loop = asyncio.get_running_loop()
+    while True:
+        start = loop.time()
+        await asyncio.sleep(interval)
+        event_loop_lag.observe(max(0.0, loop.time() - start - interval))
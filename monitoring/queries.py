@@ -0,0 +1,187 @@
+import logging
+import re
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+from fastapi import HTTPException, status
+from sqlalchemy import event
+
+from config import settings
+
+
+logger = logging.getLogger(__name__)
+
+# Список плейсхолдеров любой длины: qmark, asyncpg и pyformat
+PLACEHOLDER = r"(?:\?|\$\d+|%\(\w+\)s|%s)"
+PLACEHOLDER_LIST = re.compile(rf"\(\s*{PLACEHOLDER}(?:\s*,\s*{PLACEHOLDER})*\s*\)")
+REPEATED_LIST = re.compile(r"\(\?\)(?:\s*,\s*\(\?\))+")
+
+
+def statement_shape(statement: str) -> str:
+    """The statement with IN lists and multi-row VALUES collapsed.
+
+    SQLAlchemy already binds parameters, so two executions of the same
+    query only differ in how many items an expanding IN or VALUES got.
+    """
+    shape = PLACEHOLDER_LIST.sub("(?)", statement)
+    return " ".join(REPEATED_LIST.sub("(?)", shape).split())
+
+
+class QueryRecorder:
+    """Statements executed in one request, or one assert_queries block."""
+
+    def __init__(
+        self,
+        repeat_threshold: int,
+        budget: Optional[int] = None,
+        parent: Optional["QueryRecorder"] = None,
+    ):
+        self.repeat_threshold = repeat_threshold
+        self.budget = budget
+        self.parent = parent
+        self.statements: list[str] = []
+        # Проблемы вложенных записей, например запросов внутри assert_queries
+        self.reported: list[str] = []
+        self.checked = False
+
+    def record(self, statement: str):
+        self.statements.append(statement)
+        if self.parent is not None:
+            self.parent.record(statement)
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    def repeated(self) -> dict[str, int]:
+        """Shapes run at least repeat_threshold times: likely N+1 loads."""
+        shapes = Counter(statement_shape(statement) for statement in self.statements)
+        return {
+            shape: count
+            for shape, count in shapes.items()
+            if count >= self.repeat_threshold
+        }
+
+    def problems(self) -> list[str]:
+        problems = list(self.reported)
+        if self.budget is not None and self.count > self.budget:
+            problems.append(f"{self.count} statements over a budget of {self.budget}")
+        for shape, count in self.repeated().items():
+            problems.append(f"{count}x {shape}")
+        return problems
+
+
+current_recorder: ContextVar[Optional[QueryRecorder]] = ContextVar(
+    "current_recorder", default=None
+)
+
+
+def record_queries(engine):
+    """Feeds every statement of the engine to the active recorder."""
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def before_execute(conn, cursor, statement, parameters, context, executemany):
+        recorder = current_recorder.get()
+        if recorder is not None:
+            recorder.record(statement)
+
+
+def query_budget(max_statements: int):
+    """Route dependency declaring how many statements the route may run.
+
+    Usage: ``dependencies=[Depends(query_budget(3))]``. The budget covers
+    the whole request, authentication and response serialization included.
+    A no-op unless QUERY_RECORDER is on or the call runs in assert_queries.
+    """
+
+    async def set_budget():
+        recorder = current_recorder.get()
+        if recorder is not None and recorder.budget is None:
+            recorder.budget = max_statements
+
+    return set_budget
+
+
+def check_query_budget():
+    """Called by the session dependencies once the response is serialized."""
+    recorder = current_recorder.get()
+    if recorder is None or recorder.checked:
+        return
+    recorder.checked = True
+    problems = recorder.problems()
+    if not problems:
+        return
+    if recorder.parent is not None:
+        recorder.parent.reported.extend(problems)
+        return
+    if settings.QUERY_BUDGET_STRICT:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail={"query_problems": problems},
+        )
+    logger.warning("Query problems: %s", "; ".join(problems))
+
+
+class QueryRecorderMiddleware:
+    """Records the statements of each request and reports them in headers."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        # Внутри assert_queries запросы идут и в его счётчик
+        recorder = QueryRecorder(
+            settings.QUERY_REPEAT_THRESHOLD, parent=current_recorder.get()
+        )
+
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start":
+                headers = message.setdefault("headers", [])
+                headers.append((b"x-query-count", str(recorder.count).encode()))
+                headers.append(
+                    (b"x-query-repeated", str(len(recorder.repeated())).encode())
+                )
+                if recorder.budget is not None:
+                    headers.append((b"x-query-budget", str(recorder.budget).encode()))
+            await send(message)
+
+        token = current_recorder.set(recorder)
+        try:
+            await self.app(scope, receive, send_with_headers)
+        finally:
+            current_recorder.reset(token)
+
+
+@contextmanager
+def assert_queries(
+    max_statements: Optional[int] = None,
+    repeat_threshold: int = settings.QUERY_REPEAT_THRESHOLD,
+):
+    """Fails if the block runs more statements than allowed or an N+1.
+
+    Budgets declared by routes with query_budget() apply too, so a test can
+    simply wrap an in-process request:
+
+        with assert_queries() as recorder:
+            await client.get("/todo/1/")
+    """
+    recorder = QueryRecorder(repeat_threshold, max_statements)
+    # Проверяется на выходе из блока, а не после каждой сессии
+    recorder.checked = True
+    token = current_recorder.set(recorder)
+    try:
+        yield recorder
+    finally:
+        current_recorder.reset(token)
+    problems = recorder.problems()
+    if problems:
+        raise AssertionError(
+            "Query check failed:\n"
+            + "\n".join(problems)
+            + "\nStatements:\n"
+            + "\n".join(recorder.statements)
+        )
@@ -1,15 +1,39 @@
-from typing import Union
-
-from fastapi import APIRouter, Response, HTTPException, status, Depends
+from typing import Optional, Union
+
+from fastapi import (
+    APIRouter,
+    Request,
+    Response,
+    HTTPException,
+    Query,
+    status,
+    Depends,
+)
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from security.security import get_user_from_token
-from db.schemas import UserDB, UserAuth, UserPosition, UserWithRelation
-from db.database import get_session
+from config import settings
+from security.limits import concurrency_limiter, rate_limiter
+from security.security import get_user_from_token, revoked_tokens, token_cache
+from db.schemas import (
+    TodoFilter,
+    TodoPage,
+    UserDB,
+    UserAuth,
+    UserPosition,
+    UserWithRelation,
+)
+from db.database import get_read_session, get_session
+from db.cache import category_cache
+from db.events import event_hub
 from db.crud import UserRepository
+from monitoring.queries import query_budget
+from routes.etag import check_etag
+from routes.responses import FastSerializer, fast_json_response
+from routes.todos import get_todo_page
 
 
 adminrouter = APIRouter()
+user_serializer = FastSerializer(UserDB)
 
 
 def is_admin(auth_user: UserAuth):
@@ -29,24 +53,56 @@ async def get_admin_info(
         return {"message": "Welcome, Admin!"}
 
 
+@adminrouter.get("/cache/")
+async def get_cache_stats(
+    auth_user: UserAuth = Depends(get_user_from_token),
+):
+    if is_admin(auth_user):
+        return {
+            "category": category_cache.stats(),
+            "token": token_cache.stats(),
+            "events": event_hub.stats(),
+            "rate_limits": rate_limiter.stats(),
+            "admission": concurrency_limiter.stats(),
+        }
+
+
 @adminrouter.get("/users/", response_model=list[UserDB])
 async def get_users(
-    session: AsyncSession = Depends(get_session),
+    request: Request,
+    response: Response,
+    session: AsyncSession = Depends(get_read_session),
     auth_user: UserAuth = Depends(get_user_from_token),
 ):
     if is_admin(auth_user):
+        not_modified = await check_etag(request, response, session, ("user",))
+        if not_modified:
+            return not_modified
         users = await UserRepository.get_users(session)
+        if settings.FAST_JSON_RESPONSES:
+            return fast_json_response(user_serializer.rows(users), response)
         return users
 
 
-@adminrouter.get("/users/{user_id}/", response_model=UserWithRelation)
+@adminrouter.get(
+    "/users/{user_id}/",
+    response_model=UserWithRelation,
+    dependencies=[Depends(query_budget(4))],
+)
 async def get_user(
     user_id: int,
-    session: AsyncSession = Depends(get_session),
+    request: Request,
+    response: Response,
+    session: AsyncSession = Depends(get_read_session),
     auth_user: UserAuth = Depends(get_user_from_token),
 ):
     if is_admin(auth_user):
-        user = await UserRepository.get_user_with_related(session, user_id)
+        not_modified = await check_etag(request, response, session, ("user", "todo"))
+        if not_modified:
+            return not_modified
+        user = await UserRepository.get_user_with_related(
+            session, user_id, settings.RELATED_TODOS_LIMIT
+        )
         if user:
             return user
         raise HTTPException(
@@ -54,6 +110,33 @@ async def get_user(
         )
 
 
+@adminrouter.get(
+    "/users/{user_id}/todos/",
+    response_model=TodoPage,
+    dependencies=[Depends(query_budget(4))],
+)
+async def get_user_todos(
+    user_id: int,
+    request: Request,
+    response: Response,
+    limit: int = Query(settings.TODO_PAGE_SIZE, ge=1, le=settings.TODO_PAGE_SIZE_MAX),
+    cursor: Optional[str] = None,
+    filters: TodoFilter = Depends(),
+    session: AsyncSession = Depends(get_read_session),
+    auth_user: UserAuth = Depends(get_user_from_token),
+):
+    if is_admin(auth_user):
+        not_modified = await check_etag(request, response, session, ("user", "todo"))
+        if not_modified:
+            return not_modified
+        if await UserRepository.get_user_by_id(session, user_id) is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail="User doesn't exist"
+            )
+        filters.user_id = user_id
+        return await get_todo_page(session, response, filters, limit, cursor)
+
+
 @adminrouter.put("/users/{user_id}/", response_model=dict[str, Union[UserDB, str]])
 async def update_user_position(
     user_id: int,
@@ -67,6 +150,7 @@ async def update_user_position(
             updated_user = await UserRepository.update_user_position(
                 session, user, user_position
             )
+            revoked_tokens.revoke(user_id)
             return {"user": updated_user, "message": "User updated successfully!"}
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
@@ -80,7 +164,7 @@ async def delete_user(
     auth_user: UserAuth = Depends(get_user_from_token),
 ):
     if is_admin(auth_user):
-        user = await UserRepository.get_user_with_related(session, user_id)
+        user = await UserRepository.get_user_by_id(session, user_id)
         if user:
             if user.position.lower() == "admin":
                 raise HTTPException(
@@ -89,6 +173,7 @@ async def delete_user(
                 )
             result = await UserRepository.delete_user(session, user)
             if result:
+                revoked_tokens.revoke(user_id)
                 return Response(status_code=status.HTTP_204_NO_CONTENT)
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -1,13 +1,39 @@
-from typing import Union
-
-from fastapi import APIRouter, Response, HTTPException, status, Depends
+from typing import Optional, Union
+
+from fastapi import (
+    APIRouter,
+    Request,
+    Response,
+    HTTPException,
+    Query,
+    status,
+    Depends,
+)
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from config import settings
 from security.security import get_user_from_token
-from db.database import get_session
-from db.schemas import CategoryCreate, CategoryDB, CategoryWithRelation, UserAuth
-from db.crud import CategoryRepository
+from db.database import get_read_session, get_session
+from db.schemas import (
+    CategoryCreate,
+    CategoryDB,
+    CategoryStats,
+    CategoryWithRelation,
+    TodoFilter,
+    TodoPage,
+    UserAuth,
+)
+from db.crud import (
+    CachedCategoryRepository,
+    CategoryRepository,
+    TodoCounterRepository,
+    VersionRepository,
+)
 from routes.admin import is_admin
+from monitoring.queries import query_budget
+from routes.etag import check_etag, check_versions
+from routes.responses import fast_json_response
+from routes.todos import get_todo_page
 
 
 categoriesrouter = APIRouter()
@@ -23,11 +49,24 @@ def user_can_read_categories(auth_user: UserAuth):
 
 @categoriesrouter.get("/", response_model=list[CategoryDB])
 async def get_categories(
-    session: AsyncSession = Depends(get_session),
+    request: Request,
+    response: Response,
+    session: AsyncSession = Depends(get_read_session),
     auth_user: UserAuth = Depends(get_user_from_token),
 ):
     if user_can_read_categories(auth_user):
-        categories = await CategoryRepository.get_categories(session)
+        versions = await VersionRepository.get_versions(
+            session, *CachedCategoryRepository.list_tables
+        )
+        not_modified = check_versions(request, response, versions)
+        if not_modified:
+            return not_modified
+        if settings.FAST_JSON_RESPONSES:
+            categories = await CachedCategoryRepository.get_categories(
+                session, versions, raw=True
+            )
+            return fast_json_response(categories, response)
+        categories = await CachedCategoryRepository.get_categories(session, versions)
         return categories
 
 
@@ -42,14 +81,46 @@ async def create_category(
         return {"code": category, "message": "Category created successfully"}
 
 
-@categoriesrouter.get("/{cat_id}/", response_model=CategoryWithRelation)
+@categoriesrouter.get("/stats/", response_model=list[CategoryStats])
+async def get_category_stats(
+    request: Request,
+    response: Response,
+    session: AsyncSession = Depends(get_read_session),
+    auth_user: UserAuth = Depends(get_user_from_token),
+):
+    if user_can_read_categories(auth_user):
+        not_modified = await check_etag(
+            request, response, session, ("category", "todo")
+        )
+        if not_modified:
+            return not_modified
+        return await TodoCounterRepository.get_category_stats(session)
+
+
+@categoriesrouter.get(
+    "/{cat_id}/",
+    response_model=CategoryWithRelation,
+    dependencies=[Depends(query_budget(5))],
+)
 async def get_category(
     cat_id: int,
-    session: AsyncSession = Depends(get_session),
+    request: Request,
+    response: Response,
+    session: AsyncSession = Depends(get_read_session),
     auth_user: UserAuth = Depends(get_user_from_token),
 ):
     if user_can_read_categories(auth_user):
-        category = await CategoryRepository.get_category_with_related(session, cat_id)
+        versions = await VersionRepository.get_versions(
+            session, *VersionRepository.categories([cat_id])
+        )
+        not_modified = check_versions(request, response, versions)
+        if not_modified:
+            return not_modified
+        category = await CachedCategoryRepository.get_category_with_related(
+            session, cat_id, versions, raw=settings.FAST_JSON_RESPONSES
+        )
+        if category and settings.FAST_JSON_RESPONSES:
+            return fast_json_response(category, response)
         if category:
             return category
         raise HTTPException(
@@ -57,6 +128,33 @@ async def get_category(
         )
 
 
+@categoriesrouter.get(
+    "/{cat_id}/todos/", response_model=TodoPage, dependencies=[Depends(query_budget(4))]
+)
+async def get_category_todos(
+    cat_id: int,
+    request: Request,
+    response: Response,
+    limit: int = Query(settings.TODO_PAGE_SIZE, ge=1, le=settings.TODO_PAGE_SIZE_MAX),
+    cursor: Optional[str] = None,
+    filters: TodoFilter = Depends(),
+    session: AsyncSession = Depends(get_read_session),
+    auth_user: UserAuth = Depends(get_user_from_token),
+):
+    if user_can_read_categories(auth_user):
+        not_modified = await check_etag(
+            request, response, session, VersionRepository.categories([cat_id])
+        )
+        if not_modified:
+            return not_modified
+        if await CategoryRepository.get_category(session, cat_id) is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail="Category not found!"
+            )
+        filters.category_id = cat_id
+        return await get_todo_page(session, response, filters, limit, cursor)
+
+
 @categoriesrouter.put("/{cat_id}/", response_model=CategoryDB)
 async def update_category(
     cat_id: int,
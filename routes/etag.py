@@ -0,0 +1,52 @@
+from typing import Optional
+
+from fastapi import Request, Response, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from db.crud import VersionRepository
+
+
+def etag_matches(etag: str, if_none_match: Optional[str]):
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+def check_versions(
+    request: Request, response: Response, versions: list[int], scope: str = ""
+) -> Optional[Response]:
+    """Builds the ETag from already read table versions, see check_etag.
+
+    For routes that also build the body from these versions, e.g. a cache
+    key, so the ETag always describes the body that is sent.
+    """
+    etag = ".".join(map(str, versions))
+    if scope:
+        etag = f"{etag}-{scope}"
+    etag = f'"{etag}"'
+    if etag_matches(etag, request.headers.get("if-none-match")):
+        return Response(
+            status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag}
+        )
+    response.headers["ETag"] = etag
+    return None
+
+
+async def check_etag(
+    request: Request,
+    response: Response,
+    session: AsyncSession,
+    tables: tuple[str, ...],
+    scope: str = "",
+) -> Optional[Response]:
+    """Builds the ETag from table versions and answers 304 if it still matches.
+
+    Runs before the real query, so an unchanged resource costs one
+    primary-key lookup on table_version.
+    """
+    versions = await VersionRepository.get_versions(session, *tables)
+    return check_versions(request, response, versions, scope)
@@ -0,0 +1,59 @@
+import asyncio
+import os
+import time
+
+from fastapi import APIRouter, status
+from fastapi.responses import JSONResponse
+from sqlalchemy import text
+
+from config import settings
+from db.database import read_engine
+
+
+class WorkerState:
+    """Lifecycle of this worker process, as seen by the load balancer."""
+
+    def __init__(self):
+        self.started = time.time()
+        # Готов после прогрева и запуска фоновых задач
+        self.ready = False
+        # С сигнала остановки новые запросы лучше слать другим воркерам
+        self.draining = False
+
+
+worker_state = WorkerState()
+healthroute = APIRouter()
+
+
+async def ping_database():
+    # Пул ждёт не дольше таймаута: занятый пул тоже значит «не готов»
+    async with read_engine.connect() as conn:
+        await conn.execute(text("SELECT 1"))
+
+
+@healthroute.get("/live")
+async def liveness():
+    """The event loop of this worker answers."""
+    return {
+        "status": "ok",
+        "pid": os.getpid(),
+        "uptime": time.time() - worker_state.started,
+    }
+
+
+@healthroute.get("/ready")
+async def readiness():
+    """The worker is warmed up, not draining, and its database answers."""
+    body = {"pid": os.getpid(), "ready": worker_state.ready}
+    if worker_state.draining:
+        body["status"] = "draining"
+    elif not worker_state.ready:
+        body["status"] = "starting"
+    else:
+        try:
+            await asyncio.wait_for(ping_database(), settings.HEALTH_DB_TIMEOUT_SECONDS)
+        except Exception as exc:
+            body["status"] = f"database unavailable: {exc.__class__.__name__}"
+        else:
+            return {**body, "status": "ok"}
+    return JSONResponse(body, status_code=status.HTTP_503_SERVICE_UNAVAILABLE)
@@ -1,20 +1,39 @@
 from typing import Union
 
-from fastapi import APIRouter, HTTPException, status, Depends
+from fastapi import APIRouter, Form, HTTPException, status, Depends
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from db.schemas import UserCreate, UserDB
 from db.crud import UserRepository
+from config import settings
 from db.database import get_session
-from security.pwdcrypt import get_password_hash
-from security.security import authenticate_user, create_access_token
+from security.limits import limit_per_ip
+from security.pwdcrypt import get_password_hash_async
+from security.security import (
+    authenticate_user,
+    create_access_token,
+    create_refresh_token,
+    decode_token,
+    revoked_tokens,
+    unauthorized,
+)
 
 
 loginroute = APIRouter()
+# Регистрация и вход хешируют пароль: общий бакет на IP против перебора
+limit_password_checks = Depends(
+    limit_per_ip(
+        "login", settings.RATE_LIMIT_LOGIN_PER_SECOND, settings.RATE_LIMIT_LOGIN_BURST
+    )
+)
 
 
-@loginroute.post("/registration/", response_model=dict[str, Union[UserDB, str]])
+@loginroute.post(
+    "/registration/",
+    response_model=dict[str, Union[UserDB, str]],
+    dependencies=[limit_password_checks],
+)
 async def create_user(
     user_data: UserCreate = Depends(),
     session: AsyncSession = Depends(get_session),
@@ -24,7 +43,7 @@ async def create_user(
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST, detail="Email already registered"
         )
-    user_data.password = get_password_hash(user_data.password)
+    user_data.password = await get_password_hash_async(user_data.password)
 
     user = await UserRepository.create_user(session, user_data)
     if not user:
@@ -34,7 +53,7 @@ async def create_user(
     return {"user": user, "message": "User created successfully"}
 
 
-@loginroute.post("/login/")
+@loginroute.post("/login/", dependencies=[limit_password_checks])
 async def login_for_access_token(
     user_data: OAuth2PasswordRequestForm = Depends(),
     session: AsyncSession = Depends(get_session),
@@ -51,4 +70,29 @@ async def login_for_access_token(
         )
 
     access_token = create_access_token(user)
-    return {"access_token": access_token, "token_type": "bearer"}
+    refresh_token = create_refresh_token(user)
+    return {
+        "access_token": access_token,
+        "refresh_token": refresh_token,
+        "token_type": "bearer",
+    }
+
+
+@loginroute.post("/refresh/")
+async def refresh_access_token(
+    refresh_token: str = Form(),
+    session: AsyncSession = Depends(get_session),
+):
+    payload = decode_token(refresh_token, "refresh")
+    if revoked_tokens.is_revoked(payload.get("id"), payload.get("iat", 0.0)):
+        raise unauthorized("Token has been revoked")
+    # Позиция могла поменяться, поэтому берём актуального пользователя из БД
+    user = await UserRepository.get_user_by_id(session, payload.get("id"))
+    if not user:
+        raise unauthorized("User not found")
+
+    return {
+        "access_token": create_access_token(user),
+        "refresh_token": create_refresh_token(user),
+        "token_type": "bearer",
+    }
@@ -1,16 +1,61 @@
-from typing import Union
+import asyncio
+from typing import Optional, Union
 
-from fastapi import APIRouter, Response, HTTPException, status, Depends
+from fastapi import (
+    APIRouter,
+    Body,
+    Request,
+    Response,
+    HTTPException,
+    WebSocket,
+    Query,
+    status,
+    Depends,
+)
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from security.security import get_user_from_token
-from db.database import get_session
-from db.schemas import TodoCreate, TodoDB, TodoWithRelation, UserAuth
+from config import settings
+from security.security import get_user_from_connection, get_user_from_token
+from db.database import async_read_session, get_read_session, get_session
+from db.schemas import (
+    CategoryChange,
+    TodoBulkResult,
+    TodoBulkUpdate,
+    TodoChange,
+    TodoChanges,
+    TodoCreate,
+    TodoDB,
+    TodoFilter,
+    TodoPage,
+    TodoSearchResult,
+    TodoStats,
+    TodoWithRelation,
+    UserAuth,
+)
 from db.models import Todo
-from db.crud import TodoRepository
+from db.crud import ChangeRepository, TodoCounterRepository, TodoRepository
+from db.events import Subscription, event_hub, events_available
+from db.pagination import decode_cursor
+from db.write_queue import todo_write_queue
+from monitoring.queries import query_budget
+from routes.etag import check_etag
+from routes.responses import FastSerializer, fast_json_response
+from security.limits import limit_per_user
 
 
 todosroute = APIRouter()
+# Записи одного пользователя делят бакет, чтение не ограничено
+limit_todo_writes = Depends(
+    limit_per_user(
+        "todo_write",
+        settings.RATE_LIMIT_TODO_WRITE_PER_SECOND,
+        settings.RATE_LIMIT_TODO_WRITE_BURST,
+    )
+)
+todo_serializer = FastSerializer(TodoDB)
+todo_change_serializer = FastSerializer(TodoChange)
+category_change_serializer = FastSerializer(CategoryChange)
 
 
 def user_can_read_create_todos(auth_user: UserAuth):
@@ -21,43 +66,386 @@ def user_can_read_create_todos(auth_user: UserAuth):
     return True
 
 
+CANT_EDIT_DELETE_TODO = (
+    "You can't update or delete this Todo! Only author or admin can do that!"
+)
+
+
+def user_owns_todo(auth_user: UserAuth, todo_user_id: int):
+    return auth_user.id == todo_user_id or auth_user.position.lower() == "admin"
+
+
 def user_can_edit_delete_todos(auth_user: UserAuth, todo: Todo):
-    if auth_user.id != todo.user_id and auth_user.position.lower() != "admin":
+    if not user_owns_todo(auth_user, todo.user_id):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
-            detail="You can't update or delete this Todo! Only author or admin can do that!",
+            detail=CANT_EDIT_DELETE_TODO,
         )
     return True
 
 
-@todosroute.get("/", response_model=list[TodoDB])
+def check_bulk_permissions(auth_user: UserAuth, todo_ids: list[int], owners: dict):
+    allowed, results = [], {}
+    for todo_id in todo_ids:
+        owner = owners.get(todo_id)
+        if owner is None:
+            results[todo_id] = {
+                "id": todo_id,
+                "status": "not_found",
+                "detail": "Todo not found!",
+            }
+        elif not user_owns_todo(auth_user, owner.user_id):
+            results[todo_id] = {
+                "id": todo_id,
+                "status": "forbidden",
+                "detail": CANT_EDIT_DELETE_TODO,
+            }
+        else:
+            allowed.append(todo_id)
+    return allowed, results
+
+
+async def get_todo_page(
+    session: AsyncSession,
+    response: Response,
+    filters: TodoFilter,
+    limit: int,
+    cursor: Optional[str],
+):
+    """TodoPage body shared by every paginated todos endpoint."""
+    todos, next_cursor = await TodoRepository.get_todos(session, filters, limit, cursor)
+    if settings.FAST_JSON_RESPONSES:
+        return fast_json_response(
+            {"items": todo_serializer.rows(todos), "next_cursor": next_cursor},
+            response,
+        )
+    return {"items": todos, "next_cursor": next_cursor}
+
+
+async def stream_todos_ndjson(filters: TodoFilter, cursor: Optional[str]):
+    # Сессия зависимости закрывается до отправки тела, поэтому открываем свою
+    async with async_read_session() as session:
+        async for chunk in TodoRepository.stream_todos(
+            session, filters, settings.TODO_STREAM_CHUNK_SIZE, cursor
+        ):
+            yield "".join(
+                TodoDB.model_validate(todo, from_attributes=True).model_dump_json()
+                + "\n"
+                for todo in chunk
+            )
+
+
+@todosroute.get("/", response_model=TodoPage, dependencies=[Depends(query_budget(3))])
 async def get_todos(
-    session: AsyncSession = Depends(get_session),
+    request: Request,
+    response: Response,
+    limit: int = Query(settings.TODO_PAGE_SIZE, ge=1, le=settings.TODO_PAGE_SIZE_MAX),
+    cursor: Optional[str] = None,
+    stream: bool = False,
+    mine: bool = False,
+    filters: TodoFilter = Depends(),
+    session: AsyncSession = Depends(get_read_session),
     auth_user: UserAuth = Depends(get_user_from_token),
 ):
     if user_can_read_create_todos(auth_user):
-        todos = await TodoRepository.get_todos(session)
-        return todos
+        if mine:
+            filters.user_id = auth_user.id
+        scope = f"u{auth_user.id}" if mine else ""
+        not_modified = await check_etag(request, response, session, ("todo",), scope)
+        if not_modified:
+            return not_modified
+        if stream:
+            if cursor:
+                decode_cursor(cursor)
+            return StreamingResponse(
+                stream_todos_ndjson(filters, cursor),
+                media_type="application/x-ndjson",
+                headers={"ETag": response.headers["etag"]},
+            )
+        return await get_todo_page(session, response, filters, limit, cursor)
 
 
-@todosroute.post("/", response_model=dict[str, Union[TodoDB, str]])
+@todosroute.post(
+    "/", response_model=dict[str, Union[TodoDB, str]], dependencies=[limit_todo_writes]
+)
 async def create_todo(
+    response: Response,
+    durable: bool = True,
     todo_data: TodoCreate = Depends(),
     session: AsyncSession = Depends(get_session),
     auth_user: UserAuth = Depends(get_user_from_token),
 ):
     if user_can_read_create_todos(auth_user):
-        todo = await TodoRepository.create_todo(session, todo_data, auth_user.id)
+        if settings.TODO_WRITE_BEHIND:
+            todo = await todo_write_queue.submit(
+                ("create", auth_user.id, todo_data), durable
+            )
+            if not durable:
+                response.status_code = status.HTTP_202_ACCEPTED
+                return {"message": "Todo accepted"}
+        else:
+            todo = await TodoRepository.create_todo(session, todo_data, auth_user.id)
         return {"code": todo, "message": "Todo created successfully"}
 
 
-@todosroute.get("/{todo_id}/", response_model=TodoWithRelation)
+@todosroute.post(
+    "/bulk/", response_model=list[TodoBulkResult], dependencies=[limit_todo_writes]
+)
+async def create_todos_bulk(
+    todos_data: list[TodoCreate] = Body(max_length=settings.TODO_BULK_MAX_ITEMS),
+    session: AsyncSession = Depends(get_session),
+    auth_user: UserAuth = Depends(get_user_from_token),
+):
+    if user_can_read_create_todos(auth_user):
+        todos = await TodoRepository.bulk_create_todos(
+            session, todos_data, auth_user.id
+        )
+        return [{"id": todo.id, "status": "created", "todo": todo} for todo in todos]
+
+
+@todosroute.patch(
+    "/bulk/", response_model=list[TodoBulkResult], dependencies=[limit_todo_writes]
+)
+async def update_todos_bulk(
+    todos_data: list[TodoBulkUpdate] = Body(max_length=settings.TODO_BULK_MAX_ITEMS),
+    session: AsyncSession = Depends(get_session),
+    auth_user: UserAuth = Depends(get_user_from_token),
+):
+    if user_can_read_create_todos(auth_user):
+        todo_ids = [todo.id for todo in todos_data]
+        if len(set(todo_ids)) != len(todo_ids):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Each todo id may appear only once",
+            )
+        # Права проверяем по заблокированным строкам: до коммита их не удалят
+        locked = await TodoRepository.lock_todos(session, todo_ids)
+        allowed, results = check_bulk_permissions(auth_user, todo_ids, locked)
+        allowed = set(allowed)
+        to_update = [todo for todo in todos_data if todo.id in allowed]
+        updated = await TodoRepository.bulk_update_todos(session, to_update, locked)
+        for todo_id, todo in updated.items():
+            results[todo_id] = {"id": todo_id, "status": "updated", "todo": todo}
+        return [results[todo_id] for todo_id in todo_ids]
+
+
+@todosroute.delete(
+    "/bulk/", response_model=list[TodoBulkResult], dependencies=[limit_todo_writes]
+)
+async def delete_todos_bulk(
+    todo_ids: list[int] = Body(max_length=settings.TODO_BULK_MAX_ITEMS),
+    session: AsyncSession = Depends(get_session),
+    auth_user: UserAuth = Depends(get_user_from_token),
+):
+    if user_can_read_create_todos(auth_user):
+        owners = await TodoRepository.get_todo_owners(session, todo_ids)
+        allowed, results = check_bulk_permissions(auth_user, todo_ids, owners)
+        deleted = set(await TodoRepository.bulk_delete_todos(session, allowed))
+        for todo_id in allowed:
+            if todo_id in deleted:
+                results[todo_id] = {"id": todo_id, "status": "deleted"}
+            else:
+                # Удалили другим запросом после проверки прав
+                results[todo_id] = {
+                    "id": todo_id,
+                    "status": "not_found",
+                    "detail": "Todo not found!",
+                }
+        return [results[todo_id] for todo_id in todo_ids]
+
+
+@todosroute.get("/search/", response_model=list[TodoSearchResult])
+async def search_todos(
+    request: Request,
+    response: Response,
+    q: str = Query(min_length=1, max_length=255),
+    limit: int = Query(
+        settings.TODO_SEARCH_LIMIT, ge=1, le=settings.TODO_PAGE_SIZE_MAX
+    ),
+    mine: bool = False,
+    filters: TodoFilter = Depends(),
+    session: AsyncSession = Depends(get_read_session),
+    auth_user: UserAuth = Depends(get_user_from_token),
+):
+    if user_can_read_create_todos(auth_user):
+        if mine:
+            filters.user_id = auth_user.id
+        scope = f"u{auth_user.id}" if mine else ""
+        not_modified = await check_etag(request, response, session, ("todo",), scope)
+        if not_modified:
+            return not_modified
+        return await TodoRepository.search_todos(session, q, filters, limit)
+
+
+@todosroute.get("/stats/", response_model=TodoStats)
+async def get_todo_stats(
+    request: Request,
+    response: Response,
+    user_id: Optional[int] = None,
+    session: AsyncSession = Depends(get_read_session),
+    auth_user: UserAuth = Depends(get_user_from_token),
+):
+    if user_can_read_create_todos(auth_user):
+        user_id = auth_user.id if user_id is None else user_id
+        not_modified = await check_etag(
+            request, response, session, ("todo", "user"), f"u{user_id}"
+        )
+        if not_modified:
+            return not_modified
+        stats = await TodoCounterRepository.get_user_stats(session, user_id)
+        if stats:
+            return stats
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="User doesn't exist"
+        )
+
+
+@todosroute.get(
+    "/changes/", response_model=TodoChanges, dependencies=[Depends(query_budget(6))]
+)
+async def get_todo_changes(
+    response: Response,
+    since: int = Query(0, ge=0),
+    limit: int = Query(settings.TODO_PAGE_SIZE, ge=1, le=settings.TODO_PAGE_SIZE_MAX),
+    mine: bool = False,
+    user_id: Optional[int] = None,
+    session: AsyncSession = Depends(get_read_session),
+    auth_user: UserAuth = Depends(get_user_from_token),
+):
+    if user_can_read_create_todos(auth_user):
+        if mine:
+            user_id = auth_user.id
+        changes = await ChangeRepository.get_changes(session, since, user_id, limit)
+        if changes is None:
+            raise HTTPException(
+                status_code=status.HTTP_410_GONE,
+                detail="Changes since this point were purged, sync from since=0",
+            )
+        if settings.FAST_JSON_RESPONSES:
+            changes["todos"] = todo_change_serializer.rows(changes["todos"])
+            changes["categories"] = category_change_serializer.rows(
+                changes["categories"]
+            )
+            return fast_json_response(changes, response)
+        return changes
+
+
+def subscribe_to_todo_events(
+    auth_user: UserAuth,
+    user_id: Optional[int],
+    category_id: Optional[int],
+    mine: bool,
+) -> Subscription:
+    user_can_read_create_todos(auth_user)
+    if not events_available():
+        # Подписчик увидел бы только изменения, сделанные его воркером
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Events need EVENTS_URL when the server runs several workers",
+        )
+    if mine:
+        user_id = auth_user.id
+    return event_hub.subscribe(user_id, category_id)
+
+
+async def forward_todo_events(websocket: WebSocket, subscription: Subscription):
+    while (data := await subscription.get()) is not None:
+        await websocket.send_text(data.decode())
+    if subscription.overflowed:
+        await websocket.close(
+            code=status.WS_1013_TRY_AGAIN_LATER, reason="Client is too slow"
+        )
+    else:
+        await websocket.close(
+            code=status.WS_1001_GOING_AWAY, reason="Server is shutting down"
+        )
+
+
+async def wait_for_disconnect(websocket: WebSocket):
+    # Клиент ничего не присылает, читаем только чтобы заметить отключение
+    while (await websocket.receive())["type"] != "websocket.disconnect":
+        pass
+
+
+@todosroute.websocket("/events/")
+async def todo_events_websocket(
+    websocket: WebSocket,
+    token: Optional[str] = None,
+    user_id: Optional[int] = None,
+    category_id: Optional[int] = None,
+    mine: bool = False,
+):
+    try:
+        auth_user = await get_user_from_connection(websocket, token)
+        subscription = subscribe_to_todo_events(auth_user, user_id, category_id, mine)
+    except HTTPException as exc:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason=exc.detail)
+        return
+    await websocket.accept()
+    async with subscription:
+        tasks = {
+            asyncio.create_task(forward_todo_events(websocket, subscription)),
+            asyncio.create_task(wait_for_disconnect(websocket)),
+        }
+        done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in pending:
+            task.cancel()
+        for task in done:
+            # Отправка в уже закрытый сокет — обычное отключение клиента
+            task.exception()
+
+
+async def stream_todo_events(subscription: Subscription):
+    async with subscription:
+        while True:
+            try:
+                data = await asyncio.wait_for(
+                    subscription.get(), settings.EVENTS_SSE_KEEPALIVE_SECONDS
+                )
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            if data is None:
+                # Закрытие при остановке: EventSource сам переподключится
+                if subscription.overflowed:
+                    yield "event: overflow\ndata: {}\n\n"
+                return
+            yield f"data: {data.decode()}\n\n"
+
+
+@todosroute.get("/events/")
+async def todo_events_stream(
+    user_id: Optional[int] = None,
+    category_id: Optional[int] = None,
+    mine: bool = False,
+    auth_user: UserAuth = Depends(get_user_from_connection),
+):
+    subscription = subscribe_to_todo_events(auth_user, user_id, category_id, mine)
+    return StreamingResponse(
+        stream_todo_events(subscription),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@todosroute.get(
+    "/{todo_id}/",
+    response_model=TodoWithRelation,
+    dependencies=[Depends(query_budget(3))],
+)
 async def get_todo(
     todo_id: int,
-    session: AsyncSession = Depends(get_session),
+    request: Request,
+    response: Response,
+    session: AsyncSession = Depends(get_read_session),
     auth_user: UserAuth = Depends(get_user_from_token),
 ):
     if user_can_read_create_todos(auth_user):
+        not_modified = await check_etag(
+            request, response, session, ("todo", "user", "category")
+        )
+        if not_modified:
+            return not_modified
         todo = await TodoRepository.get_todo_with_related(session, todo_id)
         if todo:
             return todo
@@ -66,9 +454,10 @@ async def get_todo(
         )
 
 
-@todosroute.put("/{todo_id}/", response_model=TodoDB)
+@todosroute.put("/{todo_id}/", response_model=TodoDB, dependencies=[limit_todo_writes])
 async def update_todo(
     todo_id: int,
+    durable: bool = True,
     new_todo_data: TodoCreate = Depends(),
     session: AsyncSession = Depends(get_session),
     auth_user: UserAuth = Depends(get_user_from_token),
@@ -76,26 +465,44 @@ async def update_todo(
     todo = await TodoRepository.get_todo(session, todo_id)
     if todo:
         user_can_edit_delete_todos(auth_user, todo)
+        if settings.TODO_WRITE_BEHIND:
+            # Не держим соединение из пула, пока ждём коммита батча
+            await session.close()
+            todo = await todo_write_queue.submit(
+                ("update", todo_id, new_todo_data), durable
+            )
+            if not durable:
+                return Response(status_code=status.HTTP_202_ACCEPTED)
+            if todo is None:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND, detail="Todo not found!"
+                )
+            return todo
+        # None: todo удалили, пока мы проверяли права
         todo = await TodoRepository.update_todo(session, todo, new_todo_data)
-        return todo
+        if todo:
+            return todo
     raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Todo not found!")
 
 
-@todosroute.delete("/{todo_id}/")
+@todosroute.delete("/{todo_id}/", dependencies=[limit_todo_writes])
 async def delete_todo(
     todo_id: int,
+    durable: bool = True,
     session: AsyncSession = Depends(get_session),
     auth_user: UserAuth = Depends(get_user_from_token),
 ):
     todo = await TodoRepository.get_todo(session, todo_id)
     if todo:
         user_can_edit_delete_todos(auth_user, todo)
-        result = await TodoRepository.delete_todo(session, todo)
-        if result:
+        if settings.TODO_WRITE_BEHIND:
+            await session.close()
+            deleted = await todo_write_queue.submit(("delete", todo_id, None), durable)
+            if not durable:
+                return Response(status_code=status.HTTP_202_ACCEPTED)
+        else:
+            deleted = await TodoRepository.delete_todo(session, todo)
+        # False: todo удалили, пока мы проверяли права
+        if deleted:
             return Response(status_code=status.HTTP_204_NO_CONTENT)
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Couldn't delete todo, try later",
-        )
-
     raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Todo not found!")
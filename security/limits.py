@@ -0,0 +1,256 @@
+import asyncio
+import math
+import time
+from collections import defaultdict
+from typing import Optional
+
+import orjson
+from fastapi import Depends, HTTPException, Request, status
+
+from config import settings
+from db.schemas import UserAuth
+from security.security import get_user_from_token
+
+
+class RateLimitBackend:
+    """Token buckets by key; take() returns 0 or the seconds to wait."""
+
+    async def take(self, key: str, rate: float, burst: int) -> float:
+        raise NotImplementedError
+
+
+class InMemoryRateLimitBackend(RateLimitBackend):
+    """Buckets of this worker only, scaled down to its share of the workers.
+
+    With N workers each bucket refills at rate / N and holds burst / N
+    tokens (at least one), so together they allow about the configured
+    rate. A client whose requests all land on one worker, e.g. over a
+    keep-alive connection, gets that worker's share only.
+    """
+
+    def __init__(self, max_keys: int, workers: int = 1):
+        self.max_keys = max_keys
+        self.workers = workers
+        self.evictions = 0
+        # key -> [токены, время последнего обновления]
+        self._buckets: dict[str, list] = {}
+
+    async def take(self, key: str, rate: float, burst: int) -> float:
+        rate, burst = rate / self.workers, max(1, burst // self.workers)
+        now = time.monotonic()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            if len(self._buckets) >= self.max_keys:
+                # Вытесняем самый старый ключ: его клиент получит полный бакет
+                del self._buckets[next(iter(self._buckets))]
+                self.evictions += 1
+            self._buckets[key] = [burst - 1, now]
+            return 0
+        tokens = min(burst, bucket[0] + (now - bucket[1]) * rate)
+        bucket[1] = now
+        if tokens >= 1:
+            bucket[0] = tokens - 1
+            return 0
+        bucket[0] = tokens
+        return (1 - tokens) / rate
+
+    def stats(self):
+        return {
+            "keys": len(self._buckets),
+            "max_keys": self.max_keys,
+            "workers": self.workers,
+            "evictions": self.evictions,
+        }
+
+
+# Тот же бакет атомарно на стороне Redis, время тоже берём у Redis
+TOKEN_BUCKET_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(bucket[1]) or burst
+local ts = tonumber(bucket[2]) or now
+tokens = math.min(burst, tokens + (now - ts) * rate)
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    wait = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+return tostring(wait)
+"""
+
+
+class RedisRateLimitBackend(RateLimitBackend):
+    """Buckets shared by all workers; one script call per request."""
+
+    def __init__(self, url: str):
+        import redis.asyncio as redis
+
+        self.client = redis.from_url(url)
+        self._script = self.client.register_script(TOKEN_BUCKET_SCRIPT)
+
+    async def take(self, key: str, rate: float, burst: int) -> float:
+        return float(await self._script(keys=[f"ratelimit:{key}"], args=[rate, burst]))
+
+
+def build_rate_limit_backend(
+    url: Optional[str], max_keys: int, workers: int = 1
+) -> RateLimitBackend:
+    if not url:
+        return InMemoryRateLimitBackend(max_keys, workers)
+    try:
+        return RedisRateLimitBackend(url)
+    except ImportError:
+        raise RuntimeError(
+            "RATE_LIMIT_URL is set, but the redis package isn't installed"
+        )
+
+
+class RateLimiter:
+    def __init__(self, backend: RateLimitBackend):
+        self.backend = backend
+        self.limited: defaultdict[str, int] = defaultdict(int)
+
+    async def check(self, name: str, key: str, rate: float, burst: int):
+        if not settings.RATE_LIMIT_ENABLED:
+            return
+        retry_after = await self.backend.take(f"{name}:{key}", rate, burst)
+        if retry_after:
+            self.limited[name] += 1
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many requests, try later",
+                headers={"Retry-After": str(math.ceil(retry_after))},
+            )
+
+    def stats(self):
+        stats = {"limited": dict(self.limited)}
+        if hasattr(self.backend, "stats"):
+            stats.update(self.backend.stats())
+        return stats
+
+
+rate_limiter = RateLimiter(
+    build_rate_limit_backend(
+        settings.RATE_LIMIT_URL,
+        settings.RATE_LIMIT_MAX_KEYS,
+        # server.py выставляет SERVER_WORKERS в окружение воркеров
+        settings.SERVER_WORKERS or 1,
+    )
+)
+
+
+def limit_per_user(name: str, rate: float, burst: int):
+    """Route dependency: rate requests per second for each user, bursts of burst.
+
+    Routes that share a name share the bucket.
+    """
+
+    async def check_user_rate(auth_user: UserAuth = Depends(get_user_from_token)):
+        await rate_limiter.check(name, f"user:{auth_user.id}", rate, burst)
+
+    return check_user_rate
+
+
+def limit_per_ip(name: str, rate: float, burst: int):
+    """Route dependency for anonymous routes, keyed on the client address.
+
+    Behind a proxy uvicorn takes the address from X-Forwarded-For, see
+    its --forwarded-allow-ips.
+    """
+
+    async def check_ip_rate(request: Request):
+        host = request.client.host if request.client else "unknown"
+        await rate_limiter.check(name, f"ip:{host}", rate, burst)
+
+    return check_ip_rate
+
+
+class ConcurrencyLimiter:
+    """Caps requests in flight in this worker, with a short bounded queue."""
+
+    def __init__(self, max_active: int, max_waiting: int, wait_timeout: float):
+        self.max_active = max_active
+        self.max_waiting = max_waiting
+        self.wait_timeout = wait_timeout
+        self.active = 0
+        self.waiting = 0
+        self.shed = 0
+        self._slots = asyncio.Semaphore(max_active)
+
+    async def acquire(self) -> bool:
+        """Takes a slot; False means the request should be shed."""
+        if not self._slots.locked():
+            # Свободный слот: acquire() не уступает циклу событий
+            await self._slots.acquire()
+        elif self.waiting >= self.max_waiting:
+            self.shed += 1
+            return False
+        else:
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(self._slots.acquire(), self.wait_timeout)
+            except asyncio.TimeoutError:
+                self.shed += 1
+                return False
+            finally:
+                self.waiting -= 1
+        self.active += 1
+        return True
+
+    def release(self):
+        self.active -= 1
+        self._slots.release()
+
+    def stats(self):
+        return {
+            "active": self.active,
+            "waiting": self.waiting,
+            "max_active": self.max_active,
+            "shed": self.shed,
+        }
+
+
+concurrency_limiter = ConcurrencyLimiter(
+    settings.MAX_CONCURRENT_REQUESTS,
+    settings.MAX_WAITING_REQUESTS,
+    settings.REQUEST_QUEUE_TIMEOUT_SECONDS,
+)
+OVERLOADED_BODY = orjson.dumps({"detail": "Server is busy, try later"})
+
+
+class ConcurrencyLimitMiddleware:
+    """Answers 503 instead of queueing requests on an exhausted DB pool."""
+
+    def __init__(self, app, limiter: ConcurrencyLimiter = concurrency_limiter):
+        self.app = app
+        self.limiter = limiter
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"].startswith(
+            settings.ADMISSION_EXEMPT_PATHS
+        ):
+            return await self.app(scope, receive, send)
+        if not await self.limiter.acquire():
+            await send(
+                {
+                    "type": "http.response.start",
+                    "status": status.HTTP_503_SERVICE_UNAVAILABLE,
+                    "headers": [
+                        (b"content-type", b"application/json"),
+                        (b"content-length", str(len(OVERLOADED_BODY)).encode()),
+                        (b"retry-after", b"1"),
+                    ],
+                }
+            )
+            await send({"type": "http.response.body", "body": OVERLOADED_BODY})
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.limiter.release()
@@ -0,0 +1,55 @@
+import asyncio
+import logging
+import time
+from typing import Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from db.crud import TokenRevocationRepository
+
+
+logger = logging.getLogger(__name__)
+
+
+class RevocationList:
+    """In-process "tokens issued before" map, synced from token_revocation."""
+
+    # Перечитываем последние записи с запасом: транзакция могла
+    # закоммититься позже, чем была создана запись
+    SYNC_OVERLAP_SECONDS = 60
+
+    def __init__(self, max_token_age: float):
+        self.max_token_age = max_token_age
+        self._not_before: dict[int, float] = {}
+        self._synced_until = 0.0
+
+    def revoke(self, user_id: int, not_before: Optional[float] = None):
+        not_before = not_before or time.time()
+        if not_before > self._not_before.get(user_id, 0.0):
+            self._not_before[user_id] = not_before
+
+    def is_revoked(self, user_id: int, issued_at: float) -> bool:
+        return issued_at < self._not_before.get(user_id, 0.0)
+
+    async def refresh(self, session: AsyncSession):
+        # Записи старше срока жизни любого токена уже ничего не отзывают
+        oldest = time.time() - self.max_token_age
+        self._not_before = {
+            user_id: not_before
+            for user_id, not_before in self._not_before.items()
+            if not_before > oldest
+        }
+        since = max(self._synced_until - self.SYNC_OVERLAP_SECONDS, oldest)
+        revocations = await TokenRevocationRepository.get_revocations(session, since)
+        for user_id, not_before in revocations:
+            self.revoke(user_id, not_before)
+            self._synced_until = max(self._synced_until, not_before)
+
+    async def run(self, session_factory, interval: float):
+        while True:
+            try:
+                async with session_factory() as session:
+                    await self.refresh(session)
+            except Exception:
+                logger.exception("Failed to refresh token revocations")
+            await asyncio.sleep(interval)
@@ -1,53 +1,107 @@
-from datetime import datetime, timedelta
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Optional
 
 import jwt
 from fastapi.security import OAuth2PasswordBearer
 from fastapi import Depends, HTTPException, status
+from fastapi.requests import HTTPConnection
 from sqlalchemy.ext.asyncio import AsyncSession
 
-import config as config
+from config import settings
+from monitoring.metrics import timed_phase
 from db.crud import UserRepository
 from db.models import User
 from db.schemas import UserAuth
-from security.pwdcrypt import verify_password
+from security.pwdcrypt import verify_password_async
+from security.revocation import RevocationList
+from security.token_cache import TokenCache
 
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
+token_cache = TokenCache(settings.TOKEN_CACHE_MAX_SIZE)
+revoked_tokens = RevocationList(
+    max_token_age=60
+    * max(settings.ACCESS_TOKEN_EXPIRE_MINUTES, settings.REFRESH_TOKEN_EXPIRE_MINUTES)
+)
+
+
+def unauthorized(detail: str):
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail=detail,
+        headers={"WWW-Authenticate": "Bearer"},
+    )
 
 
 async def authenticate_user(session: AsyncSession, username: str, password: str):
     user = await UserRepository.get_user(session, username)
-    if not user or not verify_password(password, user.password):
+    if not user or not await verify_password_async(password, user.password):
         return None
     return user
 
 
+def create_token(to_encode: dict, token_type: str, expire_minutes: int):
+    issued_at = time.time()
+    expire = datetime.now(timezone.utc) + timedelta(minutes=expire_minutes)
+    to_encode.update({"type": token_type, "iat": issued_at, "exp": expire})
+    encoded_jwt = jwt.encode(
+        to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM
+    )
+    return encoded_jwt
+
+
 def create_access_token(user: User):
     to_encode = {"id": user.id, "sub": user.username, "position": user.position}
-    expire = datetime.now() + timedelta(minutes=config.ACCESS_TOKEN_EXPIRE_MINUTES)
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, config.SECRET_KEY, algorithm=config.ALGORITHM)
-    return encoded_jwt
+    return create_token(to_encode, "access", settings.ACCESS_TOKEN_EXPIRE_MINUTES)
 
 
-# Функция получения User'а по токену
-def get_user_from_token(token: str = Depends(oauth2_scheme)) -> UserAuth:
+def create_refresh_token(user: User):
+    to_encode = {"id": user.id, "sub": user.username}
+    return create_token(to_encode, "refresh", settings.REFRESH_TOKEN_EXPIRE_MINUTES)
+
+
+def decode_token(token: str, token_type: str):
     try:
-        payload = jwt.decode(token, config.SECRET_KEY, algorithms=[config.ALGORITHM])
-        return UserAuth(
+        with timed_phase("token_decode"):
+            payload = jwt.decode(
+                token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]
+            )
+    except jwt.ExpiredSignatureError:
+        raise unauthorized("Token has expired")
+    except jwt.InvalidTokenError:
+        raise unauthorized("Invalid token")
+    # Старые токены без "type" считаем access-токенами
+    if payload.get("type", "access") != token_type:
+        raise unauthorized("Invalid token")
+    return payload
+
+
+# Функция получения User'а по токену
+async def get_user_from_token(token: str = Depends(oauth2_scheme)) -> UserAuth:
+    cached = token_cache.get(token)
+    if cached is None:
+        payload = decode_token(token, "access")
+        auth_user = UserAuth(
             id=payload.get("id"),
             username=payload.get("sub"),
             position=payload.get("position"),
         )
-    except jwt.ExpiredSignatureError:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Token has expired",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-    except jwt.InvalidTokenError:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid token",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
+        cached = (auth_user, payload.get("iat", 0.0))
+        token_cache.set(token, cached, payload["exp"])
+    auth_user, issued_at = cached
+    if revoked_tokens.is_revoked(auth_user.id, issued_at):
+        raise unauthorized("Token has been revoked")
+    return auth_user
+
+
+# WebSocket и EventSource в браузере не умеют слать заголовки, им можно ?token=
+async def get_user_from_connection(
+    connection: HTTPConnection, token: Optional[str] = None
+) -> UserAuth:
+    scheme, _, credentials = connection.headers.get("authorization", "").partition(" ")
+    if scheme.lower() == "bearer" and credentials:
+        token = credentials
+    if not token:
+        raise unauthorized("Not authenticated")
+    return await get_user_from_token(token)
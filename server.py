@@ -0,0 +1,97 @@
+"""Production entry point: python server.py
+
+Applies migrations once, then serves main:app from SERVER_WORKERS uvicorn
+worker processes (the CPU count by default) sharing one socket. SIGTERM
+or Ctrl+C drains the workers: they stop accepting, end event streams,
+let running requests finish within SERVER_GRACEFUL_SHUTDOWN_SECONDS and
+close their database pools.
+
+Several workers need an event transport they share, see events_url().
+Without one they still serve everything else, but /todo/events/ answers
+503.
+"""
+
+import asyncio
+import logging
+import os
+
+import uvicorn
+from uvicorn.supervisors import ChangeReload, Multiprocess
+
+from config import settings
+from db.database import async_engine
+from db.events import event_hub, events_url
+from db.schema import upgrade_schema
+from routes.health import worker_state
+
+
+logger = logging.getLogger(__name__)
+
+
+class AppServer(uvicorn.Server):
+    """uvicorn server that ends long-lived streams before draining.
+
+    uvicorn waits for every open connection, and an idle SSE or WebSocket
+    subscriber would otherwise hold the worker until the graceful timeout.
+    """
+
+    async def shutdown(self, sockets=None):
+        worker_state.draining = True
+        event_hub.close_all()
+        await super().shutdown(sockets)
+
+
+def resolve_workers() -> int:
+    # С reload uvicorn всё равно запускает один процесс
+    if settings.SERVER_RELOAD:
+        return 1
+    workers = settings.SERVER_WORKERS or os.cpu_count() or 1
+    if workers > 1 and events_url() is None:
+        logger.warning(
+            "/todo/events/ is off: %d workers need EVENTS_URL or a PostgreSQL "
+            "DB_URL to share events",
+            workers,
+        )
+    return workers
+
+
+def build_config() -> uvicorn.Config:
+    return uvicorn.Config(
+        "main:app",
+        host=settings.SERVER_HOST,
+        port=settings.SERVER_PORT,
+        workers=resolve_workers(),
+        reload=settings.SERVER_RELOAD,
+        loop=settings.SERVER_LOOP,
+        http=settings.SERVER_HTTP,
+        backlog=settings.SERVER_BACKLOG,
+        timeout_keep_alive=settings.SERVER_KEEPALIVE_SECONDS,
+        timeout_graceful_shutdown=settings.SERVER_GRACEFUL_SHUTDOWN_SECONDS,
+        access_log=settings.SERVER_ACCESS_LOG,
+        lifespan="on",
+    )
+
+
+async def migrate():
+    await upgrade_schema(async_engine)
+    # Соединения пула привязаны к этому циклу событий, воркерам они не нужны
+    await async_engine.dispose()
+
+
+def serve():
+    if settings.SERVER_MIGRATE:
+        asyncio.run(migrate())
+    config = build_config()
+    # Воркеры читают настройки заново: так лимиты в памяти делятся на всех
+    os.environ["SERVER_WORKERS"] = str(config.workers)
+    server = AppServer(config)
+    if config.should_reload:
+        ChangeReload(config, target=server.run, sockets=[config.bind_socket()]).run()
+    elif config.workers > 1:
+        Multiprocess(config, target=server.run, sockets=[config.bind_socket()]).run()
+    else:
+        server.run()
+
+
+if __name__ == "__main__":
+    serve()
@@ -0,0 +1,125 @@
+import os
+import shutil
+from types import SimpleNamespace
+
+import httpx
+import pytest
+from sqlalchemy import insert, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+from benchmarks.common import local_postgres
+from config import settings
+from db import models
+from db.cache import InMemoryCacheBackend, category_cache
+from db.database import (
+    async_engine,
+    async_read_session,
+    async_session,
+    build_engine,
+    read_engine,
+)
+from db.schema import upgrade_schema
+from main import app
+from security.security import create_access_token, revoked_tokens, token_cache
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture(scope="session")
+def postgres_url():
+    """TEST_POSTGRES_URL, or a throwaway cluster when initdb/pg_ctl are in PATH."""
+    if os.environ.get("TEST_POSTGRES_URL"):
+        yield os.environ["TEST_POSTGRES_URL"]
+        return
+    if not shutil.which("pg_ctl"):
+        pytest.skip("PostgreSQL isn't available: set TEST_POSTGRES_URL")
+    with local_postgres() as url:
+        yield url
+
+
+@pytest.fixture(params=["sqlite", "postgresql"])
+def database_url(request, tmp_path):
+    if request.param == "sqlite":
+        return f"sqlite+aiosqlite:///{tmp_path / 'test.db'}"
+    return request.getfixturevalue("postgres_url")
+
+
+@pytest.fixture
+async def engine(database_url, monkeypatch):
+    """Migrated empty database behind the app's session factories."""
+    engine = build_engine(database_url, settings.DB_POOL_SIZE)
+    if engine.dialect.name == "postgresql":
+        # Кластер общий на сессию, схему каждому тесту создаём заново
+        async with engine.begin() as conn:
+            await conn.execute(text("DROP SCHEMA public CASCADE"))
+            await conn.execute(text("CREATE SCHEMA public"))
+    await upgrade_schema(engine)
+    async_session.configure(bind=engine)
+    async_read_session.configure(bind=engine)
+    # Синглтоны процесса не должны переносить состояние между базами
+    monkeypatch.setattr(settings, "RATE_LIMIT_ENABLED", False)
+    monkeypatch.setattr(
+        category_cache, "backend", InMemoryCacheBackend(category_cache.backend.max_size)
+    )
+    monkeypatch.setattr(revoked_tokens, "_not_before", {})
+    token_cache.clear()
+    try:
+        yield engine
+    finally:
+        async_session.configure(bind=async_engine)
+        async_read_session.configure(bind=read_engine)
+        await engine.dispose()
+
+
+@pytest.fixture
+def session_factory(engine):
+    return sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+
+@pytest.fixture
+async def client(engine):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        yield client
+
+
+@pytest.fixture
+def make_user(session_factory):
+    """Creates a user and returns it with Authorization headers."""
+    count = 0
+
+    async def make_user(position: str = "user"):
+        nonlocal count
+        count += 1
+        username = f"{position}{count}"
+        async with session_factory() as session:
+            user_id = await session.scalar(
+                insert(models.User)
+                .values(
+                    username=username,
+                    password="-",
+                    email=f"{username}@ex.com",
+                    position=position,
+                )
+                .returning(models.User.id)
+            )
+            await session.commit()
+        user = SimpleNamespace(id=user_id, username=username, position=position)
+        user.headers = {"Authorization": f"Bearer {create_access_token(user)}"}
+        return user
+
+    return make_user
+
+
+@pytest.fixture
+async def user(make_user):
+    return await make_user()
+
+
+@pytest.fixture
+async def admin(make_user):
+    return await make_user("admin")
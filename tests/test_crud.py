@@ -0,0 +1,183 @@
+"""Repository writes under concurrency, on SQLite and PostgreSQL."""
+
+import asyncio
+
+import pytest
+
+from db import schemas
+from db.crud import CategoryRepository, TodoCounterRepository, TodoRepository
+from monitoring.queries import assert_queries
+
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_concurrent_creates_and_deletes_keep_lock_order(session_factory, user):
+    """Creates and deletes of one user lock counters before change_seq."""
+    async with session_factory() as session:
+        todos = [
+            await TodoRepository.create_todo(
+                session, schemas.TodoCreate(text=f"todo {i}"), user.id
+            )
+            for i in range(20)
+        ]
+
+    async def create(i):
+        async with session_factory() as session:
+            await TodoRepository.create_todo(
+                session, schemas.TodoCreate(text=f"new {i}"), user.id
+            )
+
+    async def delete(todo):
+        async with session_factory() as session:
+            await TodoRepository.delete_todo(session, await session.merge(todo))
+
+    async def bulk_delete(todo):
+        async with session_factory() as session:
+            await TodoRepository.bulk_delete_todos(session, [todo.id])
+
+    await asyncio.gather(
+        *(create(i) for i in range(20)),
+        *(delete(todo) for todo in todos[:10]),
+        *(bulk_delete(todo) for todo in todos[10:]),
+    )
+    async with session_factory() as session:
+        stats = await TodoCounterRepository.get_user_stats(session, user.id)
+        assert stats.todos_count == 20
+        assert await TodoCounterRepository.recount(session) == 0
+
+
+async def create_category(session_factory, slug):
+    async with session_factory() as session:
+        return await CategoryRepository.create_category(
+            session, schemas.CategoryCreate(text=slug, slug=slug)
+        )
+
+
+async def assert_counters_consistent(session_factory):
+    async with session_factory() as session:
+        assert await TodoCounterRepository.recount(session) == 0
+
+
+async def test_bulk_update_repeating_an_id_moves_counters_once(session_factory, user):
+    home = await create_category(session_factory, "home")
+    async with session_factory() as session:
+        todo = await TodoRepository.create_todo(
+            session, schemas.TodoCreate(text="todo", category_id=home.id), user.id
+        )
+        await TodoRepository.bulk_update_todos(
+            session,
+            [
+                schemas.TodoBulkUpdate(id=todo.id, text="a"),
+                schemas.TodoBulkUpdate(id=todo.id, text="b", completed=True),
+            ],
+        )
+        stats = await TodoCounterRepository.get_category_stats(session)
+    assert [(row.todos_count, row.todos_completed) for row in stats] == [(0, 0)]
+    await assert_counters_consistent(session_factory)
+
+
+async def test_writes_with_a_stale_todo_keep_counters(session_factory, user):
+    home = await create_category(session_factory, "home")
+    async with session_factory() as session:
+        todos = [
+            await TodoRepository.create_todo(
+                session, schemas.TodoCreate(text="todo"), user.id
+            )
+            for _ in range(2)
+        ]
+    # Другой запрос меняет todo после того, как маршрут её прочитал
+    async with session_factory() as session:
+        for todo in todos:
+            await TodoRepository.update_todo(
+                session,
+                todo,
+                schemas.TodoCreate(text="moved", category_id=home.id, completed=True),
+            )
+    async with session_factory() as session:
+        await TodoRepository.update_todo(
+            session, todos[0], schemas.TodoCreate(text="again")
+        )
+        assert await TodoRepository.delete_todo(session, todos[1])
+    await assert_counters_consistent(session_factory)
+
+
+async def test_writes_to_a_deleted_todo_change_nothing(session_factory, user):
+    async with session_factory() as session:
+        todo = await TodoRepository.create_todo(
+            session, schemas.TodoCreate(text="todo"), user.id
+        )
+        assert await TodoRepository.delete_todo(session, todo)
+        assert not await TodoRepository.delete_todo(session, todo)
+        assert (
+            await TodoRepository.update_todo(
+                session, todo, schemas.TodoCreate(text="x")
+            )
+            is None
+        )
+    await assert_counters_consistent(session_factory)
+
+
+# Что можно выполнять, держа блокировку строки change_seq
+CLOSING_STATEMENTS = (
+    "INSERT INTO table_version",
+    "UPDATE todo SET updated_seq",
+    "UPDATE category SET updated_seq",
+    "INSERT INTO tombstone",
+)
+
+
+def assert_sequence_reserved_last(statements):
+    first = next(
+        i for i, statement in enumerate(statements) if "table_version" in statement
+    )
+    assert all(s.startswith(CLOSING_STATEMENTS) for s in statements[first:]), statements
+
+
+async def test_writes_reserve_the_change_sequence_last(session_factory, user):
+    home = await create_category(session_factory, "home")
+    writes = [
+        lambda s: TodoRepository.create_todo(
+            s, schemas.TodoCreate(text="a", category_id=home.id), user.id
+        ),
+        lambda s: TodoRepository.bulk_create_todos(
+            s, [schemas.TodoCreate(text="b"), schemas.TodoCreate(text="c")], user.id
+        ),
+        lambda s: TodoRepository.update_todo(
+            s, todo, schemas.TodoCreate(text="d", completed=True)
+        ),
+        lambda s: TodoRepository.bulk_update_todos(
+            s, [schemas.TodoBulkUpdate(id=todo.id, text="e")]
+        ),
+        lambda s: TodoRepository.delete_todo(s, todo),
+        lambda s: CategoryRepository.delete_category(s, home),
+    ]
+    todo = None
+    for write in writes:
+        async with session_factory() as session:
+            with assert_queries(repeat_threshold=100) as recorder:
+                result = await write(session)
+        todo = todo or result
+        assert_sequence_reserved_last(recorder.statements)
+    await assert_counters_consistent(session_factory)
+
+
+async def test_bulk_update_skips_todos_that_are_gone(session_factory, user):
+    async with session_factory() as session:
+        todo = await TodoRepository.create_todo(
+            session, schemas.TodoCreate(text="todo"), user.id
+        )
+        gone = await TodoRepository.create_todo(
+            session, schemas.TodoCreate(text="gone"), user.id
+        )
+        assert await TodoRepository.delete_todo(session, gone)
+        updated = await TodoRepository.bulk_update_todos(
+            session,
+            [
+                schemas.TodoBulkUpdate(id=gone.id, text="x"),
+                schemas.TodoBulkUpdate(id=todo.id, text="y", completed=True),
+            ],
+        )
+    assert list(updated) == [todo.id]
+    assert updated[todo.id]["created"] == todo.created
+    await assert_counters_consistent(session_factory)
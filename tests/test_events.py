@@ -0,0 +1,33 @@
+import asyncio
+
+import asyncpg
+import pytest
+
+from db.events import PostgresEventTransport
+
+
+pytestmark = pytest.mark.anyio
+
+
+class FakePool:
+    def __init__(self):
+        self.notified = 0
+
+    async def execute(self, query, *args):
+        self.notified += 1
+
+
+async def test_concurrent_first_publishes_share_one_pool(monkeypatch):
+    pools = []
+
+    async def create_pool(dsn, **options):
+        # Соединение устанавливается не сразу: остальные публикации успевают прийти
+        await asyncio.sleep(0.01)
+        pools.append(FakePool())
+        return pools[-1]
+
+    monkeypatch.setattr(asyncpg, "create_pool", create_pool)
+    transport = PostgresEventTransport("postgresql://app@db/app", "todo_events")
+    await asyncio.gather(*(transport.publish(b"[]") for _ in range(10)))
+    assert len(pools) == 1
+    assert pools[0].notified == 10
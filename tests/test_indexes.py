@@ -0,0 +1,44 @@
+"""Every todo listing filter combination is served by an index."""
+
+from datetime import datetime
+
+import pytest
+from sqlalchemy import text
+
+from benchmarks.explain_todo_filters import explain, filter_combinations, is_full_scan
+from db.crud import TodoRepository
+from db.pagination import encode_cursor
+
+
+pytestmark = pytest.mark.anyio
+
+
+def explain_postgres(conn, query):
+    compiled = query.compile(dialect=conn.dialect)
+    params = tuple(compiled.params[name] for name in compiled.positiontup)
+    result = conn.exec_driver_sql(f"EXPLAIN {compiled}", params)
+    return [row[0] for row in result]
+
+
+def full_scans(conn):
+    if conn.dialect.name == "postgresql":
+        # На пустой таблице планировщик и так выберет seq scan
+        conn.execute(text("SET enable_seqscan = off"))
+        plan_of = explain_postgres
+        scans = lambda plan: any("Seq Scan on todo" in line for line in plan)
+    else:
+        plan_of, scans = explain, is_full_scan
+    cursor = encode_cursor(datetime(2024, 6, 1), 1)
+    failures = []
+    for filters in filter_combinations():
+        for page_cursor in (None, cursor):
+            query = TodoRepository._todos_query(filters, page_cursor).limit(51)
+            plan = plan_of(conn, query)
+            if scans(plan):
+                failures.append((filters, page_cursor is not None, plan))
+    return failures
+
+
+async def test_todo_filters_use_an_index(engine):
+    async with engine.connect() as conn:
+        assert await conn.run_sync(full_scans) == []
@@ -0,0 +1,26 @@
+import pytest
+
+from security.limits import InMemoryRateLimitBackend
+
+
+pytestmark = pytest.mark.anyio
+
+
+async def takes_until_limited(backend, rate, burst):
+    taken = 0
+    while not await backend.take("user:1", rate, burst):
+        taken += 1
+    return taken
+
+
+@pytest.mark.parametrize("workers, allowed", [(1, 30), (4, 7), (64, 1)])
+async def test_in_memory_burst_is_split_between_workers(workers, allowed):
+    backend = InMemoryRateLimitBackend(100, workers)
+    assert await takes_until_limited(backend, 0.001, 30) == allowed
+
+
+async def test_in_memory_rate_is_split_between_workers():
+    backend = InMemoryRateLimitBackend(100, workers=4)
+    await takes_until_limited(backend, 10, 4)
+    # Один токен на воркер копится 4 / 10 секунды, а не 1 / 10
+    assert await backend.take("user:1", 10, 4) == pytest.approx(0.4, abs=0.01)
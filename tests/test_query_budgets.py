@@ -0,0 +1,48 @@
+"""Routes stay within their query_budget() on a populated database."""
+
+import pytest
+
+from monitoring.queries import assert_queries
+from tests.test_routes import create_category, create_todo
+
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def seeded(client, make_user, admin):
+    """Several users with todos in several categories, enough to expose N+1."""
+    users = [await make_user() for _ in range(3)]
+    categories = [await create_category(client, admin, slug) for slug in "abc"]
+    todos = [
+        await create_todo(client, user, category_id=category["id"], completed=done)
+        for user in users
+        for category in categories
+        for done in (True, False)
+    ]
+    return users, categories, todos
+
+
+# Ожидаемые бюджеты: снятый с роута query_budget тоже ломает тест
+BUDGETS = [
+    ("/todo/", 3),
+    ("/todo/{todo_id}/", 3),
+    ("/todo/changes/", 6),
+    ("/category/{category_id}/", 5),
+    ("/category/{category_id}/todos/", 4),
+    ("/admin/users/{user_id}/", 4),
+    ("/admin/users/{user_id}/todos/", 4),
+]
+
+
+@pytest.mark.parametrize("path, budget", BUDGETS)
+async def test_route_stays_within_its_budget(client, admin, seeded, path, budget):
+    users, categories, todos = seeded
+    path = path.format(
+        todo_id=todos[0]["id"], category_id=categories[0]["id"], user_id=users[0].id
+    )
+    with assert_queries() as recorder:
+        response = await client.get(path, headers=admin.headers)
+    assert response.status_code == 200, response.text
+    assert recorder.budget == budget
+    assert recorder.count <= budget
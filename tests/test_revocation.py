@@ -0,0 +1,87 @@
+"""Changing or deleting a user revokes the tokens issued before."""
+
+import time
+
+import pytest
+
+from security.revocation import RevocationList
+from security.security import decode_token
+
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def login(client):
+    """Registers a user on first call and returns its fresh tokens."""
+
+    async def login(username="alice", password="secret"):
+        await client.post(
+            "/auth/registration/",
+            params={
+                "username": username,
+                "email": f"{username}@ex.com",
+                "password": password,
+            },
+        )
+        response = await client.post(
+            "/auth/login/", data={"username": username, "password": password}
+        )
+        assert response.status_code == 200, response.text
+        tokens = response.json()
+        tokens["headers"] = {"Authorization": f"Bearer {tokens['access_token']}"}
+        return tokens
+
+    return login
+
+
+async def user_id_of(client, admin, username):
+    users = (await client.get("/admin/users/", headers=admin.headers)).json()
+    return next(user["id"] for user in users if user["username"] == username)
+
+
+async def test_demotion_revokes_old_tokens(client, admin, login):
+    old = await login()
+    assert (await client.get("/todo/", headers=old["headers"])).status_code == 200
+    user_id = await user_id_of(client, admin, "alice")
+    response = await client.put(
+        f"/admin/users/{user_id}/", params={"position": "guest"}, headers=admin.headers
+    )
+    assert response.status_code == 200
+
+    response = await client.get("/todo/", headers=old["headers"])
+    assert response.status_code == 401
+    assert response.json()["detail"] == "Token has been revoked"
+    response = await client.post(
+        "/auth/refresh/", data={"refresh_token": old["refresh_token"]}
+    )
+    assert response.status_code == 401
+
+    new = await login()
+    assert decode_token(new["access_token"], "access")["position"] == "guest"
+    response = await client.post("/todo/", params={"text": "x"}, headers=new["headers"])
+    # Новый токен несёт новую позицию: гостю писать нельзя
+    assert response.status_code == 403
+
+
+async def test_deleting_a_user_revokes_its_tokens(client, admin, login):
+    old = await login()
+    user_id = await user_id_of(client, admin, "alice")
+    response = await client.delete(f"/admin/users/{user_id}/", headers=admin.headers)
+    assert response.status_code == 204
+
+    response = await client.get("/todo/", headers=old["headers"])
+    assert response.status_code == 401
+    response = await client.post(
+        "/auth/refresh/", data={"refresh_token": old["refresh_token"]}
+    )
+    assert response.status_code == 401
+
+
+async def test_refresh_forgets_revocations_older_than_any_token(session_factory):
+    revocations = RevocationList(max_token_age=60)
+    revocations.revoke(1, time.time() - 61)
+    revocations.revoke(2, time.time() - 59)
+    async with session_factory() as session:
+        await revocations.refresh(session)
+    assert list(revocations._not_before) == [2]
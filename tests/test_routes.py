@@ -0,0 +1,325 @@
+"""Every router against SQLite and PostgreSQL, see conftest.database_url."""
+
+import pytest
+from sqlalchemy import update
+
+from config import settings
+from db import models
+from db.cache import category_cache
+from db.crud import TodoCounterRepository, VersionRepository
+from monitoring.queries import assert_queries
+
+
+pytestmark = pytest.mark.anyio
+
+
+async def create_todo(client, user, text="todo", **params):
+    response = await client.post(
+        "/todo/", params={"text": text, **params}, headers=user.headers
+    )
+    assert response.status_code == 200, response.text
+    return response.json()["code"]
+
+
+async def create_category(client, admin, slug):
+    response = await client.post(
+        "/category/", params={"text": slug.title(), "slug": slug}, headers=admin.headers
+    )
+    assert response.status_code == 200, response.text
+    return response.json()["code"]
+
+
+async def test_todo_crud(client, user):
+    todo = await create_todo(client, user, "buy milk")
+    assert todo["user_id"] == user.id
+    assert todo["completed"] is False
+
+    response = await client.get(f"/todo/{todo['id']}/", headers=user.headers)
+    assert response.json()["text"] == "buy milk"
+
+    response = await client.put(
+        f"/todo/{todo['id']}/",
+        params={"text": "buy bread", "completed": True},
+        headers=user.headers,
+    )
+    assert response.status_code == 200
+    assert response.json()["completed"] is True
+
+    response = await client.delete(f"/todo/{todo['id']}/", headers=user.headers)
+    assert response.status_code == 204
+    response = await client.get(f"/todo/{todo['id']}/", headers=user.headers)
+    assert response.status_code == 404
+
+
+async def test_only_author_or_admin_edits(client, make_user, admin):
+    author, other = await make_user(), await make_user()
+    todo = await create_todo(client, author)
+    response = await client.delete(f"/todo/{todo['id']}/", headers=other.headers)
+    assert response.status_code == 403
+    response = await client.delete(f"/todo/{todo['id']}/", headers=admin.headers)
+    assert response.status_code == 204
+
+
+async def test_todo_pages_follow_cursor(client, user):
+    ids = [(await create_todo(client, user, f"todo {i}"))["id"] for i in range(5)]
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 2, "mine": True}
+        if cursor:
+            params["cursor"] = cursor
+        page = (await client.get("/todo/", params=params, headers=user.headers)).json()
+        seen.extend(todo["id"] for todo in page["items"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert seen == ids
+
+
+async def test_todo_list_etag(client, user):
+    await create_todo(client, user)
+    response = await client.get("/todo/", headers=user.headers)
+    etag = response.headers["etag"]
+    response = await client.get(
+        "/todo/", headers={**user.headers, "If-None-Match": etag}
+    )
+    assert response.status_code == 304
+    await create_todo(client, user)
+    response = await client.get(
+        "/todo/", headers={**user.headers, "If-None-Match": etag}
+    )
+    assert response.status_code == 200
+
+
+async def test_bulk_routes(client, make_user):
+    author, other = await make_user(), await make_user()
+    response = await client.post(
+        "/todo/bulk/", json=[{"text": "a"}, {"text": "b"}], headers=author.headers
+    )
+    created = [result["id"] for result in response.json()]
+    assert len(created) == 2
+    foreign = await create_todo(client, other)
+
+    response = await client.patch(
+        "/todo/bulk/",
+        json=[
+            {"id": created[0], "text": "a2", "completed": True},
+            {"id": foreign["id"], "text": "mine now"},
+        ],
+        headers=author.headers,
+    )
+    assert [result["status"] for result in response.json()] == [
+        "updated",
+        "forbidden",
+    ]
+
+    response = await client.request(
+        "DELETE", "/todo/bulk/", json=[*created, 999], headers=author.headers
+    )
+    assert [result["status"] for result in response.json()] == [
+        "deleted",
+        "deleted",
+        "not_found",
+    ]
+
+
+async def test_search(client, user):
+    await create_todo(client, user, "quarterly report draft")
+    await create_todo(client, user, "buy milk")
+    response = await client.get(
+        "/todo/search/", params={"q": "report"}, headers=user.headers
+    )
+    assert [todo["text"] for todo in response.json()] == ["quarterly report draft"]
+
+
+async def test_changes_feed(client, user):
+    kept = await create_todo(client, user, "kept")
+    gone = await create_todo(client, user, "gone")
+    await client.delete(f"/todo/{gone['id']}/", headers=user.headers)
+
+    changes = (
+        await client.get("/todo/changes/", params={"mine": True}, headers=user.headers)
+    ).json()
+    assert [todo["id"] for todo in changes["todos"]] == [kept["id"]]
+    assert changes["deleted_todos"] == [gone["id"]]
+
+    await client.put(
+        f"/todo/{kept['id']}/", params={"text": "changed"}, headers=user.headers
+    )
+    later = (
+        await client.get(
+            "/todo/changes/",
+            params={"mine": True, "since": changes["next_since"]},
+            headers=user.headers,
+        )
+    ).json()
+    assert [todo["text"] for todo in later["todos"]] == ["changed"]
+
+
+async def test_categories(client, admin, user):
+    home = await create_category(client, admin, "home")
+    todo = await create_todo(client, user, category_id=home["id"])
+
+    response = await client.get("/category/", headers=user.headers)
+    assert [category["slug"] for category in response.json()] == ["home"]
+    response = await client.get(f"/category/{home['id']}/", headers=user.headers)
+    assert [t["id"] for t in response.json()["todos"]] == [todo["id"]]
+
+    response = await client.delete(f"/category/{home['id']}/", headers=admin.headers)
+    assert response.status_code == 204
+    response = await client.get(f"/todo/{todo['id']}/", headers=user.headers)
+    assert response.json()["category_id"] is None
+
+
+async def test_admin_users(client, admin, user):
+    await create_todo(client, user)
+    response = await client.get("/admin/users/", headers=admin.headers)
+    assert {row["id"] for row in response.json()} == {admin.id, user.id}
+    response = await client.get(f"/admin/users/{user.id}/", headers=admin.headers)
+    assert response.json()["todos_count"] == 1
+    response = await client.get("/admin/users/", headers=user.headers)
+    assert response.status_code == 403
+
+
+async def test_counters_match_recount(client, session_factory, admin, user):
+    home = await create_category(client, admin, "home")
+    todos = [await create_todo(client, user, category_id=home["id"]) for _ in range(3)]
+    await client.put(
+        f"/todo/{todos[0]['id']}/",
+        params={"text": "done", "completed": True},
+        headers=user.headers,
+    )
+    await client.delete(f"/todo/{todos[1]['id']}/", headers=user.headers)
+
+    stats = (await client.get("/todo/stats/", headers=user.headers)).json()
+    assert (stats["todos_count"], stats["todos_completed"]) == (2, 1)
+    async with session_factory() as session:
+        assert await TodoCounterRepository.recount(session) == 0
+
+
+async def test_bulk_create_of_nothing(client, user):
+    response = await client.post("/todo/bulk/", json=[], headers=user.headers)
+    assert response.status_code == 200
+    assert response.json() == []
+
+
+async def test_bulk_update_rejects_repeated_ids(client, user):
+    todo = await create_todo(client, user)
+    response = await client.patch(
+        "/todo/bulk/",
+        json=[{"id": todo["id"], "text": "a"}, {"id": todo["id"], "text": "b"}],
+        headers=user.headers,
+    )
+    assert response.status_code == 400
+
+
+async def test_category_cache_sees_writes_of_other_workers(
+    client, session_factory, admin, user
+):
+    home = await create_category(client, admin, "home")
+    todo = await create_todo(client, user, "old", category_id=home["id"])
+    await client.get("/category/", headers=user.headers)
+    await client.get(f"/category/{home['id']}/", headers=user.headers)
+
+    # Запись другого воркера: ни один хук этого процесса не срабатывает
+    async with session_factory() as session:
+        await session.execute(
+            update(models.Category).filter_by(id=home["id"]).values(text="House")
+        )
+        await session.execute(
+            update(models.Todo).filter_by(id=todo["id"]).values(text="new")
+        )
+        await VersionRepository.bump(
+            session, "category", "todo", *VersionRepository.categories([home["id"]])
+        )
+        await session.commit()
+
+    response = await client.get("/category/", headers=user.headers)
+    assert [category["text"] for category in response.json()] == ["House"]
+    response = await client.get(f"/category/{home['id']}/", headers=user.headers)
+    assert [t["text"] for t in response.json()["todos"]] == ["new"]
+
+
+async def test_category_etag_names_the_versions_of_the_body(client, admin, user):
+    home = await create_category(client, admin, "home")
+    await create_todo(client, user, category_id=home["id"])
+    for path, key in [("/category/", "list"), (f"/category/{home['id']}/", home["id"])]:
+        response = await client.get(path, headers=user.headers)
+        versions = response.headers["etag"].strip('"')
+        # Тело лежит в кеше под теми же версиями, что и в ETag
+        assert f"category:{key}@{versions}" in category_cache.backend._entries
+        response = await client.get(
+            path, headers={**user.headers, "If-None-Match": f'"{versions}"'}
+        )
+        assert response.status_code == 304
+
+
+async def test_category_etag_changes_only_with_its_own_todos(client, admin, user):
+    home, work = [await create_category(client, admin, slug) for slug in ("h", "w")]
+    todo = await create_todo(client, user, category_id=home["id"])
+
+    async def etags():
+        return [
+            (
+                await client.get(f"/category/{category['id']}/", headers=user.headers)
+            ).headers["etag"]
+            for category in (home, work)
+        ]
+
+    before = await etags()
+    await create_todo(client, user)
+    assert await etags() == before
+    await client.put(
+        f"/todo/{todo['id']}/",
+        params={"text": "x", "category_id": home["id"]},
+        headers=user.headers,
+    )
+    changed = await etags()
+    assert changed[0] != before[0] and changed[1] == before[1]
+    # Переезд todo меняет обе категории
+    await client.put(
+        f"/todo/{todo['id']}/",
+        params={"text": "x", "category_id": work["id"]},
+        headers=user.headers,
+    )
+    moved = await etags()
+    assert moved[0] != changed[0] and moved[1] != changed[1]
+    response = await client.get(f"/category/{work['id']}/", headers=user.headers)
+    assert [t["id"] for t in response.json()["todos"]] == [todo["id"]]
+
+
+async def test_bulk_update_reports_missing_todos(client, user):
+    todo = await create_todo(client, user)
+    response = await client.patch(
+        "/todo/bulk/",
+        json=[{"id": 999, "text": "a"}, {"id": todo["id"], "text": "b"}],
+        headers=user.headers,
+    )
+    assert response.status_code == 200
+    missing, updated = response.json()
+    assert missing["status"] == "not_found"
+    assert updated["todo"] == {**todo, "text": "b"}
+
+
+async def test_events_are_off_across_workers_without_transport(
+    client, user, monkeypatch
+):
+    monkeypatch.setattr(settings, "SERVER_WORKERS", 4)
+    monkeypatch.setattr(settings, "EVENTS_URL", None)
+    response = await client.get("/todo/events/", headers=user.headers)
+    assert response.status_code == 503
+    response = await client.get("/todo/", headers=user.headers)
+    assert response.status_code == 200
+
+
+async def test_embedded_todo_totals_come_from_counters(
+    client, admin, user, monkeypatch
+):
+    monkeypatch.setattr(settings, "RELATED_TODOS_LIMIT", 2)
+    home = await create_category(client, admin, "home")
+    for _ in range(3):
+        await create_todo(client, user, category_id=home["id"])
+    for path in (f"/admin/users/{user.id}/", f"/category/{home['id']}/"):
+        with assert_queries() as recorder:
+            body = (await client.get(path, headers=admin.headers)).json()
+        assert (len(body["todos"]), body["todos_count"]) == (2, 3)
+        assert not any("count(" in s.lower() for s in recorder.statements)
@@ -0,0 +1,46 @@
+import logging
+import os
+
+import pytest
+
+import server
+from config import settings
+from db.events import events_url
+
+
+SQLITE_URL = "sqlite+aiosqlite:///example.db"
+POSTGRES_URL = "postgresql+asyncpg://app@db/app"
+
+
+@pytest.fixture(autouse=True)
+def single_process_defaults(monkeypatch):
+    monkeypatch.setattr(settings, "SERVER_RELOAD", False)
+    monkeypatch.setattr(settings, "EVENTS_URL", None)
+    monkeypatch.setattr(settings, "DB_URL", SQLITE_URL)
+    monkeypatch.setattr(os, "cpu_count", lambda: 8)
+
+
+def test_events_default_to_the_postgres_database(monkeypatch):
+    assert events_url() is None
+    monkeypatch.setattr(settings, "DB_URL", POSTGRES_URL)
+    assert events_url() == POSTGRES_URL
+    monkeypatch.setattr(settings, "EVENTS_URL", "redis://cache")
+    assert events_url() == "redis://cache"
+
+
+@pytest.mark.parametrize("configured, expected", [(None, 8), (4, 4), (1, 1)])
+def test_workers_keep_their_count_without_shared_events(
+    monkeypatch, caplog, configured, expected
+):
+    monkeypatch.setattr(settings, "SERVER_WORKERS", configured)
+    with caplog.at_level(logging.WARNING, logger="server"):
+        assert server.resolve_workers() == expected
+    assert ("/todo/events/ is off" in caplog.text) is (expected > 1)
+
+
+def test_shared_events_need_no_warning(monkeypatch, caplog):
+    monkeypatch.setattr(settings, "SERVER_WORKERS", 4)
+    monkeypatch.setattr(settings, "DB_URL", POSTGRES_URL)
+    with caplog.at_level(logging.WARNING, logger="server"):
+        assert server.resolve_workers() == 4
+    assert not caplog.text
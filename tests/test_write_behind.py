@@ -0,0 +1,50 @@
+import asyncio
+
+import pytest
+
+from config import settings
+from db.database import async_session
+from db.write_queue import TodoWriteQueue
+from routes import todos
+
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def write_queue(engine, monkeypatch):
+    queue = TodoWriteQueue(settings.TODO_WRITE_BATCH_SIZE, 0.001, 100)
+    monkeypatch.setattr(todos, "todo_write_queue", queue)
+    task = asyncio.create_task(queue.run(async_session))
+    yield queue
+    await queue.stop()
+    await task
+
+
+@pytest.mark.parametrize("write_behind", [False, True])
+async def test_post_stores_the_same_row_either_way(
+    client, user, write_queue, monkeypatch, write_behind
+):
+    monkeypatch.setattr(settings, "TODO_WRITE_BEHIND", write_behind)
+    response = await client.post(
+        "/todo/",
+        params={"text": "done already", "completed": True},
+        headers=user.headers,
+    )
+    created = response.json()["code"]
+    stored = (await client.get(f"/todo/{created['id']}/", headers=user.headers)).json()
+    assert created["completed"] is stored["completed"] is True
+    assert write_queue.mutations == (1 if write_behind else 0)
+
+
+@pytest.mark.parametrize("write_behind", [False, True])
+async def test_deleting_twice_gives_404_once(
+    client, user, write_queue, monkeypatch, write_behind
+):
+    monkeypatch.setattr(settings, "TODO_WRITE_BEHIND", write_behind)
+    response = await client.post("/todo/", params={"text": "x"}, headers=user.headers)
+    path = f"/todo/{response.json()['code']['id']}/"
+    responses = await asyncio.gather(
+        *(client.delete(path, headers=user.headers) for _ in range(2))
+    )
+    assert sorted(response.status_code for response in responses) == [204, 404]